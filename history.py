@@ -0,0 +1,404 @@
+"""
+Undo/redo history for the planning state.
+
+Every history step is a PlanState holding the VLSM plan, the VLAN list and
+the topology graph in persistent collections. A new version shares every
+unchanged part with the one before it (path copying), so hundreds of steps
+on a 100,000-subnet plan cost memory in proportion to what each step
+changed rather than a copy of the plan per step. diff_vectors and diff_maps
+walk two versions side by side and skip the subtrees they share, so undo
+and redo find the changed rows in time proportional to the change.
+
+PVector is a 32-way trie of tuples; PMap is a hash trie whose leaves are
+small dicts, split into 32 branches once they outgrow LEAF_SIZE entries.
+Stored values are shared between versions and must not be mutated.
+"""
+from collections import namedtuple
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+
+# A PMap leaf holding more entries than this is split on the next hash bits
+LEAF_SIZE = 32
+_MAX_SHIFT = 60
+_HASH_MASK = (1 << 64) - 1
+
+_MISSING = object()
+_EMPTY_LEAF = {}
+
+
+# Vectors
+
+def _appended(node, shift, index, value):
+    if shift == 0:
+        return node + (value,)
+    slot = (index >> shift) & _MASK
+    if slot < len(node):
+        return node[:slot] + (_appended(node[slot], shift - _BITS, index, value),)
+    child = (value,)
+    for _ in range(shift // _BITS - 1):
+        child = (child,)
+    return node + (child,)
+
+
+def _assoc(node, shift, index, value):
+    slot = (index >> shift) & _MASK
+    child = value if shift == 0 else _assoc(node[slot], shift - _BITS, index, value)
+    return node[:slot] + (child,) + node[slot + 1:]
+
+
+class PVector:
+    """Immutable list; set, append and updated return new vectors"""
+
+    __slots__ = ('_count', '_shift', '_root')
+
+    def __init__(self, items=()):
+        self._count, self._shift, self._root = self._pack(list(items))
+
+    @classmethod
+    def _make(cls, count, shift, root):
+        vector = cls.__new__(cls)
+        vector._count, vector._shift, vector._root = count, shift, root
+        return vector
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("PVector index out of range")
+        node = self._root
+        for shift in range(self._shift, 0, -_BITS):
+            node = node[(index >> shift) & _MASK]
+        return node[index & _MASK]
+
+    def __iter__(self):
+        for leaf in self._levels()[0]:
+            yield from leaf
+
+    def tolist(self):
+        items = []
+        for leaf in self._levels()[0]:
+            items.extend(leaf)
+        return items
+
+    def set(self, index, value):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("PVector index out of range")
+        return self._make(self._count, self._shift, _assoc(self._root, self._shift, index, value))
+
+    def append(self, value):
+        count, shift, root = self._count, self._shift, self._root
+        if count and count == 1 << (shift + _BITS):
+            # Full: the old root becomes the first child of a taller one
+            root = (root,)
+            shift += _BITS
+        return self._make(count + 1, shift, _appended(root, shift, count, value))
+
+    def updated(self, items):
+        """A vector of items that reuses every 32-item block of this one left unchanged.
+
+        Building costs one pass over items; the new vector only allocates
+        blocks (and their parents) whose contents differ.
+        """
+        count, shift, root = self._pack(list(items), self._levels())
+        if root is self._root and count == self._count:
+            return self
+        return self._make(count, shift, root)
+
+    def _levels(self):
+        """Node lists per level, leaves first"""
+        levels = [[self._root]]
+        for _ in range(self._shift // _BITS):
+            levels.append([child for node in levels[-1] for child in node])
+        levels.reverse()
+        return levels
+
+    @staticmethod
+    def _pack(items, old_levels=()):
+        """(count, shift, root) for items, reusing nodes of old_levels where equal"""
+        nodes = [tuple(items[i:i + _WIDTH]) for i in range(0, len(items), _WIDTH)] or [()]
+        level = 0
+        while True:
+            previous = old_levels[level] if level < len(old_levels) else ()
+            for i in range(min(len(nodes), len(previous))):
+                old, node = previous[i], nodes[i]
+                # Leaves compare by value; above them shared children are identical
+                same = old == node if level == 0 else (
+                    len(old) == len(node) and all(a is b for a, b in zip(old, node)))
+                if same:
+                    nodes[i] = old
+            if len(nodes) == 1:
+                return len(items), level * _BITS, nodes[0]
+            nodes = [tuple(nodes[i:i + _WIDTH]) for i in range(0, len(nodes), _WIDTH)]
+            level += 1
+
+
+def _diff_vector_nodes(a, b, shift, base):
+    if a is b:
+        return
+    for i in range(max(len(a), len(b))):
+        if shift == 0:
+            if i >= len(a) or i >= len(b) or (a[i] is not b[i] and a[i] != b[i]):
+                yield base + i
+        else:
+            yield from _diff_vector_nodes(a[i] if i < len(a) else (), b[i] if i < len(b) else (),
+                                          shift - _BITS, base + (i << shift))
+
+
+def diff_vectors(a, b):
+    """Ascending indices at which two vectors differ, including the longer one's tail"""
+    root_a, root_b = a._root, b._root
+    shift = max(a._shift, b._shift)
+    # Lift the shorter tree so both roots cover the same index range
+    for _ in range((shift - a._shift) // _BITS):
+        root_a = (root_a,) if root_a else ()
+    for _ in range((shift - b._shift) // _BITS):
+        root_b = (root_b,) if root_b else ()
+    return _diff_vector_nodes(root_a, root_b, shift, 0)
+
+
+# Maps
+
+def _key_hash(key):
+    return hash(key) & _HASH_MASK
+
+
+def _split(leaf, shift):
+    """Branch node holding leaf's entries, spread on the hash bits at shift"""
+    children = [{} for _ in range(_WIDTH)]
+    for key, value in leaf.items():
+        children[(_key_hash(key) >> shift) & _MASK][key] = value
+    for i, child in enumerate(children):
+        if not child:
+            children[i] = _EMPTY_LEAF
+        elif len(child) > LEAF_SIZE and shift + _BITS < _MAX_SHIFT:
+            children[i] = _split(child, shift + _BITS)
+    return tuple(children)
+
+
+def _map_set(node, shift, key, h, value):
+    if type(node) is dict:
+        leaf = dict(node)
+        leaf[key] = value
+        if len(leaf) > LEAF_SIZE and shift < _MAX_SHIFT:
+            return _split(leaf, shift)
+        return leaf
+    slot = (h >> shift) & _MASK
+    return node[:slot] + (_map_set(node[slot], shift + _BITS, key, h, value),) + node[slot + 1:]
+
+
+def _map_remove(node, shift, key, h):
+    if type(node) is dict:
+        leaf = dict(node)
+        del leaf[key]
+        return leaf
+    slot = (h >> shift) & _MASK
+    return node[:slot] + (_map_remove(node[slot], shift + _BITS, key, h),) + node[slot + 1:]
+
+
+def _map_leaves(node):
+    if type(node) is dict:
+        yield node
+    else:
+        for child in node:
+            yield from _map_leaves(child)
+
+
+class PMap:
+    """Immutable dict; set, discard and synced return new maps"""
+
+    __slots__ = ('_count', '_root')
+
+    def __init__(self, mapping=None):
+        leaf = dict(mapping or {})
+        self._count = len(leaf)
+        self._root = _split(leaf, 0) if len(leaf) > LEAF_SIZE else leaf
+
+    @classmethod
+    def _make(cls, count, root):
+        pmap = cls.__new__(cls)
+        pmap._count, pmap._root = count, root
+        return pmap
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        node, h, shift = self._root, _key_hash(key), 0
+        while type(node) is not dict:
+            node = node[(h >> shift) & _MASK]
+            shift += _BITS
+        return node.get(key, default)
+
+    def items(self):
+        for leaf in _map_leaves(self._root):
+            yield from leaf.items()
+
+    def set(self, key, value):
+        old = self.get(key, _MISSING)
+        if old is value:
+            return self
+        count = self._count + (old is _MISSING)
+        return self._make(count, _map_set(self._root, 0, key, _key_hash(key), value))
+
+    def discard(self, key):
+        if key not in self:
+            return self
+        return self._make(self._count - 1, _map_remove(self._root, 0, key, _key_hash(key)))
+
+    def synced(self, mapping):
+        """A map equal to mapping that shares whatever entries this one already holds"""
+        removed = [key for key, _ in self.items() if key not in mapping]
+        changed = []
+        for key, value in mapping.items():
+            old = self.get(key, _MISSING)
+            if old is not value and old != value:
+                changed.append((key, value))
+        if len(removed) + len(changed) > len(mapping) // 2:
+            # Mostly different: a fresh map is cheaper than path copying each entry
+            return PMap(mapping)
+        result = self
+        for key in removed:
+            result = result.discard(key)
+        for key, value in changed:
+            result = result.set(key, value)
+        return result
+
+
+def _diff_map_nodes(a, b, shift):
+    if a is b:
+        return
+    if type(a) is dict and type(b) is dict:
+        for key, value in a.items():
+            other = b.get(key, _MISSING)
+            if other is _MISSING:
+                yield key, value, None
+            elif other is not value and other != value:
+                yield key, value, other
+        for key, value in b.items():
+            if key not in a:
+                yield key, None, value
+        return
+    # A leaf facing a branch: spread it on the same bits and compare per child
+    if type(a) is dict:
+        a = _split(a, shift)
+    if type(b) is dict:
+        b = _split(b, shift)
+    for child_a, child_b in zip(a, b):
+        yield from _diff_map_nodes(child_a, child_b, shift + _BITS)
+
+
+def diff_maps(a, b):
+    """(key, old value, new value) for every key that differs; None marks an absent side"""
+    return _diff_map_nodes(a._root, b._root, 0)
+
+
+# Plan state
+
+PlanState = namedtuple('PlanState', ['vlsm', 'hierarchy', 'vlan', 'nodes', 'edges'])
+
+EMPTY_STATE = PlanState(PVector(), None, PVector(), PMap(), PMap())
+
+
+def edge_key(u, v):
+    """Map key for an undirected edge"""
+    return frozenset((u, v))
+
+
+def edge_ends(key):
+    """(u, v) of an edge key; a self-loop has a single member"""
+    ends = tuple(key)
+    return ends * 2 if len(ends) == 1 else ends
+
+
+def graph_sections(state, graph):
+    """nodes and edges sections matching graph, sharing what state already holds"""
+    return {
+        'nodes': state.nodes.synced({n: dict(data) for n, data in graph.nodes(data=True)}),
+        'edges': state.edges.synced({edge_key(u, v): dict(data) for u, v, data in graph.edges(data=True)}),
+    }
+
+
+def topology_sections(state, action, *args):
+    """nodes and edges sections after a TopologyAnalysis on_edit event"""
+    if action == 'replace':
+        return graph_sections(state, args[0])
+    nodes, edges = state.nodes, state.edges
+    if action == 'add_node':
+        node, attributes = args
+        nodes = nodes.set(node, {**nodes.get(node, {}), **attributes})
+    elif action == 'remove_node':
+        # TopologyAnalysis reports the node's edges as removed first
+        nodes = nodes.discard(args[0])
+    elif action == 'add_edge':
+        u, v, attributes = args
+        for node in (u, v):
+            if node not in nodes:
+                nodes = nodes.set(node, {})
+        key = edge_key(u, v)
+        edges = edges.set(key, {**edges.get(key, {}), **attributes})
+    elif action == 'remove_edge':
+        edges = edges.discard(edge_key(*args))
+    return {'nodes': nodes, 'edges': edges}
+
+
+class History:
+    """Undo and redo stacks of PlanStates.
+
+    Edits are staged into pending as they happen and commit(label) turns
+    whatever was staged into one undoable step.
+    """
+
+    def __init__(self, state=EMPTY_STATE, limit=500):
+        self.current = state
+        self.pending = state
+        self.limit = limit
+        self._undo = []
+        self._redo = []
+
+    def stage(self, **sections):
+        self.pending = self.pending._replace(**sections)
+
+    def commit(self, label):
+        """Record the staged changes as a step; False if nothing changed"""
+        if all(a is b for a, b in zip(self.pending, self.current)):
+            return False
+        self._undo.append((label, self.current))
+        if len(self._undo) > self.limit:
+            del self._undo[0]
+        self._redo.clear()
+        self.current = self.pending
+        return True
+
+    def undo(self):
+        """(label, state shown now, state to show) for the last step, or None"""
+        return self._step(self._undo, self._redo)
+
+    def redo(self):
+        return self._step(self._redo, self._undo)
+
+    @property
+    def undo_label(self):
+        return self._undo[-1][0] if self._undo else None
+
+    @property
+    def redo_label(self):
+        return self._redo[-1][0] if self._redo else None
+
+    def _step(self, source, target):
+        if not source:
+            return None
+        label, state = source.pop()
+        target.append((label, self.current))
+        shown = self.pending
+        self.current = self.pending = state
+        return label, shown, state
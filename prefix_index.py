@@ -0,0 +1,621 @@
+"""
+Prefix indexing and conflict detection for IPv4 and IPv6 networks.
+
+Networks are reduced to (version, start, end) integer intervals once, so
+checks never re-parse display strings.
+
+Command line:
+    python prefix_index.py overlaps prefixes.csv [--column Subnet] [--label Name]
+    python prefix_index.py lookup routes.txt 192.0.2.1 [...]
+    python prefix_index.py benchmark [--table routes.txt]
+    python prefix_index.py verify routes.txt summary.txt
+"""
+import argparse
+import csv
+import heapq
+import ipaddress
+import socket
+import struct
+import sys
+import time
+
+import numpy as np
+
+
+def prefix_interval(network):
+    """Return (version, first_int, last_int) for a network string or object"""
+    if not isinstance(network, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+        network = ipaddress.ip_network(str(network).strip(), strict=False)
+    start = int(network.network_address)
+    return network.version, start, start + network.num_addresses - 1
+
+
+def find_interval_overlaps(intervals):
+    """Report every overlapping pair among (label, version, start, end) intervals.
+
+    Intervals are sorted once and swept left to right while a heap keeps the
+    ones still open, so the cost is O(n log n) plus the number of conflicts.
+    Each result names the outer interval first and classifies the pair as
+    'duplicate', 'contains' or 'overlaps'.
+    """
+    ordered = sorted(intervals, key=lambda i: (i[1], i[2], -i[3]))
+    conflicts = []
+    active = []
+    version = None
+
+    for index, (label, ver, start, end) in enumerate(ordered):
+        if ver != version:
+            active = []
+            version = ver
+
+        # Drop intervals that ended before this one starts
+        while active and active[0][0] < start:
+            heapq.heappop(active)
+
+        for _, other_index in active:
+            other_label, _, other_start, other_end = ordered[other_index]
+            if other_start == start and other_end == end:
+                relation = 'duplicate'
+            elif other_end >= end:
+                relation = 'contains'
+            else:
+                relation = 'overlaps'
+            conflicts.append({'first': other_label, 'second': label, 'relation': relation})
+
+        heapq.heappush(active, (end, index))
+
+    return conflicts
+
+
+def find_overlaps(networks, skip_invalid=False):
+    """Report overlapping pairs among (label, network) items"""
+    intervals = []
+    for label, network in networks:
+        try:
+            intervals.append((label,) + prefix_interval(network))
+        except ValueError:
+            if not skip_invalid:
+                raise
+    return find_interval_overlaps(intervals)
+
+
+_ADDRESS_BITS = {4: 32, 6: 128}
+_EMPTY = object()
+
+
+def prefix_key(network):
+    """Return (version, network_int, prefixlen) for a network or key tuple"""
+    if isinstance(network, tuple):
+        return network
+    if not isinstance(network, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+        network = ipaddress.ip_network(str(network).strip(), strict=False)
+    return network.version, int(network.network_address), network.prefixlen
+
+
+def key_contains(outer, inner):
+    """Whether the outer key's block contains the inner key's block"""
+    version, start, length = outer
+    if version != inner[0] or length > inner[2]:
+        return False
+    shift = _ADDRESS_BITS[version] - length
+    return start >> shift == inner[1] >> shift
+
+
+def key_to_network(key):
+    """Build an ipaddress network object from a key tuple"""
+    version, network, length = key
+    if version == 4:
+        return ipaddress.IPv4Network((network, length))
+    return ipaddress.IPv6Network((network, length))
+
+
+class _TrieNode:
+    __slots__ = ('key', 'length', 'value', 'children')
+
+    def __init__(self, key, length, value=_EMPTY):
+        self.key = key
+        self.length = length
+        self.value = value
+        self.children = [None, None]
+
+
+class PrefixTrie:
+    """Path-compressed binary trie mapping IPv4 and IPv6 prefixes to values.
+
+    Keys may be network strings, ipaddress networks or (version, int, len)
+    tuples; results are returned as key tuples so callers decide whether to
+    pay for building network objects. Lookups walk at most one node per
+    prefix bit.
+    """
+
+    def __init__(self):
+        self._roots = {4: _TrieNode(0, 0), 6: _TrieNode(0, 0)}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def _bit(key, position, bits):
+        return (key >> (bits - position - 1)) & 1
+
+    @staticmethod
+    def _matches(node, key, bits):
+        return node.length == 0 or (node.key ^ key) >> (bits - node.length) == 0
+
+    def _find(self, key):
+        version, network, length = key
+        bits = _ADDRESS_BITS[version]
+        node = self._roots[version]
+        path = []
+        while node is not None and node.length < length:
+            path.append(node)
+            node = node.children[self._bit(network, node.length, bits)]
+            if node is not None and not self._matches(node, network, bits):
+                return None, path
+        if node is not None and node.length == length and node.key == network:
+            return node, path
+        return None, path
+
+    def __setitem__(self, network, value):
+        version, key, length = prefix_key(network)
+        bits = _ADDRESS_BITS[version]
+        key &= ~((1 << (bits - length)) - 1)
+        node = self._roots[version]
+
+        while True:
+            if node.length == length:
+                if node.value is _EMPTY:
+                    self._size += 1
+                node.value = value
+                return
+
+            bit = self._bit(key, node.length, bits)
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _TrieNode(key, length, value)
+                self._size += 1
+                return
+
+            limit = min(child.length, length)
+            diff = (child.key ^ key) >> (bits - limit)
+            common = limit - diff.bit_length()
+            if common == child.length:
+                node = child
+                continue
+
+            if common == length:
+                new = _TrieNode(key, length, value)
+                new.children[self._bit(child.key, length, bits)] = child
+            else:
+                new = _TrieNode(key & ~((1 << (bits - common)) - 1), common)
+                new.children[self._bit(child.key, common, bits)] = child
+                new.children[self._bit(key, common, bits)] = _TrieNode(key, length, value)
+            node.children[bit] = new
+            self._size += 1
+            return
+
+    def __getitem__(self, network):
+        node, _ = self._find(prefix_key(network))
+        if node is None or node.value is _EMPTY:
+            raise KeyError(network)
+        return node.value
+
+    def __contains__(self, network):
+        node, _ = self._find(prefix_key(network))
+        return node is not None and node.value is not _EMPTY
+
+    def get(self, network, default=None):
+        node, _ = self._find(prefix_key(network))
+        if node is None or node.value is _EMPTY:
+            return default
+        return node.value
+
+    def setdefault(self, network, default=None):
+        key = prefix_key(network)
+        node, _ = self._find(key)
+        if node is not None and node.value is not _EMPTY:
+            return node.value
+        self[key] = default
+        return default
+
+    def __delitem__(self, network):
+        key = prefix_key(network)
+        node, path = self._find(key)
+        if node is None or node.value is _EMPTY:
+            raise KeyError(network)
+        node.value = _EMPTY
+        self._size -= 1
+
+        # Splice out nodes that no longer carry a value or a fork
+        while path and node.value is _EMPTY:
+            parent = path.pop()
+            slot = parent.children.index(node)
+            children = [c for c in node.children if c is not None]
+            if len(children) == 2:
+                break
+            parent.children[slot] = children[0] if children else None
+            node = parent
+
+    def _subtree_root(self, key):
+        """Topmost node inside the block, or None when the block is empty"""
+        version, network, length = key
+        bits = _ADDRESS_BITS[version]
+        node = self._roots[version]
+        while node is not None and node.length < length:
+            node = node.children[self._bit(network, node.length, bits)]
+            if node is not None and (node.key ^ network) >> (bits - min(node.length, length)):
+                return None
+        return node
+
+    def _walk(self, node, version):
+        stack = [node] if node is not None else []
+        while stack:
+            node = stack.pop()
+            if node.value is not _EMPTY:
+                yield (version, node.key, node.length), node.value
+            stack.extend(c for c in reversed(node.children) if c is not None)
+
+    def items(self):
+        """All (key, value) pairs in address order"""
+        for version, root in self._roots.items():
+            yield from self._walk(root, version)
+
+    def longest_match(self, address):
+        """Most specific (key, value) containing an address, or None"""
+        if not isinstance(address, tuple):
+            address = ipaddress.ip_address(str(address).strip())
+            address = (address.version, int(address), _ADDRESS_BITS[address.version])
+        return self._covering(address, longest=True)
+
+    def _covering(self, key, longest=False):
+        version, network, length = prefix_key(key)
+        bits = _ADDRESS_BITS[version]
+        node = self._roots[version]
+        found = []
+        while node is not None and node.length <= length and self._matches(node, network, bits):
+            if node.value is not _EMPTY:
+                found.append(((version, node.key, node.length), node.value))
+            if node.length == bits:
+                break
+            node = node.children[self._bit(network, node.length, bits)]
+        if longest:
+            return found[-1] if found else None
+        return found
+
+    def covering(self, network):
+        """Entries that contain the network, least specific first"""
+        return self._covering(network)
+
+    def covered(self, network):
+        """Entries inside the network, in address order"""
+        key = prefix_key(network)
+        return list(self._walk(self._subtree_root(key), key[0]))
+
+    def free_space(self, network):
+        """Maximal aligned blocks inside the network that hold no entry"""
+        key = prefix_key(network)
+        if self._covering(key):
+            return []
+        version, start, length = key
+        bits = _ADDRESS_BITS[version]
+        free = []
+        stack = [(start, length, self._subtree_root(key))]
+        while stack:
+            start, length, node = stack.pop()
+            if node is None:
+                free.append((version, start, length))
+            elif node.length == length:
+                if node.value is _EMPTY:
+                    half = 1 << (bits - length - 1)
+                    stack.append((start + half, length + 1, node.children[1]))
+                    stack.append((start, length + 1, node.children[0]))
+            else:
+                half = 1 << (bits - length - 1)
+                if self._bit(node.key, length, bits):
+                    stack.append((start + half, length + 1, node))
+                    free.append((version, start, length + 1))
+                else:
+                    stack.append((start + half, length + 1, None))
+                    stack.append((start, length + 1, node))
+        return sorted(free)
+
+
+_TBL8_FLAG = np.uint32(1 << 31)
+_TBL8_MASK = np.uint32((1 << 31) - 1)
+
+
+class RouteTable:
+    """Longest-prefix-match forwarding table.
+
+    IPv4 uses DIR-24-8 arrays: a 2**24 entry first-level table indexed by
+    the top 24 address bits, with 256-entry second-level groups for the
+    few /24s that hold longer prefixes. A lookup is one or two array reads,
+    so batches of addresses resolve in a couple of NumPy operations. IPv6
+    routes live in a PrefixTrie. Entries hold route numbers, so lookups
+    report the matching prefix as well as its next hop.
+    """
+
+    def __init__(self, routes=()):
+        self.routes = []
+        self._v6 = PrefixTrie()
+        self._v4 = []
+        for network, next_hop in routes:
+            self.add(network, next_hop)
+        self._tbl24 = None
+        self._tbl8 = None
+
+    def __len__(self):
+        return len(self.routes)
+
+    def add(self, network, next_hop):
+        """Add a route; call build() (or look up) afterwards to apply it"""
+        key = prefix_key(network)
+        self.routes.append((key, next_hop))
+        if key[0] == 4:
+            self._v4.append(len(self.routes))
+        else:
+            self._v6[key] = len(self.routes)
+        self._tbl24 = None
+
+    def build(self):
+        """Lay the IPv4 routes out in the DIR-24-8 arrays"""
+        tbl24 = np.zeros(1 << 24, dtype=np.uint32)
+        route_ids = np.array(self._v4, dtype=np.int64)
+        keys = [self.routes[i - 1][0] for i in self._v4]
+        starts = np.array([k[1] for k in keys], dtype=np.int64)
+        lengths = np.array([k[2] for k in keys], dtype=np.int64)
+
+        # Shorter prefixes first so more specific routes overwrite them
+        for length in range(25):
+            chosen = lengths == length
+            if not chosen.any():
+                continue
+            span = 1 << (24 - length)
+            first = starts[chosen] >> 8
+            ids = route_ids[chosen].astype(np.uint32)
+            for offset in range(0, len(first), max(1, (1 << 22) // span)):
+                part = slice(offset, offset + max(1, (1 << 22) // span))
+                slots = (first[part, None] + np.arange(span)).ravel()
+                tbl24[slots] = np.repeat(ids[part], span)
+
+        groups = []
+        for length in range(25, 33):
+            chosen = np.flatnonzero(lengths == length)
+            span = 1 << (32 - length)
+            for index in chosen.tolist():
+                start = int(starts[index])
+                entry = tbl24[start >> 8]
+                if not entry & _TBL8_FLAG:
+                    # Seed the new group with the covering shorter route
+                    groups.append(np.full(256, entry, dtype=np.uint32))
+                    entry = _TBL8_FLAG | np.uint32(len(groups) - 1)
+                    tbl24[start >> 8] = entry
+                low = start & 0xFF
+                groups[int(entry & _TBL8_MASK)][low:low + span] = route_ids[index]
+
+        self._tbl24 = tbl24
+        self._tbl8 = np.concatenate(groups) if groups else np.zeros(0, dtype=np.uint32)
+
+    def lookup_ipv4(self, addresses):
+        """Route numbers (0 for no route) for a uint32 array of addresses"""
+        if self._tbl24 is None:
+            self.build()
+        addresses = np.asarray(addresses, dtype=np.uint32)
+        entries = self._tbl24[addresses >> 8]
+        nested = (entries & _TBL8_FLAG) != 0
+        if nested.any():
+            slots = (entries[nested] & _TBL8_MASK).astype(np.int64) * 256 + (addresses[nested] & 0xFF)
+            entries[nested] = self._tbl8[slots]
+        return entries
+
+    def lookup(self, address):
+        """(prefix key, next hop) of the longest match for an address, or None"""
+        address = ipaddress.ip_address(str(address).strip())
+        if address.version == 6:
+            found = self._v6.longest_match((6, int(address), 128))
+            route = found[1] if found else 0
+        else:
+            route = int(self.lookup_ipv4(np.array([int(address)], dtype=np.uint32))[0])
+        return self.routes[route - 1] if route else None
+
+    def lookup_many(self, addresses):
+        """Next hops (None when unrouted) for an iterable of address strings"""
+        addresses = [str(a).strip() for a in addresses]
+        results = [None] * len(addresses)
+        v4 = [i for i, a in enumerate(addresses) if ":" not in a]
+        if v4:
+            packed = b"".join(socket.inet_aton(addresses[i]) for i in v4)
+            routes = self.lookup_ipv4(np.frombuffer(packed, dtype=">u4").astype(np.uint32))
+            for i, route in zip(v4, routes.tolist()):
+                if route:
+                    results[i] = self.routes[route - 1][1]
+        for i, address in enumerate(addresses):
+            if ":" in address:
+                match = self.lookup(address)
+                results[i] = match[1] if match else None
+        return results
+
+
+def read_route_table(path):
+    """Yield (prefix, next_hop) pairs from a text or CSV route table.
+
+    Text files hold 'prefix next-hop' per line ('#' starts a comment); CSV
+    files need a header with Prefix and Next Hop columns (any case). A
+    missing next hop is recorded as an empty string.
+    """
+    with open(path, newline='') as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.reader(f)
+            header = [h.strip().lower() for h in next(reader, [])]
+            prefix_col = header.index("prefix") if "prefix" in header else 0
+            hop_col = next((header.index(h) for h in ("next hop", "next_hop", "nexthop") if h in header), 1)
+            for row in reader:
+                if len(row) > prefix_col and row[prefix_col].strip():
+                    yield row[prefix_col].strip(), row[hop_col].strip() if len(row) > hop_col else ""
+            return
+        for line in f:
+            fields = line.split("#", 1)[0].split()
+            if fields:
+                yield fields[0], fields[1] if len(fields) > 1 else ""
+
+
+def synthetic_routes(count=900000, seed=0):
+    """Random IPv4 routes with a prefix length mix similar to a full BGP table"""
+    rng = np.random.default_rng(seed)
+    lengths = rng.choice([8, 12, 16, 18, 19, 20, 21, 22, 23, 24, 28, 32], size=count,
+                         p=[0.0001, 0.0009, 0.012, 0.01, 0.02, 0.04, 0.05, 0.1, 0.09, 0.6, 0.07, 0.007])
+    addresses = rng.integers(1 << 24, 224 << 24, size=count, dtype=np.int64)
+    networks = addresses & ~((np.int64(1) << (32 - lengths)) - 1)
+    hops = rng.integers(1, 255, size=count)
+    return [((4, network, length), f"192.0.2.{hop}")
+            for network, length, hop in zip(networks.tolist(), lengths.tolist(), hops.tolist())]
+
+
+def benchmark(table, lookups=1000000, seed=0):
+    """Time table building plus batch and single lookups of random addresses"""
+    rng = np.random.default_rng(seed)
+    addresses = rng.integers(0, 1 << 32, size=lookups, dtype=np.int64).astype(np.uint32)
+
+    started = time.perf_counter()
+    table.build()
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    routes = table.lookup_ipv4(addresses)
+    batch_seconds = time.perf_counter() - started
+
+    singles = [socket.inet_ntoa(struct.pack("!I", a)) for a in addresses[:10000].tolist()]
+    started = time.perf_counter()
+    for address in singles:
+        table.lookup(address)
+    single_seconds = time.perf_counter() - started
+
+    return {
+        'routes': len(table),
+        'build_seconds': build_seconds,
+        'batch_lookups_per_second': lookups / batch_seconds,
+        'single_lookups_per_second': len(singles) / single_seconds,
+        'routed': float(np.count_nonzero(routes)) / lookups,
+    }
+
+
+def uncovered_addresses(table, summary, samples=100000, seed=0):
+    """Addresses routed by table that no prefix in summary covers.
+
+    Samples addresses inside the table's IPv4 routes, so a summary produced
+    by the supernet tool can be checked before it is deployed.
+    """
+    v4 = [key for key, _ in table.routes if key[0] == 4]
+    if not v4:
+        return []
+    check = RouteTable((network, "summary") for network in summary)
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(v4), size=samples)
+    starts = np.array([v4[i][1] for i in picks.tolist()], dtype=np.int64)
+    sizes = np.array([1 << (32 - v4[i][2]) for i in picks.tolist()], dtype=np.int64)
+    addresses = (starts + (rng.random(samples) * sizes).astype(np.int64)).astype(np.uint32)
+    missing = np.unique(addresses[check.lookup_ipv4(addresses) == 0])
+    return [socket.inet_ntoa(struct.pack("!I", a)) for a in missing.tolist()]
+
+
+def describe_conflict(conflict):
+    """Human readable sentence for a conflict record"""
+    if conflict['relation'] == 'duplicate':
+        return f"{conflict['first']} duplicates {conflict['second']}"
+    if conflict['relation'] == 'contains':
+        return f"{conflict['first']} contains {conflict['second']}"
+    return f"{conflict['first']} overlaps with {conflict['second']}"
+
+
+def read_prefix_csv(path, column=None, label=None):
+    """Yield (label, network) rows from a CSV file of prefixes"""
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        if column is None and label is None:
+            # Headerless single column files are allowed too
+            try:
+                prefix_interval(header[0])
+                yield header[0], header[0]
+            except ValueError:
+                pass
+            prefix_col = label_col = 0
+        else:
+            prefix_col = header.index(column) if column else 0
+            label_col = header.index(label) if label else prefix_col
+
+        for line_number, row in enumerate(reader, 2):
+            if len(row) <= max(prefix_col, label_col):
+                raise ValueError(f"Line {line_number}: missing columns")
+            yield row[label_col], row[prefix_col]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prefix conflict tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    overlaps = commands.add_parser("overlaps", help="Report overlapping and nested prefixes in a CSV")
+    overlaps.add_argument("csv_file")
+    overlaps.add_argument("--column", help="Column holding the prefix (default: first)")
+    overlaps.add_argument("--label", help="Column used to name each prefix (default: the prefix)")
+
+    lookup = commands.add_parser("lookup", help="Longest-prefix-match addresses against a route table")
+    lookup.add_argument("table", help="Text ('prefix next-hop' lines) or CSV route table")
+    lookup.add_argument("addresses", nargs="+")
+
+    bench = commands.add_parser("benchmark", help="Measure lookups per second")
+    bench.add_argument("--table", help="Route table file (default: synthetic full table)")
+    bench.add_argument("--routes", type=int, default=900000, help="Synthetic table size")
+    bench.add_argument("--lookups", type=int, default=1000000)
+
+    verify = commands.add_parser("verify", help="Check that a summary covers every route of a table")
+    verify.add_argument("table")
+    verify.add_argument("summary", help="File of summary prefixes, one per line")
+    verify.add_argument("--samples", type=int, default=100000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "lookup":
+        table = RouteTable(read_route_table(args.table))
+        for address in args.addresses:
+            match = table.lookup(address)
+            if match:
+                print(f"{address} via {match[1] or '-'} ({key_to_network(match[0])})")
+            else:
+                print(f"{address} has no route")
+        return 0
+
+    if args.command == "benchmark":
+        if args.table:
+            table = RouteTable(read_route_table(args.table))
+        else:
+            table = RouteTable(synthetic_routes(args.routes))
+        result = benchmark(table, args.lookups)
+        print(f"{result['routes']:,} routes built in {result['build_seconds']:.2f}s")
+        print(f"Batch lookups:  {result['batch_lookups_per_second']:,.0f}/s")
+        print(f"Single lookups: {result['single_lookups_per_second']:,.0f}/s")
+        print(f"Addresses with a route: {result['routed']:.1%}")
+        return 0
+
+    if args.command == "verify":
+        table = RouteTable(read_route_table(args.table))
+        summary = [prefix for prefix, _ in read_route_table(args.summary)]
+        missing = uncovered_addresses(table, summary, args.samples)
+        for address in missing[:20]:
+            print(f"Not covered: {address}")
+        print(f"{len(missing)} sampled addresses not covered by the summary")
+        return 1 if missing else 0
+
+    conflicts = find_overlaps(read_prefix_csv(args.csv_file, args.column, args.label))
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["First", "Second", "Relation"])
+    for conflict in conflicts:
+        writer.writerow([conflict['first'], conflict['second'], conflict['relation']])
+    return 1 if conflicts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,634 @@
+"""
+Binary project files (.vlsmproj).
+
+A project file is a small header, a directory of named sections and the
+section payloads. Every section is a table of typed columns: prefixes,
+host counts and scan results are stored as packed little-endian integers,
+strings as an offset array plus one UTF-8 blob. Derived values (masks,
+broadcast addresses, efficiency) are recomputed on load rather than stored.
+
+    header     magic, format version, section count
+    directory  per section: name, offset, length, CRC-32
+    sections   column metadata (JSON) followed by 8-byte aligned columns
+
+ProjectFile memory-maps the file and decodes a section only when it is
+asked for, so opening a project touches just the directory and each
+section costs a few array views. Readers skip sections they do not know
+and refuse files from a newer format version.
+
+JSON projects (the original format) are still read and written, see
+project_from_json and project_to_json.
+
+Between saves, ProjectJournal appends every edit as a small checksummed
+record to <project>.journal and flushes it in the background, so autosave
+costs as much as the edit rather than the project. Compaction rewrites the
+project file (stamped with the last journaled sequence number in its meta
+section) and drops the records it now contains; recover() replays whatever
+a crash left in the journal.
+
+Command line:
+    python project_store.py info project.vlsmproj
+    python project_store.py convert project.json project.vlsmproj
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+
+import networkx as nx
+import numpy as np
+
+import scanner
+import vlsm_engine
+
+MAGIC = b"VLSMPRJ\0"
+FORMAT_VERSION = 1
+EXTENSION = ".vlsmproj"
+FILE_TYPES = [
+    ("VLSM projects", "*" + EXTENSION),
+    ("JSON projects", "*.json"),
+]
+SECTIONS = ("vlsm", "vlan", "topology", "scans")
+
+_HEADER = struct.Struct("<8sHHI")
+_ENTRY = struct.Struct("<16sQQI4x")
+_ALIGN = 8
+_FRAME = struct.Struct("<IIIQ")
+
+
+def _pad(length):
+    return -length % _ALIGN
+
+
+def encode_table(columns, extra=None):
+    """Section bytes for a dict of equal-length columns.
+
+    Values are NumPy arrays (stored raw) or lists of strings (stored as
+    uint32 end offsets into a UTF-8 blob). extra is a small JSON-able dict
+    kept with the column metadata.
+    """
+    parts = []
+    meta = []
+    offset = 0
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray):
+            data = np.ascontiguousarray(values).tobytes()
+            meta.append({'name': name, 'dtype': values.dtype.str, 'offset': offset, 'length': len(data)})
+        else:
+            encoded = [str(v).encode('utf-8') for v in values]
+            ends = np.cumsum([len(e) for e in encoded], dtype=np.uint64) if encoded else np.zeros(0)
+            if encoded and ends[-1] > 0xFFFFFFFF:
+                raise ValueError(f"Text column {name} is too large")
+            data = ends.astype('<u4').tobytes() + b"".join(encoded)
+            meta.append({'name': name, 'dtype': "str", 'offset': offset, 'length': len(data),
+                         'count': len(encoded)})
+        parts.append(data + b"\0" * _pad(len(data)))
+        offset += len(parts[-1])
+
+    header = json.dumps({'columns': meta, 'extra': extra or {}}, separators=(",", ":")).encode()
+    header += b" " * _pad(4 + len(header))
+    return struct.pack("<I", len(header)) + header + b"".join(parts)
+
+
+def decode_table(buffer):
+    """(columns, extra) from section bytes; arrays are views into buffer"""
+    (meta_length,) = struct.unpack_from("<I", buffer, 0)
+    meta = json.loads(bytes(buffer[4:4 + meta_length]))
+    base = 4 + meta_length
+    columns = {}
+    for column in meta['columns']:
+        start = base + column['offset']
+        if column['dtype'] == "str":
+            count = column['count']
+            ends = np.frombuffer(buffer, dtype='<u4', count=count, offset=start)
+            raw = bytes(buffer[start + 4 * count:start + column['length']])
+            bounds = [0] + ends.tolist()
+            if raw.isascii():
+                text = raw.decode('ascii')
+                columns[column['name']] = [text[a:b] for a, b in zip(bounds, bounds[1:])]
+            else:
+                # Offsets count bytes, so split before decoding
+                columns[column['name']] = [raw[a:b].decode('utf-8') for a, b in zip(bounds, bounds[1:])]
+        else:
+            dtype = np.dtype(column['dtype'])
+            columns[column['name']] = np.frombuffer(
+                buffer, dtype=dtype, count=column['length'] // dtype.itemsize, offset=start)
+    return columns, meta.get('extra', {})
+
+
+# Section encoders and decoders. Decoders copy what they keep, so the
+# results stay valid after the file is closed.
+
+def encode_vlsm(allocations):
+    return encode_table({
+        'name': [a['name'] for a in allocations],
+        'network': np.array([a['network'] for a in allocations], dtype='<u4'),
+        'prefix': np.array([a['prefix'] for a in allocations], dtype='u1'),
+        'hosts': np.array([a['hosts'] for a in allocations], dtype='<u4'),
+        'priority': np.array([vlsm_engine.PRIORITY_ORDER[a['priority']] for a in allocations], dtype='u1'),
+    })
+
+
+def decode_vlsm(buffer):
+    columns, _ = decode_table(buffer)
+    priorities = {rank: name for name, rank in vlsm_engine.PRIORITY_ORDER.items()}
+    prefixes = columns['prefix'].tolist()
+    hosts = columns['hosts'].tolist()
+    sizes = (1 << (vlsm_engine.IPV4_BITS - columns['prefix'].astype(np.int64))).tolist()
+    allocations = []
+    for name, network, prefix, count, rank, size in zip(
+            columns['name'], columns['network'].tolist(), prefixes, hosts,
+            columns['priority'].tolist(), sizes):
+        # Same record as vlsm_engine.make_allocation, built inline for speed
+        allocations.append({
+            'name': name, 'hosts': count, 'priority': priorities[rank], 'network': network,
+            'prefix': prefix, 'size': size, 'available': size - 2,
+            'efficiency': count / (size - 2) * 100,
+        })
+    return allocations
+
+
+_VLAN_FIELDS = ('id', 'name', 'subnet', 'description', 'status')
+
+
+def encode_vlan(vlans):
+    # VLAN ids are kept as entered, so every column is text
+    return encode_table({field: [v.get(field, "") for v in vlans] for field in _VLAN_FIELDS})
+
+
+def decode_vlan(buffer):
+    columns, _ = decode_table(buffer)
+    return [dict(zip(_VLAN_FIELDS, values)) for values in zip(*(columns[f] for f in _VLAN_FIELDS))]
+
+
+def encode_topology(graph, positions=None):
+    """Nodes with type and layout position, edges as node index pairs"""
+    nodes = list(graph)
+    index = {node: i for i, node in enumerate(nodes)}
+    positions = positions or {}
+    xy = np.array([positions.get(n, (np.nan, np.nan)) for n in nodes], dtype='<f8').reshape(-1, 2)
+    edges = np.array([(index[u], index[v]) for u, v in graph.edges()], dtype='<u4').reshape(-1, 2)
+    attributes = [json.dumps(d, separators=(",", ":"), default=str) if d else ""
+                  for _, _, d in graph.edges(data=True)]
+    columns = {
+        'node': [str(n) for n in nodes],
+        'type': [graph.nodes[n].get('type', "device") for n in nodes],
+        'x': xy[:, 0],
+        'y': xy[:, 1],
+        'source': edges[:, 0],
+        'target': edges[:, 1],
+    }
+    if any(attributes):
+        columns['attributes'] = attributes
+    return encode_table(columns)
+
+
+def decode_topology(buffer):
+    """(graph, positions) with positions only for nodes that had one"""
+    columns, _ = decode_table(buffer)
+    nodes = columns['node']
+    graph = nx.Graph()
+    graph.add_nodes_from((node, {'type': node_type}) for node, node_type in zip(nodes, columns['type']))
+    pairs = zip(columns['source'].tolist(), columns['target'].tolist())
+    if 'attributes' in columns:
+        graph.add_edges_from((nodes[u], nodes[v], json.loads(a) if a else {})
+                             for (u, v), a in zip(pairs, columns['attributes']))
+    else:
+        graph.add_edges_from((nodes[u], nodes[v]) for u, v in pairs)
+    positions = {node: (x, y) for node, x, y in zip(nodes, columns['x'].tolist(), columns['y'].tolist())
+                 if x == x}
+    return graph, positions
+
+
+def encode_scans(store):
+    ip, status, rtt, port_row, port = store.columns()
+    return encode_table({'ip': ip.astype('<u4'), 'status': status, 'rtt': rtt.astype('<f4'),
+                         'port_row': port_row.astype('<u4'), 'port': port.astype('<u2')})
+
+
+def decode_scans(buffer):
+    columns, _ = decode_table(buffer)
+    store = scanner.ScanResultStore()
+    store.restore(columns['ip'], columns['status'], columns['rtt'], columns['port_row'], columns['port'])
+    return store
+
+
+def encode_meta(meta):
+    return encode_table({}, extra=meta)
+
+
+def decode_meta(buffer):
+    return decode_table(buffer)[1]
+
+
+_ENCODERS = {'vlsm': encode_vlsm, 'vlan': encode_vlan, 'scans': encode_scans,
+             'topology': lambda value: encode_topology(*value), 'meta': encode_meta}
+_DECODERS = {'vlsm': decode_vlsm, 'vlan': decode_vlan, 'topology': decode_topology, 'scans': decode_scans,
+             'meta': decode_meta}
+
+
+def write_project(path, project):
+    """Write a project dict to path atomically.
+
+    project maps section names to values: 'vlsm' a list of allocations,
+    'vlan' a list of VLAN dicts, 'topology' a (graph, positions) pair and
+    'scans' a ScanResultStore; 'meta' holds bookkeeping such as the
+    journal sequence number. Missing sections are left out.
+    """
+    payloads = [(name, _ENCODERS[name](project[name])) for name in SECTIONS + ('meta',)
+                if project.get(name) is not None]
+    offset = _HEADER.size + _ENTRY.size * len(payloads)
+    directory = []
+    for name, payload in payloads:
+        offset += _pad(offset)
+        directory.append(_ENTRY.pack(name.encode(), offset, len(payload), zlib.crc32(payload)))
+        offset += len(payload)
+
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(payloads)))
+            f.write(b"".join(directory))
+            for name, payload in payloads:
+                f.write(b"\0" * _pad(f.tell()))
+                f.write(payload)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class ProjectFile:
+    """Memory-mapped project file whose sections decode on first access"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            self._file.close()
+            raise ValueError("Not a project file")
+        self._decoded = {}
+        self.sections = {}
+        try:
+            self._read_directory()
+        except (ValueError, struct.error):
+            self.close()
+            raise
+
+    def _read_directory(self):
+        if len(self._map) < _HEADER.size:
+            raise ValueError("Not a project file")
+        magic, version, _, count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a project file")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Project file version {version} is newer than this program supports")
+        self.version = version
+        for i in range(count):
+            name, offset, length, crc = _ENTRY.unpack_from(self._map, _HEADER.size + i * _ENTRY.size)
+            if offset + length > len(self._map):
+                raise ValueError("Project file is truncated")
+            self.sections[name.rstrip(b"\0").decode()] = (offset, length, crc)
+
+    def __contains__(self, name):
+        return name in self.sections
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def section(self, name, default=None):
+        """Decoded value of a section, or default when the file lacks it"""
+        if name in self._decoded:
+            return self._decoded[name]
+        if name not in self.sections:
+            return default
+        offset, length, crc = self.sections[name]
+        view = memoryview(self._map)[offset:offset + length]
+        try:
+            if zlib.crc32(view) != crc:
+                raise ValueError(f"Project section {name} is corrupt")
+            value = _DECODERS[name](view)
+        finally:
+            view.release()
+        self._decoded[name] = value
+        return value
+
+    def close(self):
+        self._decoded.clear()
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+
+def apply_record(project, op, fields, body):
+    """Apply one journal record to a project dict in place"""
+    if op == 'clear':
+        project.clear()
+    elif op == 'vlsm':
+        project['vlsm'] = decode_vlsm(body)
+    elif op == 'vlsm_rows':
+        # Plan rows changed by an undo or redo, like vlan_rows
+        allocations = project.setdefault('vlsm', [])
+        for index, (name, network, prefix, hosts, priority) in fields['rows']:
+            allocation = vlsm_engine.make_allocation(
+                {'name': name, 'hosts': hosts, 'priority': priority}, network, prefix)
+            if index < len(allocations):
+                allocations[index] = allocation
+            else:
+                allocations.append(allocation)
+        del allocations[fields['length']:]
+    elif op == 'vlan':
+        project['vlan'] = fields['vlans']
+    elif op == 'vlan_add':
+        project.setdefault('vlan', []).append(fields['vlan'])
+    elif op == 'vlan_rows':
+        # Rows changed by an undo or redo, in index order, then the new length
+        vlans = project.setdefault('vlan', [])
+        for index, vlan in fields['rows']:
+            if index < len(vlans):
+                vlans[index] = vlan
+            else:
+                vlans.append(vlan)
+        del vlans[fields['length']:]
+    elif op == 'topology':
+        project['topology'] = decode_topology(body)
+    elif op == 'topology_edit':
+        if project.get('topology') is None:
+            project['topology'] = (nx.Graph(), {})
+        graph = project['topology'][0]
+        args = fields['args']
+        if fields['action'] in ('add_node', 'add_edge'):
+            getattr(graph, fields['action'])(*args[:-1], **args[-1])
+        elif fields['action'] == 'remove_node' and args[0] in graph:
+            graph.remove_node(args[0])
+        elif fields['action'] == 'remove_edge' and graph.has_edge(*args):
+            graph.remove_edge(*args)
+    elif op == 'scans_clear':
+        project['scans'] = scanner.ScanResultStore()
+    elif op in ('scan_host', 'scan_port'):
+        if project.get('scans') is None:
+            project['scans'] = scanner.ScanResultStore()
+        if op == 'scan_host':
+            project['scans'].append(fields['ip'], fields['status'], fields.get('rtt'))
+        else:
+            project['scans'].add_port(fields['ip'], fields['port'], fields.get('rtt'))
+    else:
+        raise ValueError(f"Unknown journal record {op}")
+
+
+def read_journal(path):
+    """Yield (sequence, op, fields, body) for each intact journal record.
+
+    Reading stops at the first short or corrupt record: that is where a
+    crash interrupted a write, and nothing after it was acknowledged.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        while True:
+            head = f.read(_FRAME.size)
+            if len(head) < _FRAME.size:
+                return
+            crc, fields_length, body_length, sequence = _FRAME.unpack(head)
+            data = f.read(fields_length + body_length)
+            if len(data) < fields_length + body_length or zlib.crc32(head[4:] + data) != crc:
+                return
+            record = json.loads(data[:fields_length])
+            yield sequence, record.pop('op'), record, data[fields_length:]
+
+
+def journal_path(project_path):
+    return project_path + ".journal"
+
+
+def _journaled_sequence(project_path):
+    """Sequence number the project file already includes"""
+    if not os.path.exists(project_path):
+        return 0
+    with ProjectFile(project_path) as project_file:
+        return project_file.section('meta', {}).get('sequence', 0)
+
+
+def pending_records(project_path):
+    """Number of journal records not yet compacted into the project file"""
+    done = _journaled_sequence(project_path)
+    return sum(1 for sequence, _, _, _ in read_journal(journal_path(project_path)) if sequence > done)
+
+
+def recover(project_path):
+    """(project dict, records replayed): the file plus every newer journal record"""
+    project = load_project(project_path) if os.path.exists(project_path) else {}
+    done = project.pop('meta', {}).get('sequence', 0)
+    replayed = 0
+    for sequence, op, fields, body in read_journal(journal_path(project_path)):
+        if sequence > done:
+            apply_record(project, op, fields, body)
+            replayed += 1
+    return project, replayed
+
+
+class ProjectJournal:
+    """Append-only edit log next to a binary project file.
+
+    record() only queues a frame; a background thread writes and fsyncs
+    the queue every flush_interval seconds. compact() folds the journal
+    into the project file and can run on any thread.
+    """
+
+    def __init__(self, project_path, flush_interval=1.0):
+        self.project_path = project_path
+        self.path = journal_path(project_path)
+        self.sequence = _journaled_sequence(project_path)
+        for sequence, _, _, _ in read_journal(self.path):
+            self.sequence = max(self.sequence, sequence)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._file = open(self.path, "ab")
+        self.size = self._file.tell()
+        self.closed = False
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, args=(flush_interval,), daemon=True)
+        self._flusher.start()
+
+    def record(self, op, body=b"", **fields):
+        """Queue one edit; fields must be JSON-able, body raw bytes"""
+        encoded = json.dumps(dict(fields, op=op), separators=(",", ":"), default=str).encode()
+        with self._lock:
+            self.sequence += 1
+            head = _FRAME.pack(0, len(encoded), len(body), self.sequence)[4:]
+            crc = zlib.crc32(body, zlib.crc32(encoded, zlib.crc32(head)))
+            self._pending.append(struct.pack("<I", crc) + head + encoded + body)
+
+    def flush(self):
+        """Write and fsync every queued record"""
+        with self._lock:
+            self._write_pending()
+
+    def _write_pending(self):
+        if not self._pending or self._file.closed:
+            return
+        data = b"".join(self._pending)
+        self._pending = []
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.size += len(data)
+
+    def _flush_loop(self, interval):
+        while not self._closed.wait(interval):
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def mark(self):
+        """(sequence, journal size) to pass to compact with a snapshot taken now"""
+        with self._lock:
+            self._write_pending()
+            return self.sequence, self.size
+
+    def compact(self, project, mark):
+        """Write project (a snapshot taken at mark) and trim the journal to later records"""
+        sequence, offset = mark
+        with self._lock:
+            if self.closed:
+                return
+            project_path, path = self.project_path, self.path
+        write_project(project_path, dict(project, meta={'sequence': sequence}))
+        with self._lock:
+            # Closed or moved by save_as meanwhile: the mark no longer applies here
+            if self.closed or self.path != path:
+                return
+            self._write_pending()
+            self._file.close()
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                rest = f.read()
+            folder = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(rest)
+            os.replace(temp_path, self.path)
+            self._file = open(self.path, "ab")
+            self.size = len(rest)
+
+    def save_as(self, project_path, project):
+        """Write project to a new file and continue journaling next to it"""
+        with self._lock:
+            self._pending = []
+            self._file.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.project_path = project_path
+            self.path = journal_path(project_path)
+            write_project(project_path, dict(project, meta={'sequence': self.sequence}))
+            self._file = open(self.path, "wb")
+            self.size = 0
+
+    def reset(self):
+        """Drop every record, e.g. after the project was saved or discarded"""
+        with self._lock:
+            self._pending = []
+            self._file.truncate(0)
+            self._file.seek(0)
+            self.size = 0
+
+    def close(self, remove=False):
+        self._closed.set()
+        with self._lock:
+            self.closed = True
+            self._write_pending()
+            self._file.close()
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def project_to_json(project):
+    """Original JSON project layout for a project dict"""
+    data = {
+        "vlsm_data": [list(vlsm_engine.allocation_row(a)) + [a['priority']] for a in project.get('vlsm') or []],
+        "vlan_data": project.get('vlan') or [],
+        "network_config": {},
+    }
+    if project.get('topology') is not None:
+        graph, _ = project['topology']
+        data["topology"] = {
+            "nodes": [[str(n), d.get('type', "device")] for n, d in graph.nodes(data=True)],
+            "edges": [[str(u), str(v), d] for u, v, d in graph.edges(data=True)],
+        }
+    return data
+
+
+def project_from_json(data):
+    """Project dict from the JSON layout; unreadable VLSM rows are skipped"""
+    allocations = []
+    for row in data.get("vlsm_data", []):
+        try:
+            allocations.append(vlsm_engine.allocation_from_row(row))
+        except (ValueError, IndexError):
+            pass
+    project = {'vlsm': allocations, 'vlan': data.get("vlan_data", [])}
+    if "topology" in data:
+        graph = nx.Graph()
+        graph.add_nodes_from((name, {'type': node_type}) for name, node_type in data["topology"]["nodes"])
+        graph.add_edges_from((u, v, attrs) for u, v, attrs in data["topology"]["edges"])
+        project['topology'] = (graph, {})
+    return project
+
+
+def load_project(path):
+    """Every section of a binary or JSON project as a project dict"""
+    if not path.lower().endswith(EXTENSION):
+        with open(path) as f:
+            return project_from_json(json.load(f))
+    with ProjectFile(path) as project_file:
+        return {name: project_file.section(name) for name in project_file.sections if name in _DECODERS}
+
+
+def save_project(path, project):
+    """Write a project dict as JSON or binary depending on the extension"""
+    if path.lower().endswith(EXTENSION):
+        write_project(path, project)
+    else:
+        with open(path, 'w') as f:
+            json.dump(project_to_json(project), f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and convert VLSM Wizard project files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info", help="List the sections of a binary project")
+    info.add_argument("project")
+    convert = commands.add_parser("convert", help="Convert between JSON and binary projects")
+    convert.add_argument("source")
+    convert.add_argument("target")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        with ProjectFile(args.project) as project_file:
+            print(f"Format version {project_file.version}")
+            for name, (offset, length, _) in project_file.sections.items():
+                print(f"{name:<10} {length:>12,} bytes at {offset:,}")
+        return 0
+
+    save_project(args.target, load_project(args.source))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Streaming import of VLSM subnet requirements.
+
+Reads name/hosts/priority records from CSV, TSV, JSON lines, JSON arrays
+or Excel workbooks one record at a time, validates them in chunks and
+reports bad records by line (or spreadsheet row) number. Files are never
+loaded whole, so large inputs are parsed in bounded memory.
+
+Command line:
+    python requirements_io.py 10.0.0.0/8 requirements.csv > plan.csv
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+import vlsm_engine
+
+# Excel support is optional (install: pip install openpyxl)
+try:
+    from openpyxl import load_workbook
+
+    EXCEL_AVAILABLE = True
+except ImportError:
+    EXCEL_AVAILABLE = False
+
+READ_SIZE = 1 << 16
+FILE_TYPES = [
+    ("Requirement files", "*.csv *.tsv *.jsonl *.ndjson *.json *.xlsx *.xlsm"),
+    ("CSV files", "*.csv"),
+    ("JSON lines", "*.jsonl *.ndjson"),
+    ("JSON files", "*.json"),
+    ("Excel workbooks", "*.xlsx *.xlsm"),
+]
+
+
+def read_delimited(path, delimiter=","):
+    """Yield (line_number, record) from a CSV or TSV file with a header row"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f, delimiter=delimiter)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def read_json_lines(path):
+    """Yield (line_number, record) from a JSON lines file"""
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, ValueError(f"Invalid JSON: {e.msg}")
+
+
+def read_json_array(path):
+    """Yield (line_number, record) from a top-level JSON array, incrementally"""
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as f:
+        buffer = f.read(READ_SIZE)
+        line_number = 1
+        position = buffer.index("[") + 1
+        line_number += buffer.count("\n", 0, position)
+        eof = False
+
+        while True:
+            # Skip separators between elements
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                if buffer[position] == "\n":
+                    line_number += 1
+                position += 1
+            if position < len(buffer) and buffer[position] == "]":
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if eof:
+                    if buffer[position:].strip():
+                        yield line_number, ValueError(f"Invalid JSON: {e.msg}")
+                    return
+                # The element may continue in the next block
+                more = f.read(READ_SIZE)
+                eof = not more
+                buffer = buffer[position:] + more
+                position = 0
+                continue
+
+            yield line_number, record
+            line_number += buffer.count("\n", position, end)
+            position = end
+            if position > READ_SIZE:
+                buffer = buffer[position:]
+                position = 0
+
+
+def read_excel(path):
+    """Yield (row_number, record) from the first sheet of a workbook"""
+    if not EXCEL_AVAILABLE:
+        raise RuntimeError("Excel import needs openpyxl: pip install openpyxl")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell) if cell is not None else "" for cell in next(rows, ())]
+        for row_number, row in enumerate(rows, 2):
+            if any(cell is not None for cell in row):
+                yield row_number, dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def read_records(path):
+    """Raw (line_number, record) pairs from any supported file type"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return read_excel(path)
+    if extension == ".tsv":
+        return read_delimited(path, "\t")
+    if extension in (".jsonl", ".ndjson"):
+        return read_json_lines(path)
+    if extension == ".json":
+        with open(path, encoding='utf-8') as f:
+            first = f.read(READ_SIZE).lstrip()[:1]
+        return read_json_array(path) if first == "[" else read_json_lines(path)
+    return read_delimited(path)
+
+
+def parse_requirement(record):
+    """Turn a raw record with case-insensitive keys into a requirement"""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("Record is not an object")
+    fields = {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+    hosts = fields.get('hosts')
+    if isinstance(hosts, float) and hosts.is_integer():
+        hosts = int(hosts)
+    priority = str(fields.get('priority') or "Normal").strip().capitalize()
+    return vlsm_engine.normalize_requirement({
+        'name': fields.get('name'), 'hosts': hosts, 'priority': priority
+    })
+
+
+def iter_requirement_chunks(path, chunk_size=10000):
+    """Yield (requirements, errors) per chunk of records.
+
+    errors are 'Line N: message' strings; a name already seen earlier in
+    the file is reported as an error rather than silently merged.
+    """
+    seen = set()
+    requirements, errors = [], []
+    for line_number, record in read_records(path):
+        try:
+            req = parse_requirement(record)
+            if req['name'] in seen:
+                raise ValueError(f"Duplicate subnet name {req['name']}")
+            seen.add(req['name'])
+            requirements.append(req)
+        except ValueError as e:
+            errors.append(f"Line {line_number}: {e}")
+        if len(requirements) + len(errors) >= chunk_size:
+            yield requirements, errors
+            requirements, errors = [], []
+    if requirements or errors:
+        yield requirements, errors
+
+
+def load_requirements(path, chunk_size=10000, max_errors=100, on_progress=None):
+    """Read and validate a whole file.
+
+    Returns (requirements, errors, error_count); only the first max_errors
+    messages are kept. on_progress receives the running record count after
+    each chunk.
+    """
+    requirements, errors = [], []
+    error_count = 0
+    for chunk, chunk_errors in iter_requirement_chunks(path, chunk_size):
+        requirements.extend(chunk)
+        error_count += len(chunk_errors)
+        errors.extend(chunk_errors[:max_errors - len(errors)])
+        if on_progress:
+            on_progress(len(requirements) + error_count)
+    return requirements, errors, error_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan VLSM allocations from a requirements file")
+    parser.add_argument("base_network")
+    parser.add_argument("requirements", help="CSV, TSV, JSON lines, JSON or Excel file")
+    args = parser.parse_args(argv)
+
+    requirements, errors, error_count = load_requirements(args.requirements)
+    for message in errors:
+        print(message, file=sys.stderr)
+    if error_count:
+        print(f"{error_count} invalid records", file=sys.stderr)
+        return 1
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["Name", "Network", "Mask", "Hosts", "Used", "Efficiency", "First", "Last", "Broadcast"])
+    for alloc in vlsm_engine.allocate_vlsm(args.base_network, requirements):
+        writer.writerow(vlsm_engine.allocation_row(alloc))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
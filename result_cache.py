@@ -0,0 +1,182 @@
+"""
+Content-addressed cache for planning results.
+
+Results are keyed by a SHA-256 hash of a canonical JSON encoding of
+everything that determines them (operation name, base network,
+requirements, options). A small in-memory LRU tier answers repeat clicks;
+an optional on-disk tier of pickle files survives restarts and is trimmed
+to a byte budget, least recently used first.
+
+Cached values are shared, not copied: treat them as read-only.
+
+Set VLSMWIZ_CACHE_DIR to enable the disk tier in the GUI.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+CACHE_DIR_ENV = "VLSMWIZ_CACHE_DIR"
+_MISSING = object()
+
+
+def cache_key(kind, **params):
+    """Hex digest identifying an operation and its inputs"""
+    payload = json.dumps([kind, params], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """Two-tier LRU cache: memory first, then an optional directory"""
+
+    def __init__(self, max_entries=64, directory=None, max_disk_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def put(self, key, value):
+        """Store a value in memory and, when enabled, on disk"""
+        self._remember(key, value)
+        if self.directory:
+            self._write(key, value)
+
+    def get_or_compute(self, kind, compute, **params):
+        """Return the cached result for kind/params, computing it on a miss"""
+        key = cache_key(kind, **params)
+        value = self._lookup(key)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        if self.directory:
+            for path, _, _ in self._disk_entries():
+                self._remove(path)
+            with self._lock:
+                self._disk_bytes = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        value = self._read(key) if self.directory else _MISSING
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is not _MISSING:
+            self._remember(key, value)
+        return value
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pickle")
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return _MISSING
+        except Exception:
+            # Truncated files and pickles of classes that have since changed
+            # fail in many ways; all of them are misses that get recomputed
+            self._discard(path)
+            return _MISSING
+        # Access time drives eviction, so touch the file on every hit
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def _write(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see half an entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temp_path, path)
+        except OSError:
+            self._remove(temp_path)
+            return
+        with self._lock:
+            self._disk_bytes += os.path.getsize(path) - old_size
+            over_budget = self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self._evict()
+
+    def _disk_entries(self):
+        """(path, size, mtime) of every entry file"""
+        entries = []
+        for folder in os.scandir(self.directory):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                if entry.name.endswith(".pickle"):
+                    stat = entry.stat()
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        """Delete least recently used files until the tier is within budget"""
+        entries = sorted(self._disk_entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        # Trim to 90% so a burst of writes does not rescan on every put
+        target = self.max_disk_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            self._remove(path)
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    def _discard(self, path):
+        """Delete an unreadable entry and take it off the tier's size"""
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes = max(0, self._disk_bytes - size)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
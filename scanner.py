@@ -0,0 +1,684 @@
+"""
+Asynchronous network scanning engines.
+
+Ping sweeps keep thousands of probes in flight from a single asyncio loop.
+Probes go out over an ICMP socket when the OS allows it (an unprivileged
+datagram socket, or a raw socket when running as root) and otherwise fall
+back to a bounded pool of ping subprocesses. Port scans run non-blocking
+TCP connects with timeouts that adapt to each target's round trip time.
+Both feed a columnar ScanResultStore that views filter, sort and export.
+
+Command line:
+    python scanner.py ping 192.168.1.0/24 [--concurrency 2048] [--timeout 1.0]
+    python scanner.py ports 10.0.0.0/30,10.0.1.5 1-1024,8080 [--concurrency 1000]
+"""
+import argparse
+import asyncio
+import csv
+import ipaddress
+import itertools
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+PROGRESS_INTERVAL = 0.2
+STATUS_NAMES = ("Down", "Up", "Scanned")
+EXPORT_CHUNK = 10000
+RECEIVE_BUFFER = 4 * 1024 * 1024
+
+
+def icmp_checksum(data):
+    """Internet checksum of an ICMP message"""
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(identifier, sequence, payload=b"vlsmwiz-ping"):
+    """ICMP echo request packet"""
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, identifier, sequence)
+    checksum = icmp_checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, identifier, sequence) + payload
+
+
+class IcmpTransport:
+    """Shared ICMP socket that matches echo replies to waiting probes"""
+
+    def __init__(self, raw=False):
+        kind = socket.SOCK_RAW if raw else socket.SOCK_DGRAM
+        self.sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+        self.sock.setblocking(False)
+        # A deep receive queue keeps reply bursts from being dropped
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        except OSError:
+            pass
+        self.raw = raw
+        self.identifier = os.getpid() & 0xFFFF
+        self.sequence = itertools.count()
+        self.pending = {}
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(self.sock.fileno(), self._on_readable)
+
+    def close(self):
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+
+    def _on_readable(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            received = time.perf_counter()
+
+            if self.raw:
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8:
+                continue
+            kind, _, _, identifier, sequence = struct.unpack("!BBHHH", data[:8])
+            # Datagram sockets get their identifier rewritten by the kernel
+            if kind != ICMP_ECHO_REPLY or (self.raw and identifier != self.identifier):
+                continue
+
+            future = self.pending.pop((address[0], sequence), None)
+            if future is not None and not future.done():
+                future.set_result(received)
+
+    async def ping(self, host, timeout):
+        """Round trip time in ms, or None when no reply arrives in time"""
+        sequence = next(self.sequence) & 0xFFFF
+        future = self.loop.create_future()
+        self.pending[(host, sequence)] = future
+        packet = build_echo_request(self.identifier, sequence)
+        try:
+            sent = time.perf_counter()
+            while True:
+                try:
+                    self.sock.sendto(packet, (host, 0))
+                    break
+                except (BlockingIOError, InterruptedError):
+                    await asyncio.sleep(0.001)
+            received = await asyncio.wait_for(future, timeout)
+            return (received - sent) * 1000
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            self.pending.pop((host, sequence), None)
+
+
+def ping_command(host, timeout):
+    """Platform specific single-probe ping command"""
+    if sys.platform.startswith("win"):
+        return ["ping", "-n", "1", "-w", str(int(timeout * 1000)), host]
+    if sys.platform == "darwin":
+        return ["ping", "-c", "1", "-W", str(int(timeout * 1000)), host]
+    return ["ping", "-c", "1", "-W", str(max(1, round(timeout))), host]
+
+
+class SubprocessTransport:
+    """Fallback that runs ping subprocesses, at most limit at a time"""
+
+    def __init__(self, limit=64):
+        self.slots = asyncio.Semaphore(limit)
+
+    def close(self):
+        pass
+
+    async def ping(self, host, timeout):
+        async with self.slots:
+            start = time.perf_counter()
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *ping_command(host, timeout),
+                    stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+            except OSError:
+                return None
+            try:
+                returncode = await asyncio.wait_for(process.wait(), timeout + 1)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                return None
+            if returncode != 0:
+                return None
+            return (time.perf_counter() - start) * 1000
+
+
+def open_transport(method="auto", subprocess_limit=64):
+    """Best available ping transport for this OS and privilege level.
+
+    Must be called with an event loop running.
+    """
+    if method in ("auto", "icmp") and not sys.platform.startswith("win"):
+        for raw in (False, True):
+            try:
+                return IcmpTransport(raw=raw)
+            except OSError:
+                continue
+        if method == "icmp":
+            raise PermissionError("ICMP sockets are not permitted for this user")
+    return SubprocessTransport(subprocess_limit)
+
+
+class PingSweeper:
+    """Concurrent ping sweep over a network range.
+
+    Results are handed to on_result as they arrive as dicts with ip, status
+    and rtt (ms, None when down). on_progress receives (done, total,
+    hosts_per_second) a few times per second and once at the end.
+    """
+
+    def __init__(self, concurrency=2048, timeout=1.0, method="auto", subprocess_limit=64):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.method = method
+        self.subprocess_limit = subprocess_limit
+        self.cancelled = False
+        self.transport_name = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    async def sweep(self, hosts, on_result=None, on_progress=None, total=None):
+        """Ping every host; returns the list of result dicts"""
+        hosts = iter(hosts)
+        results = []
+        done = 0
+        started = last_report = time.perf_counter()
+        transport = open_transport(self.method, self.subprocess_limit)
+        self.transport_name = type(transport).__name__
+
+        async def worker():
+            nonlocal done, last_report
+            for host in hosts:
+                if self.cancelled:
+                    return
+                host = str(host)
+                rtt = await transport.ping(host, self.timeout)
+                result = {'ip': host, 'status': "Up" if rtt is not None else "Down", 'rtt': rtt}
+                results.append(result)
+                done += 1
+                if on_result:
+                    on_result(result)
+                now = time.perf_counter()
+                if on_progress and now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    on_progress(done, total, done / (now - started))
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            transport.close()
+
+        if on_progress:
+            elapsed = time.perf_counter() - started
+            on_progress(done, total, done / elapsed if elapsed else 0.0)
+        return results
+
+
+def sweep_network(network, **options):
+    """Blocking helper: ping every host of a network and return the results"""
+    network = ipaddress.ip_network(network, strict=False)
+    sweeper = PingSweeper(**options)
+    return asyncio.run(sweeper.sweep(network.hosts(), total=max(network.num_addresses - 2, 1)))
+
+
+def parse_ports(text):
+    """Sorted unique ports from a spec such as '22,80,1000-2000'"""
+    ports = set()
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = map(int, part.split("-", 1))
+        else:
+            start = end = int(part)
+        if not 1 <= start <= end <= 65535:
+            raise ValueError(f"Invalid port range: {part}")
+        ports.update(range(start, end + 1))
+    if not ports:
+        raise ValueError("No ports specified")
+    return sorted(ports)
+
+
+def parse_targets(text):
+    """Host address strings from comma separated addresses and CIDR ranges"""
+    hosts = []
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "/" in part:
+            network = ipaddress.ip_network(part, strict=False)
+            hosts.extend(str(h) for h in (network.hosts() if network.num_addresses > 2 else network))
+        else:
+            hosts.append(str(ipaddress.ip_address(part)))
+    if not hosts:
+        raise ValueError("No targets specified")
+    return hosts
+
+
+def descriptor_limit(requested, reserve=64):
+    """Cap concurrency so open sockets stay below the process file limit"""
+    if resource is None:
+        return requested
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return requested
+    return max(1, min(requested, soft - reserve))
+
+
+class AdaptiveTimeout:
+    """Per-target connect timeout derived from observed round trips (RFC 6298 style)"""
+
+    def __init__(self, initial, minimum, maximum):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.srtt = None
+        self.rttvar = None
+        self.backoff = 1
+
+    def observe(self, rtt):
+        self.backoff = 1
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    def timed_out(self):
+        """Double the timeout until the next reply, as RFC 6298 does after a timeout"""
+        if self.value < self.maximum:
+            self.backoff *= 2
+
+    @property
+    def value(self):
+        if self.srtt is None:
+            base = self.initial
+        else:
+            base = max(self.minimum, self.srtt + 4 * self.rttvar)
+        return min(self.maximum, base * self.backoff)
+
+
+class PortScanner:
+    """Concurrent TCP connect scanner over many targets and ports.
+
+    Each probe is reported to on_result as a dict with ip, port, state
+    ('open', 'closed' or 'filtered') and rtt in ms. on_progress receives
+    (done, total, probes_per_second) like the ping sweeper.
+    """
+
+    def __init__(self, concurrency=1000, timeout=1.0, min_timeout=0.2, max_timeout=3.0):
+        self.concurrency = descriptor_limit(concurrency)
+        self.timeout = timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    async def probe(self, host, port, timeout):
+        """Connect once; returns (state, rtt_ms)"""
+        loop = asyncio.get_running_loop()
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (host, port)), timeout)
+            # A loopback connect can land on its own ephemeral port
+            state = "closed" if sock.getsockname() == sock.getpeername() else "open"
+        except ConnectionRefusedError:
+            state = "closed"
+        except (asyncio.TimeoutError, OSError):
+            return "filtered", None
+        finally:
+            sock.close()
+        return state, (time.perf_counter() - start) * 1000
+
+    async def scan(self, hosts, ports, on_result=None, on_progress=None):
+        """Probe every (host, port) pair; returns the open port results"""
+        hosts, ports = list(hosts), list(ports)
+        total = len(hosts) * len(ports)
+        timeouts = {host: AdaptiveTimeout(self.timeout, self.min_timeout, self.max_timeout)
+                    for host in hosts}
+        # Interleave hosts so one slow target does not hold every slot
+        probes = ((host, port) for port in ports for host in hosts)
+        open_ports = []
+        done = 0
+        started = last_report = time.perf_counter()
+
+        async def worker():
+            nonlocal done, last_report
+            for host, port in probes:
+                if self.cancelled:
+                    return
+                timeout = timeouts[host]
+                state, rtt = await self.probe(host, port, timeout.value)
+                if rtt is not None:
+                    timeout.observe(rtt / 1000)
+                elif state == "filtered":
+                    timeout.timed_out()
+                result = {'ip': host, 'port': port, 'state': state, 'rtt': rtt}
+                if state == "open":
+                    open_ports.append(result)
+                done += 1
+                if on_result:
+                    on_result(result)
+                now = time.perf_counter()
+                if on_progress and now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    on_progress(done, total, done / (now - started))
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, total))))
+
+        if on_progress:
+            elapsed = time.perf_counter() - started
+            on_progress(done, total, done / elapsed if elapsed else 0.0)
+        return open_ports
+
+
+class ScanResultStore:
+    """Columnar, append-only store of scan results.
+
+    Hosts live in parallel NumPy columns (uint32 address, uint8 status,
+    float32 RTT in ms, NaN when unknown) that grow by doubling, so appends
+    are amortized O(1). Open ports are a second pair of columns mapping
+    port to host row. Scanner threads append while the UI reads; a lock
+    guards both.
+    """
+
+    def __init__(self, capacity=1024):
+        self._lock = threading.Lock()
+        self.version = 0
+        self.clear(capacity)
+
+    def clear(self, capacity=1024):
+        with self._lock:
+            self.ip = np.zeros(capacity, dtype=np.uint32)
+            self.status = np.zeros(capacity, dtype=np.uint8)
+            self.rtt = np.full(capacity, np.nan, dtype=np.float32)
+            self.port_row = np.zeros(capacity, dtype=np.uint32)
+            self.port = np.zeros(capacity, dtype=np.uint16)
+            self.size = 0
+            self.port_count = 0
+            self._rows = {}
+            self._port_groups = None
+            self.version += 1
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, ip):
+        return self._address(ip) in self._rows
+
+    @staticmethod
+    def _address(ip):
+        if isinstance(ip, int):
+            return ip
+        return struct.unpack("!I", socket.inet_aton(str(ip)))[0]
+
+    @staticmethod
+    def _grown(column, needed, fill=0):
+        if needed <= len(column):
+            return column
+        grown = np.full(max(needed, len(column) * 2), fill, dtype=column.dtype)
+        grown[:len(column)] = column
+        return grown
+
+    def _upsert(self, ip, status, rtt):
+        address = self._address(ip)
+        row = self._rows.get(address)
+        if row is None:
+            row = self.size
+            self.ip = self._grown(self.ip, row + 1)
+            self.status = self._grown(self.status, row + 1)
+            self.rtt = self._grown(self.rtt, row + 1, np.nan)
+            self.ip[row] = address
+            self.status[row] = status
+            self._rows[address] = row
+            self.size += 1
+        if rtt is not None and np.isnan(self.rtt[row]):
+            self.rtt[row] = rtt
+        return row
+
+    def append(self, ip, status, rtt=None):
+        """Record a host result; a repeated address updates its row"""
+        with self._lock:
+            row = self._upsert(ip, STATUS_NAMES.index(status), rtt)
+            self.status[row] = STATUS_NAMES.index(status)
+            self.version += 1
+            return row
+
+    def add_port(self, ip, port, rtt=None):
+        """Record an open port, creating the host row if needed"""
+        with self._lock:
+            row = self._upsert(ip, STATUS_NAMES.index("Scanned"), rtt)
+            # An open port proves the host is reachable even if ping failed
+            if self.status[row] == STATUS_NAMES.index("Down"):
+                self.status[row] = STATUS_NAMES.index("Scanned")
+            index = self.port_count
+            self.port_row = self._grown(self.port_row, index + 1)
+            self.port = self._grown(self.port, index + 1)
+            self.port_row[index] = row
+            self.port[index] = port
+            self.port_count += 1
+            self._port_groups = None
+            self.version += 1
+
+    def columns(self):
+        """Copies of the filled (ip, status, rtt, port_row, port) columns"""
+        with self._lock:
+            return (self.ip[:self.size].copy(), self.status[:self.size].copy(), self.rtt[:self.size].copy(),
+                    self.port_row[:self.port_count].copy(), self.port[:self.port_count].copy())
+
+    def restore(self, ip, status, rtt, port_row, port):
+        """Replace the contents with columns as returned by columns()"""
+        with self._lock:
+            self.ip = np.array(ip, dtype=np.uint32)
+            self.status = np.array(status, dtype=np.uint8)
+            self.rtt = np.array(rtt, dtype=np.float32)
+            self.port_row = np.array(port_row, dtype=np.uint32)
+            self.port = np.array(port, dtype=np.uint16)
+            self.size = len(self.ip)
+            self.port_count = len(self.port)
+            self._rows = {address: row for row, address in enumerate(self.ip.tolist())}
+            self._port_groups = None
+            self.version += 1
+
+    def _groups(self):
+        # Ports sorted by owning row, so each row's ports are one slice
+        if self._port_groups is None:
+            rows = self.port_row[:self.port_count]
+            order = np.lexsort((self.port[:self.port_count], rows))
+            self._port_groups = (rows[order], self.port[:self.port_count][order])
+        return self._port_groups
+
+    def ports_for(self, rows):
+        """List of open port arrays for each row index"""
+        with self._lock:
+            return self._ports_for(rows)
+
+    def _ports_for(self, rows):
+        # Callers hold the lock
+        group_rows, ports = self._groups()
+        rows = np.asarray(rows)
+        starts = np.searchsorted(group_rows, rows, side="left")
+        ends = np.searchsorted(group_rows, rows, side="right")
+        return [ports[a:b] for a, b in zip(starts, ends)]
+
+    def select(self, statuses=None, network=None, sort_by="ip", descending=False):
+        """Row indices matching the filters, ordered by a column.
+
+        statuses is a collection of status names; network an IPv4 network
+        the address must fall in; sort_by one of ip, status, rtt or ports.
+        """
+        with self._lock:
+            n = self.size
+            mask = np.ones(n, dtype=bool)
+            if statuses is not None:
+                codes = [STATUS_NAMES.index(name) for name in statuses]
+                mask &= np.isin(self.status[:n], codes)
+            if network is not None:
+                network = ipaddress.IPv4Network(network, strict=False)
+                netmask = np.uint32(int(network.netmask))
+                mask &= (self.ip[:n] & netmask) == np.uint32(int(network.network_address))
+
+            if sort_by == "ports":
+                key = np.bincount(self.port_row[:self.port_count], minlength=n)[:n]
+            elif sort_by == "rtt":
+                key = np.nan_to_num(self.rtt[:n], nan=np.inf)
+            else:
+                key = getattr(self, sort_by)[:n]
+
+            rows = np.flatnonzero(mask)
+            order = np.argsort(key[rows], kind="stable")
+            if descending:
+                order = order[::-1]
+            return rows[order]
+
+    def records(self, rows):
+        """Plain dict records for the given row indices"""
+        with self._lock:
+            ports = self._ports_for(rows)
+            addresses = self.ip[rows].astype(">u4").tobytes()
+            statuses = self.status[rows].tolist()
+            rtts = self.rtt[rows].tolist()
+        return [
+            {
+                'ip': socket.inet_ntoa(addresses[i * 4:i * 4 + 4]),
+                'status': STATUS_NAMES[statuses[i]],
+                'ports': ports[i].tolist(),
+                'rtt': None if rtts[i] != rtts[i] else rtts[i],
+            }
+            for i in range(len(statuses))
+        ]
+
+    def display_rows(self, rows):
+        """Scan results table values for the given row indices"""
+        values = []
+        for record in self.records(rows):
+            if record['ports']:
+                ports = ", ".join(map(str, record['ports']))
+            elif record['status'] == "Scanned":
+                ports = "None open"
+            else:
+                ports = "N/A"
+            rtt = f"{record['rtt']:.1f}ms" if record['rtt'] is not None else "N/A"
+            values.append((record['ip'], record['status'], ports, rtt))
+        return values
+
+    def export(self, path, rows=None):
+        """Stream rows to CSV, JSON, JSON lines or Parquet chosen by extension"""
+        if rows is None:
+            rows = self.select()
+        extension = os.path.splitext(path)[1].lower()
+        chunks = (self.records(rows[i:i + EXPORT_CHUNK]) for i in range(0, len(rows), EXPORT_CHUNK))
+
+        if extension == ".parquet":
+            if not PARQUET_AVAILABLE:
+                raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+            writer = None
+            try:
+                for chunk in chunks:
+                    table = pa.Table.from_pylist(chunk)
+                    if writer is None:
+                        writer = pq.ParquetWriter(path, table.schema)
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+            return
+
+        with open(path, "w", newline="") as f:
+            if extension == ".csv":
+                writer = csv.writer(f)
+                writer.writerow(["IP", "Status", "Ports", "Response Time (ms)"])
+                for chunk in chunks:
+                    writer.writerows(
+                        (r['ip'], r['status'], " ".join(map(str, r['ports'])),
+                         "" if r['rtt'] is None else f"{r['rtt']:.3f}")
+                        for r in chunk)
+            elif extension == ".jsonl":
+                for chunk in chunks:
+                    f.writelines(json.dumps(r) + "\n" for r in chunk)
+            else:
+                f.write("[")
+                first = True
+                for chunk in chunks:
+                    for record in chunk:
+                        f.write(("" if first else ",\n") + json.dumps(record))
+                        first = False
+                f.write("]\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Network scanning engines")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ping = commands.add_parser("ping", help="Ping sweep a network range")
+    ping.add_argument("network")
+    ping.add_argument("--concurrency", type=int, default=2048)
+    ping.add_argument("--timeout", type=float, default=1.0)
+    ping.add_argument("--method", choices=["auto", "icmp", "subprocess"], default="auto")
+
+    ports = commands.add_parser("ports", help="TCP connect scan of targets and ports")
+    ports.add_argument("targets", help="Comma separated addresses and CIDR ranges")
+    ports.add_argument("ports", help="Ports such as 22,80,1000-2000")
+    ports.add_argument("--concurrency", type=int, default=1000)
+    ports.add_argument("--timeout", type=float, default=1.0)
+
+    args = parser.parse_args(argv)
+
+    def progress(done, total, rate):
+        print(f"{done}/{total} probes, {rate:.0f}/s", file=sys.stderr)
+
+    if args.command == "ports":
+        port_scanner = PortScanner(args.concurrency, args.timeout)
+        found = asyncio.run(port_scanner.scan(
+            parse_targets(args.targets), parse_ports(args.ports), on_progress=progress))
+        for result in sorted(found, key=lambda r: (ipaddress.ip_address(r['ip']), r['port'])):
+            print(f"{result['ip']}\t{result['port']}/tcp\topen\t{result['rtt']:.1f}ms")
+        return 0
+
+    network = ipaddress.ip_network(args.network, strict=False)
+    sweeper = PingSweeper(args.concurrency, args.timeout, args.method)
+
+    def show(result):
+        if result['status'] == "Up":
+            print(f"{result['ip']}\tUp\t{result['rtt']:.1f}ms")
+
+    asyncio.run(sweeper.sweep(network.hosts(), show, progress, max(network.num_addresses - 2, 1)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
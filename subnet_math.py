@@ -0,0 +1,583 @@
+"""
+Vectorized subnet arithmetic.
+
+Batch functions take NumPy arrays of addresses and prefix lengths and return
+every derived column in one pass. IPv4 uses uint32 arrays; IPv6 is carried
+as a pair of uint64 arrays (high and low 64 bits).
+
+Command line:
+    python subnet_math.py decorate export.csv decorated.csv [--column Prefix]
+    python subnet_math.py summarize routes.txt [--tolerance 256]
+"""
+import argparse
+import bisect
+import csv
+import heapq
+import ipaddress
+import socket
+import sys
+
+import numpy as np
+
+IPV4_COLUMNS = ["Network", "Broadcast", "First Host", "Last Host", "Netmask", "Wildcard", "Hosts"]
+
+_ONES64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+_IPV4_PREFIX_SEPARATORS = np.frombuffer(b".../ ", dtype=np.uint8)
+
+
+def parse_ipv4(addresses):
+    """Convert dotted-quad strings to a uint32 array"""
+    packed = b"".join(socket.inet_aton(a.strip()) for a in addresses)
+    return np.frombuffer(packed, dtype=">u4").astype(np.uint32)
+
+
+def parse_ipv4_cidrs(cidrs):
+    """Split 'a.b.c.d/n' strings into (uint32 addresses, uint8 prefixes)"""
+    addresses, prefixes = [], []
+    for cidr in cidrs:
+        address, _, prefix = cidr.strip().partition("/")
+        addresses.append(address)
+        prefixes.append(prefix or "32")
+    prefixes = np.array(prefixes, dtype=np.int64)
+    if prefixes.size and (prefixes.min() < 0 or prefixes.max() > 32):
+        raise ValueError("IPv4 prefix lengths must be between 0 and 32")
+    return parse_ipv4(addresses), prefixes.astype(np.uint8)
+
+
+def format_ipv4(values):
+    """Convert a uint32 array back to dotted-quad strings"""
+    packed = np.asarray(values, dtype=np.uint32).astype(">u4").tobytes()
+    return [socket.inet_ntoa(packed[i:i + 4]) for i in range(0, len(packed), 4)]
+
+
+def prefix_to_netmask(prefixes):
+    """uint32 netmasks for an array of prefix lengths"""
+    host_bits = 32 - np.asarray(prefixes, dtype=np.uint64)
+    masks = np.uint64(0xFFFFFFFF) ^ ((np.uint64(1) << host_bits) - np.uint64(1))
+    return masks.astype(np.uint32)
+
+
+def netmask_to_prefix(masks):
+    """Prefix lengths for an array of uint32 netmasks; rejects non-contiguous masks"""
+    wildcard = ~np.asarray(masks, dtype=np.uint32)
+    if np.any(wildcard & (wildcard + np.uint32(1))):
+        raise ValueError("Subnet masks must be contiguous")
+    host_bits = np.log2(wildcard.astype(np.float64) + 1).astype(np.uint8)
+    return (32 - host_bits).astype(np.uint8)
+
+
+def batch_ipv4(addresses, prefixes):
+    """Derive subnet columns for uint32 addresses and prefix lengths.
+
+    Returns a dict of arrays: network, broadcast, first_host, last_host,
+    netmask, wildcard and host_count. /31 and /32 follow the ipaddress
+    module: every address in them is usable.
+    """
+    addresses = np.asarray(addresses, dtype=np.uint32)
+    prefixes = np.asarray(prefixes, dtype=np.uint8)
+
+    netmask = prefix_to_netmask(prefixes)
+    wildcard = ~netmask
+    network = addresses & netmask
+    broadcast = network | wildcard
+
+    point_to_point = prefixes >= 31
+    one = np.uint32(1)
+    first_host = np.where(point_to_point, network, network + one)
+    last_host = np.where(point_to_point, broadcast, broadcast - one)
+
+    size = wildcard.astype(np.int64) + 1
+    host_count = np.where(point_to_point, size, size - 2)
+
+    return {
+        'network': network,
+        'broadcast': broadcast,
+        'first_host': first_host,
+        'last_host': last_host,
+        'netmask': netmask,
+        'wildcard': wildcard,
+        'host_count': host_count,
+    }
+
+
+def _mask64(bits):
+    """uint64 masks with the given number of leading one bits (0-64)"""
+    bits = np.asarray(bits, dtype=np.uint64)
+    shift = np.minimum(np.uint64(64) - bits, np.uint64(63))
+    return np.where(bits == 0, np.uint64(0), _ONES64 << shift)
+
+
+def split_ipv6(addresses):
+    """Convert IPv6 address strings to (high, low) uint64 arrays"""
+    packed = b"".join(socket.inet_pton(socket.AF_INET6, a.strip()) for a in addresses)
+    words = np.frombuffer(packed, dtype=">u8").astype(np.uint64).reshape(-1, 2)
+    return words[:, 0].copy(), words[:, 1].copy()
+
+
+def format_ipv6(high, low):
+    """Convert (high, low) uint64 arrays back to compressed IPv6 strings"""
+    words = np.empty((len(high), 2), dtype=">u8")
+    words[:, 0] = high
+    words[:, 1] = low
+    packed = words.tobytes()
+    return [socket.inet_ntop(socket.AF_INET6, packed[i:i + 16]) for i in range(0, len(packed), 16)]
+
+
+def batch_ipv6(high, low, prefixes):
+    """Derive subnet columns for IPv6 addresses held as two uint64 halves.
+
+    Returns network, last address and netmask as (high, low) pairs plus
+    host_bits; the address count of each subnet is 2 ** host_bits.
+    """
+    high = np.asarray(high, dtype=np.uint64)
+    low = np.asarray(low, dtype=np.uint64)
+    prefixes = np.asarray(prefixes, dtype=np.int64)
+    if prefixes.size and (prefixes.min() < 0 or prefixes.max() > 128):
+        raise ValueError("IPv6 prefix lengths must be between 0 and 128")
+
+    mask_high = _mask64(np.clip(prefixes, 0, 64))
+    mask_low = _mask64(np.clip(prefixes - 64, 0, 64))
+
+    network_high = high & mask_high
+    network_low = low & mask_low
+
+    return {
+        'network_high': network_high,
+        'network_low': network_low,
+        'last_high': network_high | ~mask_high,
+        'last_low': network_low | ~mask_low,
+        'netmask_high': mask_high,
+        'netmask_low': mask_low,
+        'host_bits': (128 - prefixes).astype(np.uint8),
+    }
+
+
+class SubnetRange:
+    """Lazy view of the subnets of a network at a longer prefix length.
+
+    The Nth subnet is computed directly, so splitting a /32 into /64s costs
+    the same constant memory as splitting a /24 into /26s. The number of
+    subnets is exposed as count because it can exceed what len() allows.
+    """
+
+    def __init__(self, network, new_prefix):
+        if not isinstance(network, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+            network = ipaddress.ip_network(network)
+        if not network.prefixlen < new_prefix <= network.max_prefixlen:
+            raise ValueError("New prefix must be larger than base network prefix")
+        self.network = network
+        self.new_prefix = new_prefix
+        self.count = 1 << (new_prefix - network.prefixlen)
+        self._start = int(network.network_address)
+        self._step = 1 << (network.max_prefixlen - new_prefix)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("subnet index out of range")
+        return self.network.__class__((self._start + index * self._step, self.new_prefix))
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def iter_from(self, index):
+        """Yield subnets starting at index without materializing the rest"""
+        cls, prefix, step = self.network.__class__, self.new_prefix, self._step
+        address = self._start + index * step
+        for _ in range(index, self.count):
+            yield cls((address, prefix))
+            address += step
+
+    def page(self, start, size):
+        """List of at most size subnets beginning at start"""
+        start = max(0, start)
+        end = min(self.count, start + size)
+        return [self[i] for i in range(start, end)]
+
+    def index_of(self, address):
+        """Index of the subnet that contains an address or network"""
+        if isinstance(address, str):
+            address = ipaddress.ip_network(address.strip(), strict=False).network_address
+        elif isinstance(address, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+            address = address.network_address
+        if address not in self.network:
+            raise ValueError(f"{address} is not inside {self.network}")
+        return (int(address) - self._start) // self._step
+
+
+def range_to_prefixes(start, end, bits=32):
+    """Fewest aligned (network, prefixlen) blocks covering start..end inclusive"""
+    blocks = []
+    while start <= end:
+        # Largest block that is aligned at start and does not run past end
+        size = min(start & -start or 1 << bits, 1 << ((end - start + 1).bit_length() - 1))
+        blocks.append((start, bits + 1 - size.bit_length()))
+        start += size
+    return blocks
+
+
+def merge_ipv4_intervals(starts, ends):
+    """Merge overlapping or adjacent intervals held in integer arrays"""
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if not starts.size:
+        return starts, ends
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    new = np.empty(len(starts), dtype=bool)
+    new[0] = True
+    new[1:] = starts[1:] > reach[:-1] + 1
+    first = np.flatnonzero(new)
+    return starts[first], np.maximum.reduceat(ends, first)
+
+
+def merge_sorted_intervals(intervals):
+    """Merge overlapping or adjacent (start, end) pairs arriving in start order"""
+    current = None
+    for start, end in intervals:
+        if current is not None and start <= current[1] + 1:
+            current[1] = max(current[1], end)
+        else:
+            if current is not None:
+                yield tuple(current)
+            current = [start, end]
+    if current is not None:
+        yield tuple(current)
+
+
+def _branch_points(blocks, bits):
+    """Trie branch points between neighbouring blocks, as parallel lists.
+
+    Branch point k splits blocks k and k + 1 and spans blocks first[k] to
+    last[k]. Returns depth, low, size, first, last, parent, leaves and
+    covered lists; IPv4 is computed with NumPy, IPv6 with Python integers.
+    """
+    if bits <= 32:
+        starts = np.array([network for network, _ in blocks], dtype=np.int64)
+        sizes = np.left_shift(1, bits - np.array([length for _, length in blocks], dtype=np.int64))
+        running = np.concatenate(([0], np.cumsum(sizes)))
+        # frexp gives the exact bit length of integers below 2 ** 53
+        depth = bits - np.frexp((starts[:-1] ^ starts[1:]).astype(np.float64))[1].astype(np.int64)
+        size = np.left_shift(1, bits - depth)
+        low = starts[:-1] & ~(size - 1)
+        first = np.searchsorted(starts, low, side="left")
+        last = np.searchsorted(starts, low + size - 1, side="right") - 1
+        count = len(depth)
+
+        # The parent is the deeper of the branch points just outside the span
+        left, right = first - 1, last
+        left_depth = np.where(left >= 0, depth[np.clip(left, 0, count - 1)], -1)
+        right_depth = np.where(right < count, depth[np.clip(right, 0, count - 1)], -1)
+        parent = np.where(left_depth > right_depth, left, np.where(right_depth >= 0, right, -1))
+
+        leaves = last - first + 1
+        covered = running[last + 1] - running[first]
+        return tuple(column.tolist() for column in
+                     (depth, low, size, first, last, parent, leaves, covered))
+
+    starts = [network for network, _ in blocks]
+    running = [0]
+    for _, length in blocks:
+        running.append(running[-1] + (1 << (bits - length)))
+    depth, low, size, first, last, parent = [], [], [], [], [], []
+    for k in range(len(blocks) - 1):
+        length = bits - (starts[k] ^ starts[k + 1]).bit_length()
+        span = 1 << (bits - length)
+        start = starts[k] & ~(span - 1)
+        depth.append(length)
+        low.append(start)
+        size.append(span)
+        first.append(bisect.bisect_left(starts, start, 0, k))
+        last.append(bisect.bisect_right(starts, start + span - 1, k + 1) - 1)
+    count = len(depth)
+    for k in range(count):
+        candidates = [p for p in (first[k] - 1, last[k]) if 0 <= p < count]
+        parent.append(max(candidates, key=lambda p: depth[p]) if candidates else -1)
+    leaves = [last[k] - first[k] + 1 for k in range(count)]
+    covered = [running[last[k] + 1] - running[first[k]] for k in range(count)]
+    return depth, low, size, first, last, parent, leaves, covered
+
+
+def relax_prefixes(blocks, bits, tolerance):
+    """Cover sorted disjoint blocks with fewer prefixes, adding at most tolerance addresses.
+
+    The blocks are the leaves of a binary trie whose branch points are the
+    common prefixes of neighbouring blocks. Collapsing a branch point into
+    a single route saves (leaves - 1) routes for (size - covered) extra
+    addresses; branch points are collapsed greedily, cheapest per route
+    saved first, and each collapse updates only its ancestors.
+    Returns (blocks, extra_addresses).
+    """
+    blocks = list(blocks)
+    if tolerance <= 0 or len(blocks) < 2:
+        return blocks, 0
+
+    count = len(blocks) - 1
+    depth, low, size, first, last, parent, leaves, covered = _branch_points(blocks, bits)
+    collapsed = [False] * count
+    queued = [False] * count
+
+    heap = []
+    for k in range(count):
+        cost = size[k] - covered[k]
+        if cost <= tolerance:
+            heap.append((cost / (leaves[k] - 1), k))
+            queued[k] = True
+    heapq.heapify(heap)
+
+    def inside_collapsed(k):
+        k = parent[k]
+        while k >= 0:
+            if collapsed[k]:
+                return True
+            k = parent[k]
+        return False
+
+    # Heap keys never overstate a branch point's current ratio: improvements
+    # are pushed straight away, while worsened entries are re-queued on pop
+    budget = tolerance
+    while heap:
+        ratio, k = heapq.heappop(heap)
+        queued[k] = False
+        cost = size[k] - covered[k]
+        if cost > budget or collapsed[k] or inside_collapsed(k):
+            continue
+        current = cost / (leaves[k] - 1)
+        if current > ratio:
+            heapq.heappush(heap, (current, k))
+            queued[k] = True
+            continue
+
+        budget -= cost
+        collapsed[k] = True
+        saved = leaves[k] - 1
+        p = parent[k]
+        while p >= 0:
+            before = (size[p] - covered[p]) / (leaves[p] - 1)
+            leaves[p] -= saved
+            covered[p] += cost
+            if leaves[p] > 1:
+                new_cost = size[p] - covered[p]
+                after = new_cost / (leaves[p] - 1)
+                if new_cost <= budget and (after < before or not queued[p]):
+                    heapq.heappush(heap, (after, p))
+                    queued[p] = True
+            p = parent[p]
+
+    # Emit the outermost collapsed branch points and the untouched blocks
+    result = []
+    position = 0
+    for k in sorted((k for k in range(count) if collapsed[k] and not inside_collapsed(k)),
+                    key=lambda k: first[k]):
+        result.extend(blocks[position:first[k]])
+        result.append((low[k], depth[k]))
+        position = last[k] + 1
+    result.extend(blocks[position:])
+    return result, tolerance - budget
+
+
+def summarize_intervals(intervals, bits, tolerance=0):
+    """Summary prefixes for (start, end) intervals sorted by start.
+
+    Returns ([(network, prefixlen)], extra_addresses).
+    """
+    blocks = []
+    for start, end in merge_sorted_intervals(intervals):
+        blocks.extend(range_to_prefixes(start, end, bits))
+    return relax_prefixes(blocks, bits, tolerance)
+
+
+def read_route_chunks(path, chunk_size=200000):
+    """Yield (first_line_number, prefixes) from a routing table file.
+
+    The prefix is the first field containing '/'; blank lines and lines
+    starting with '#' are skipped.
+    """
+    chunk, first = [], 1
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            fields = line.split(None, 1)
+            if not fields or fields[0].startswith("#"):
+                continue
+            prefix = fields[0]
+            if "/" not in prefix:
+                prefix = next((field for field in line.split() if "/" in field), None)
+                if prefix is None:
+                    continue
+            if not chunk:
+                first = line_number
+            chunk.append(prefix)
+            if len(chunk) >= chunk_size:
+                yield first, chunk
+                chunk = []
+    if chunk:
+        yield first, chunk
+
+
+def _parse_ipv4_prefixes(prefixes):
+    """parse_ipv4_cidrs for a large chunk, tokenized by NumPy when well formed"""
+    try:
+        raw = np.frombuffer(" ".join(prefixes).encode("ascii"), dtype=np.uint8)
+    except UnicodeEncodeError:
+        return parse_ipv4_cidrs(prefixes)
+    separators = np.flatnonzero((raw < ord("0")) | (raw > ord("9")))
+    # Strict shape: "a.b.c.d/n" per prefix, so exactly five fields of 1-3 digits each
+    if len(separators) != 5 * len(prefixes) - 1 or \
+            (raw[separators] != np.tile(_IPV4_PREFIX_SEPARATORS, len(prefixes))[:-1]).any():
+        # Anything unusual goes through the strict parser for a proper error
+        return parse_ipv4_cidrs(prefixes)
+    starts = np.concatenate(([0], separators + 1))
+    ends = np.append(separators, len(raw))
+    lengths = ends - starts
+    if (lengths < 1).any() or (lengths > 3).any():
+        return parse_ipv4_cidrs(prefixes)
+    digits = raw - np.uint8(ord("0"))
+    values = digits[ends - 1].astype(np.uint16)
+    values += np.where(lengths > 1, digits[ends - 2], 0).astype(np.uint16) * 10
+    values += np.where(lengths > 2, digits[ends - 3], 0).astype(np.uint16) * 100
+    fields = values.reshape(-1, 5)
+    if (fields[:, :4] > 255).any() or (fields[:, 4] > 32).any():
+        return parse_ipv4_cidrs(prefixes)
+    octets = fields[:, :4].astype(np.uint32)
+    addresses = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+    return addresses, fields[:, 4].astype(np.uint8)
+
+
+def _ipv6_intervals(prefixes):
+    intervals = []
+    for prefix in prefixes:
+        address, _, length = prefix.partition("/")
+        host_bits = 128 - int(length or 128)
+        if not 0 <= host_bits <= 128:
+            raise ValueError(f"{prefix} has an invalid prefix length")
+        start = int.from_bytes(socket.inet_pton(socket.AF_INET6, address), "big") >> host_bits << host_bits
+        intervals.append((start, start + (1 << host_bits) - 1))
+    intervals.sort()
+    return intervals
+
+
+def summarize_chunks(chunks, tolerance=0, tolerance_v6=None):
+    """Summarize IPv4 and IPv6 prefixes arriving as (line_number, prefixes) chunks.
+
+    Each chunk is parsed and sorted on its own; IPv4 chunks are merged with
+    NumPy and IPv6 chunks with a k-way merge. tolerance caps the extra
+    IPv4 addresses a summary may cover, tolerance_v6 (default: tolerance)
+    the extra IPv6 addresses. Returns (routes, extra) where routes are
+    (version, network_int, prefixlen) keys and extra maps version to the
+    extra addresses actually added.
+    """
+    if tolerance_v6 is None:
+        tolerance_v6 = tolerance
+    v4_starts, v4_ends, v6_chunks = [], [], []
+    for line_number, prefixes in chunks:
+        v4 = [p for p in prefixes if ":" not in p]
+        try:
+            if v4:
+                addresses, lengths = _parse_ipv4_prefixes(v4)
+                netmask = prefix_to_netmask(lengths)
+                starts = addresses & netmask
+                v4_starts.append(starts)
+                v4_ends.append(starts | ~netmask)
+            if len(v4) < len(prefixes):
+                v6_chunks.append(_ipv6_intervals(p for p in prefixes if ":" in p))
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Invalid prefix in lines starting at {line_number}: {e}")
+
+    routes, extra = [], {4: 0, 6: 0}
+    if v4_starts:
+        starts, ends = merge_ipv4_intervals(np.concatenate(v4_starts), np.concatenate(v4_ends))
+        # Most merged ranges are already one aligned block; split the rest
+        sizes = ends - starts + 1
+        single = ((sizes & (sizes - 1)) == 0) & ((starts & (sizes - 1)) == 0)
+        lengths = 32 + 1 - np.frexp(sizes.astype(np.float64))[1]
+        blocks = []
+        for start, end, length, is_single in zip(starts.tolist(), ends.tolist(),
+                                                 lengths.tolist(), single.tolist()):
+            if is_single:
+                blocks.append((start, length))
+            else:
+                blocks.extend(range_to_prefixes(start, end, 32))
+        blocks, extra[4] = relax_prefixes(blocks, 32, tolerance)
+        routes.extend((4, network, length) for network, length in blocks)
+    if v6_chunks:
+        blocks, extra[6] = summarize_intervals(heapq.merge(*v6_chunks), 128, tolerance_v6)
+        routes.extend((6, network, length) for network, length in blocks)
+    return routes, extra
+
+
+def summarize_networks(networks, tolerance=0, tolerance_v6=None):
+    """summarize_chunks for an in-memory list of prefix strings"""
+    networks = [str(n).strip() for n in networks if str(n).strip()]
+    return summarize_chunks([(1, networks)], tolerance, tolerance_v6)
+
+
+def format_route(route):
+    """'network/prefixlen' text for a (version, network_int, prefixlen) key"""
+    version, network, length = route
+    if version == 4:
+        return f"{socket.inet_ntoa(network.to_bytes(4, 'big'))}/{length}"
+    return f"{socket.inet_ntop(socket.AF_INET6, network.to_bytes(16, 'big'))}/{length}"
+
+
+def decorate_csv(source, destination, column=None, chunk_size=100000):
+    """Append IPv4 subnet columns to every row of a CSV, chunk by chunk"""
+    with open(source, newline='') as infile, open(destination, 'w', newline='') as outfile:
+        reader = csv.reader(infile)
+        writer = csv.writer(outfile)
+        header = next(reader)
+        index = header.index(column) if column else 0
+        writer.writerow(header + IPV4_COLUMNS)
+
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                _write_decorated(writer, chunk, index)
+                chunk = []
+        if chunk:
+            _write_decorated(writer, chunk, index)
+
+
+def _write_decorated(writer, rows, index):
+    addresses, prefixes = parse_ipv4_cidrs(row[index] for row in rows)
+    result = batch_ipv4(addresses, prefixes)
+    columns = [format_ipv4(result[key]) for key in
+               ('network', 'broadcast', 'first_host', 'last_host', 'netmask', 'wildcard')]
+    columns.append(result['host_count'].tolist())
+    writer.writerows(row + list(values) for row, values in zip(rows, zip(*columns)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch subnet calculator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    decorate = commands.add_parser("decorate", help="Add subnet columns to a CSV of IPv4 prefixes")
+    decorate.add_argument("source")
+    decorate.add_argument("destination")
+    decorate.add_argument("--column", help="Column holding the prefix (default: first)")
+    decorate.add_argument("--chunk-size", type=int, default=100000)
+
+    summarize = commands.add_parser("summarize", help="Summarize a routing table file of prefixes")
+    summarize.add_argument("routes")
+    summarize.add_argument("--tolerance", type=int, default=0,
+                           help="Extra IPv4 addresses the summary may cover")
+    summarize.add_argument("--tolerance-v6", type=int, help="Extra IPv6 addresses (default: --tolerance)")
+    summarize.add_argument("--chunk-size", type=int, default=200000)
+
+    args = parser.parse_args(argv)
+    if args.command == "decorate":
+        decorate_csv(args.source, args.destination, args.column, args.chunk_size)
+        return 0
+
+    routes, extra = summarize_chunks(read_route_chunks(args.routes, args.chunk_size),
+                                     args.tolerance, args.tolerance_v6)
+    sys.stdout.writelines(format_route(route) + "\n" for route in routes)
+    print(f"{len(routes)} routes, {extra[4]} extra IPv4 and {extra[6]} extra IPv6 addresses",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
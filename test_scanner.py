@@ -0,0 +1,57 @@
+"""
+PortScanner against real loopback listeners.
+"""
+import asyncio
+import socket
+
+import pytest
+
+import scanner
+
+
+@pytest.fixture
+def listeners():
+    socks = []
+    for _ in range(3):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(16)
+        socks.append(sock)
+    yield [sock.getsockname()[1] for sock in socks]
+    for sock in socks:
+        sock.close()
+
+
+@pytest.fixture
+def unused_port():
+    # Bound and released, so nothing is listening on it during the scan
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_probe_reports_open_and_closed(listeners, unused_port):
+    port_scanner = scanner.PortScanner(timeout=1.0)
+    state, rtt = asyncio.run(port_scanner.probe("127.0.0.1", listeners[0], 1.0))
+    assert state == "open"
+    assert rtt is not None
+    state, _ = asyncio.run(port_scanner.probe("127.0.0.1", unused_port, 1.0))
+    assert state in ("closed", "filtered")
+
+
+def test_scan_finds_listeners(listeners, unused_port):
+    results = []
+    progress = []
+    ports = listeners + [unused_port]
+    open_ports = asyncio.run(scanner.PortScanner(concurrency=8, timeout=1.0).scan(
+        ["127.0.0.1"], ports, on_result=results.append,
+        on_progress=lambda done, total, rate: progress.append((done, total))))
+
+    assert sorted(r['port'] for r in open_ports) == sorted(listeners)
+    states = {r['port']: r['state'] for r in results}
+    assert set(states) == set(ports)
+    assert all(states[port] == "open" for port in listeners)
+    assert states[unused_port] in ("closed", "filtered")
+    assert progress[-1] == (len(ports), len(ports))
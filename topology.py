@@ -0,0 +1,323 @@
+"""
+Topology layout and drawing for large network graphs.
+
+Layouts are deterministic and cached: TopologyLayout remembers every node's
+position, so redrawing a graph reuses them and only nodes that are new since
+the last call get placed, next to the neighbours they attach to. Tree-shaped
+graphs (such as the router-to-subnet star built from a VLSM plan) and large
+graphs get a radial layout computed in one breadth-first pass; small meshes
+use a seeded spring layout.
+
+Drawing uses one scatter collection per node type and a single
+LineCollection for all edges, so 10,000 nodes render as a handful of
+artists. Labels are only drawn for small graphs (and routers).
+
+Edge lists are read with read_topology_csv in bounded-memory chunks.
+node_prefix finds the address of nodes named by (or tagged with) an IP
+address or network, for the shared prefix index.
+"""
+import math
+import socket
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from matplotlib.collections import LineCollection
+
+import prefix_index
+
+# Graphs with more nodes than this always get the linear-time radial layout
+SPRING_LIMIT = 300
+
+# Above this many nodes only router labels are drawn
+LABEL_LIMIT = 150
+
+# (colour, marker size in points^2) per node type; other types use 'device'
+NODE_STYLES = {
+    'router': ('red', 1000),
+    'group': ('orange', 700),
+    'subnet': ('lightblue', 500),
+    'device': ('lightgray', 300),
+}
+
+_GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+# Edge list columns (matched case-insensitively); any others become edge attributes
+NODE_COLUMNS = {'source': 'Source', 'target': 'Target', 'type': 'Type',
+                'source type': 'Source Type', 'target type': 'Target Type'}
+CSV_CHUNK_ROWS = 100000
+
+# Node attributes that may hold the node's address, checked before its name
+ADDRESS_ATTRIBUTES = ('address', 'subnet', 'ip')
+
+
+def node_prefix(node, data):
+    """Prefix key of a node's address attribute or IP-like name, or None"""
+    for value in [data.get(a) for a in ADDRESS_ATTRIBUTES] + [node]:
+        text = str(value).strip() if value is not None else ""
+        # Cheap test first: most node names are not addresses
+        if not text or not (text[0].isdigit() or ":" in text):
+            continue
+        if "/" not in text:
+            # Plain addresses: inet_pton is strict and much faster than ipaddress
+            family, version, bits = (socket.AF_INET6, 6, 128) if ":" in text else (socket.AF_INET, 4, 32)
+            try:
+                return version, int.from_bytes(socket.inet_pton(family, text), "big"), bits
+            except OSError:
+                continue
+        try:
+            return prefix_index.prefix_key(text)
+        except ValueError:
+            continue
+    return None
+
+
+def pick_root(graph):
+    """Centre for a connected graph's radial layout.
+
+    The router with the most links if there is one; otherwise the middle
+    of a longest path for trees and the best connected node for meshes.
+    """
+    routers = [n for n, t in graph.nodes(data='type') if t == 'router']
+    if routers or not nx.is_tree(graph):
+        return max(routers or graph, key=lambda n: (graph.degree(n), str(n)))
+    # Two breadth-first searches find a longest path in a tree
+    start = min(graph, key=str)
+    far = list(nx.bfs_tree(graph, start))[-1]
+    parents = dict(nx.bfs_predecessors(graph, far))
+    path = [list(parents)[-1] if parents else far]
+    while path[-1] in parents:
+        path.append(parents[path[-1]])
+    return path[len(path) // 2]
+
+
+def radial_tree(graph, root, center=(0.0, 0.0)):
+    """Positions for one connected component on rings around root.
+
+    A breadth-first tree is laid out with each subtree getting an angular
+    wedge proportional to its leaf count and depth giving the ring, which
+    is O(nodes + edges) and keeps siblings together.
+    """
+    parents = {root: None}
+    order = [root]
+    children = {root: []}
+    for node in order:
+        for neighbour in sorted(graph[node], key=str):
+            if neighbour not in parents:
+                parents[neighbour] = node
+                children[node].append(neighbour)
+                children[neighbour] = []
+                order.append(neighbour)
+
+    leaves = {}
+    for node in reversed(order):
+        leaves[node] = sum(leaves[c] for c in children[node]) or 1
+
+    cx, cy = center
+    pos = {root: (cx, cy)}
+    wedges = {root: (0.0, 2 * math.pi)}
+    depth = {root: 0}
+    for node in order:
+        start, span = wedges[node]
+        for child in children[node]:
+            share = span * leaves[child] / leaves[node]
+            wedges[child] = (start, share)
+            depth[child] = depth[node] + 1
+            angle = start + share / 2
+            pos[child] = (cx + depth[child] * math.cos(angle), cy + depth[child] * math.sin(angle))
+            start += share
+    return pos
+
+
+def radial_layout(graph):
+    """Radial layout of every component, components placed side by side"""
+    pos = {}
+    x = 0.0
+    components = sorted(nx.connected_components(graph), key=lambda c: (-len(c), str(min(c, key=str))))
+    for component in components:
+        sub = graph.subgraph(component)
+        part = radial_tree(sub, pick_root(sub))
+        radius = max(math.hypot(px, py) for px, py in part.values())
+        x += radius
+        pos.update((n, (px + x, py)) for n, (px, py) in part.items())
+        x += radius + 1
+    return pos
+
+
+def use_radial(graph):
+    """Whether a graph should get the radial layout rather than a spring layout"""
+    return len(graph) > SPRING_LIMIT or nx.is_forest(graph)
+
+
+class TopologyLayout:
+    """Positions for a graph that persist across redraws"""
+
+    def __init__(self, seed=42):
+        self.seed = seed
+        self.positions = {}
+
+    def reset(self):
+        """Forget every position, e.g. when a different topology is loaded"""
+        self.positions = {}
+
+    def layout(self, graph):
+        """Positions for every node in graph, reusing the cached ones"""
+        for node in [n for n in self.positions if n not in graph]:
+            del self.positions[node]
+        if not graph:
+            return {}
+
+        new = [n for n in graph if n not in self.positions]
+        if not self.positions:
+            if use_radial(graph):
+                self.positions = radial_layout(graph)
+            else:
+                pos = nx.spring_layout(graph, seed=self.seed)
+                self.positions = {n: (float(p[0]), float(p[1])) for n, p in pos.items()}
+        elif new:
+            self._place(graph, new)
+        return self.positions
+
+    def _place(self, graph, new):
+        """Add positions for new nodes without moving the known ones"""
+        spacing = self._spacing(graph)
+        pending = set(new)
+
+        # Nodes attached to placed ones go on a spiral around their neighbour
+        frontier = [n for n in new if any(m in self.positions for m in graph[n])]
+        while frontier:
+            next_frontier = []
+            for node in sorted(frontier, key=str):
+                if node not in pending:
+                    continue
+                anchor = min((m for m in graph[node] if m in self.positions), key=str)
+                count = sum(1 for m in graph[anchor] if m in self.positions)
+                angle = count * _GOLDEN_ANGLE
+                ax, ay = self.positions[anchor]
+                radius = spacing * (0.6 + 0.1 * math.sqrt(count))
+                self.positions[node] = (ax + radius * math.cos(angle), ay + radius * math.sin(angle))
+                pending.discard(node)
+                next_frontier.extend(m for m in graph[node] if m in pending)
+            frontier = next_frontier
+
+        # Whole new components are laid out on their own to the right
+        if pending:
+            rest = radial_layout(graph.subgraph(pending))
+            right = max(x for x, _ in self.positions.values()) + 1
+            left = min(x for x, _ in rest.values())
+            for node, (x, y) in rest.items():
+                self.positions[node] = (x - left + right, y)
+
+        if not use_radial(graph):
+            # Small meshes: settle the new nodes with the known ones pinned
+            fixed = [n for n in graph if n not in new]
+            pos = nx.spring_layout(graph, pos=self.positions, fixed=fixed, seed=self.seed, iterations=30)
+            self.positions = {n: (float(p[0]), float(p[1])) for n, p in pos.items()}
+
+    def _spacing(self, graph):
+        """Typical edge length among already placed nodes"""
+        lengths = []
+        for u, v in graph.edges():
+            if u in self.positions and v in self.positions:
+                (x1, y1), (x2, y2) = self.positions[u], self.positions[v]
+                lengths.append(math.hypot(x1 - x2, y1 - y2))
+                if len(lengths) >= 1000:
+                    break
+        return float(np.median(lengths)) if lengths else 1.0
+
+
+def draw_topology(ax, graph, pos, title="Network Topology"):
+    """Draw graph on ax with collection artists"""
+    ax.clear()
+    ax.set_title(title)
+    ax.axis('off')
+    if not graph:
+        return
+
+    # Shrink markers as the graph grows so nodes stay distinguishable
+    scale = min(1.0, math.sqrt(50 / len(graph)))
+
+    if graph.number_of_edges():
+        segments = np.array([(pos[u], pos[v]) for u, v in graph.edges()], dtype=float)
+        ax.add_collection(LineCollection(segments, colors='gray', linewidths=max(0.3, scale), zorder=1))
+
+    groups = {}
+    for node, data in graph.nodes(data=True):
+        node_type = data.get('type')
+        groups.setdefault(node_type if node_type in NODE_STYLES else 'device', []).append(node)
+    for node_type, nodes in groups.items():
+        color, size = NODE_STYLES[node_type]
+        xy = np.array([pos[n] for n in nodes], dtype=float)
+        ax.scatter(xy[:, 0], xy[:, 1], s=size * scale, c=color, edgecolors='none', zorder=2)
+
+    labelled = graph if len(graph) <= LABEL_LIMIT else groups.get('router', [])
+    for node in labelled:
+        x, y = pos[node]
+        ax.text(x, y, str(node), fontsize=8, ha='center', va='center', zorder=3)
+
+    ax.set_aspect('equal', adjustable='datalim')
+    ax.autoscale_view()
+    ax.margins(0.05)
+
+
+def _column_values(column):
+    """Python values of an attribute column, None for missing cells"""
+    if column.dtype.kind == 'f':
+        present = column.dropna()
+        if len(present) and (present == present.round()).all():
+            # Integer columns with gaps are parsed as float; undo that
+            column = column.astype('Int64')
+    column = column.astype(object)
+    return column.where(column.notna(), None).tolist()
+
+
+def read_topology_csv(path, graph=None, chunk_rows=CSV_CHUNK_ROWS, on_progress=None):
+    """Build a graph from a Source,Target[,Type,...] edge list.
+
+    The file is read chunk_rows rows at a time and each chunk is added with
+    bulk graph calls. Type (or Source Type / Target Type) becomes the node
+    'type' attribute, defaulting to 'device'; every other column, such as
+    link speed, is kept as an edge attribute. Rows without both ends are
+    skipped. on_progress receives the running row count.
+    """
+    graph = nx.Graph() if graph is None else graph
+    header = pd.read_csv(path, nrows=0).columns
+    rename = {col: NODE_COLUMNS.get(col.strip().lower(), col.strip()) for col in header}
+    if 'Source' not in rename.values() or 'Target' not in rename.values():
+        raise ValueError("Topology CSV needs Source and Target columns")
+    text_columns = {col: str for col, name in rename.items() if name in NODE_COLUMNS.values()}
+
+    rows = 0
+    for chunk in pd.read_csv(path, dtype=text_columns, chunksize=chunk_rows):
+        rows += len(chunk)
+        chunk = chunk.rename(columns=rename)
+        chunk['Source'] = chunk['Source'].str.strip()
+        chunk['Target'] = chunk['Target'].str.strip()
+        chunk = chunk[(chunk['Source'].str.len() > 0) & (chunk['Target'].str.len() > 0)]
+        sources = chunk['Source'].tolist()
+        targets = chunk['Target'].tolist()
+
+        default = chunk['Type'].fillna('device') if 'Type' in chunk else pd.Series('device', index=chunk.index)
+        source_types = chunk['Source Type'].fillna(default) if 'Source Type' in chunk else default
+        target_types = chunk['Target Type'].fillna(default) if 'Target Type' in chunk else default
+        # The last row naming a node decides its type, so interleave the two
+        # ends in row order before the later entries overwrite the earlier ones
+        ends = [None] * (2 * len(sources))
+        ends[0::2], ends[1::2] = sources, targets
+        end_types = list(ends)
+        end_types[0::2], end_types[1::2] = source_types.tolist(), target_types.tolist()
+        types = dict(zip(ends, end_types))
+        graph.add_nodes_from((node, {'type': node_type}) for node, node_type in types.items())
+
+        extra = [col for col in chunk.columns if col not in NODE_COLUMNS.values()]
+        if extra:
+            values = [_column_values(chunk[col]) for col in extra]
+            # Missing cells are left out rather than stored as None
+            graph.add_edges_from(
+                (u, v, {k: x for k, x in zip(extra, row) if x is not None})
+                for u, v, row in zip(sources, targets, zip(*values)))
+        else:
+            graph.add_edges_from(zip(sources, targets))
+        if on_progress:
+            on_progress(rows)
+    return graph
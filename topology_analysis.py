@@ -0,0 +1,366 @@
+"""
+Analysis of a network topology graph.
+
+TopologyAnalysis answers hop-count queries from cached breadth-first
+searches, lists articulation points (routers whose failure splits the
+network) and bridges (links whose failure does), and sweeps every single
+router and link failure to report what it breaks.
+
+Results are cached per graph version. Edits made through the analysis
+(add_edge, remove_edge, sync, ...) keep every cached search that the edit
+provably cannot change, e.g. removing a link that is not on any shortest
+path from a source keeps that source's distances.
+
+A failure sweep does not rerun a search per failure. From one search out of
+the root, each failure only disturbs the nodes whose every shortest path
+used the failed element; those are found in distance order and re-reached
+from the undisturbed boundary, so a failure costs time proportional to the
+part of the network it touches. Failures are split across a process pool.
+
+Command line:
+    python topology_analysis.py edges.csv [--root "Core Router"] [--top 20] [--workers N]
+"""
+import argparse
+import heapq
+import multiprocessing
+import os
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+
+import topology
+
+# Sweeps with fewer failures than this run in the calling process
+POOL_THRESHOLD = 2000
+
+FAILURE_COLUMNS = ["Failure", "Element", "Cut Off", "Rerouted", "Extra Hops"]
+
+_worker_state = {}
+
+
+def index_graph(graph):
+    """(nodes, position by node, adjacency lists of positions)"""
+    nodes = list(graph)
+    position = {node: i for i, node in enumerate(nodes)}
+    adjacency = [[position[m] for m in graph[node]] for node in nodes]
+    return nodes, position, adjacency
+
+
+def bfs_distances(adjacency, root):
+    """Hop counts from root, -1 for unreachable nodes"""
+    dist = [-1] * len(adjacency)
+    dist[root] = 0
+    frontier = [root]
+    while frontier:
+        following = []
+        for node in frontier:
+            step = dist[node] + 1
+            for neighbour in adjacency[node]:
+                if dist[neighbour] < 0:
+                    dist[neighbour] = step
+                    following.append(neighbour)
+        frontier = following
+    return dist
+
+
+def simulate_failure(adjacency, dist, failure):
+    """(disconnected, rerouted, max extra hops) when a node or link fails.
+
+    failure is ('node', x) or ('link', (a, b)) in adjacency positions; dist
+    holds hop counts from the root. The failed node itself is not counted.
+    """
+    kind, element = failure
+    if kind == 'node':
+        failed_node, failed_link = element, None
+        if dist[element] == 0:
+            return sum(1 for d in dist if d > 0), 0, 0
+        lost = [m for m in adjacency[element] if dist[m] == dist[element] + 1]
+    else:
+        failed_node, failed_link = None, element
+        a, b = element
+        if dist[a] < 0 or abs(dist[a] - dist[b]) != 1:
+            return 0, 0, 0
+        lost = [b if dist[b] > dist[a] else a]
+
+    def usable(u, v):
+        return v != failed_node and (failed_link is None or {u, v} != set(failed_link))
+
+    # Nodes whose every shortest-path parent failed or was itself disturbed,
+    # settled level by level so parents are decided before their children
+    disturbed = set()
+    levels = {}
+    for node in lost:
+        levels.setdefault(dist[node], set()).add(node)
+    while levels:
+        level = min(levels)
+        for node in levels.pop(level):
+            if any(dist[p] == level - 1 and p not in disturbed and usable(node, p)
+                   for p in adjacency[node]):
+                continue
+            disturbed.add(node)
+            for child in adjacency[node]:
+                if dist[child] == level + 1 and child != failed_node:
+                    levels.setdefault(level + 1, set()).add(child)
+    if not disturbed:
+        return 0, 0, 0
+
+    # Re-reach the disturbed nodes from the undisturbed ones around them
+    best = {}
+    heap = []
+    for node in disturbed:
+        reach = min((dist[p] + 1 for p in adjacency[node]
+                     if p not in disturbed and dist[p] >= 0 and usable(node, p)), default=None)
+        if reach is not None:
+            best[node] = reach
+            heap.append((reach, node))
+    heapq.heapify(heap)
+    while heap:
+        hops, node = heapq.heappop(heap)
+        if best.get(node) != hops:
+            continue
+        for neighbour in adjacency[node]:
+            if neighbour in disturbed and usable(node, neighbour) and hops + 1 < best.get(neighbour, hops + 2):
+                best[neighbour] = hops + 1
+                heapq.heappush(heap, (hops + 1, neighbour))
+
+    disconnected = len(disturbed) - len(best)
+    extra = max((hops - dist[node] for node, hops in best.items()), default=0)
+    return disconnected, len(best), extra
+
+
+def _init_worker(adjacency, dist):
+    _worker_state['adjacency'] = adjacency
+    _worker_state['dist'] = dist
+
+
+def _simulate_many(failures):
+    adjacency, dist = _worker_state['adjacency'], _worker_state['dist']
+    return [simulate_failure(adjacency, dist, failure) for failure in failures]
+
+
+class TopologyAnalysis:
+    """Cached analyses of one graph, kept valid across edits"""
+
+    def __init__(self, graph, max_sources=256, on_edit=None):
+        self.graph = graph
+        self.version = 0
+        # Called as on_edit(action, *args) after each change, e.g. for a journal
+        self.on_edit = on_edit
+        self.max_sources = max_sources
+        self._distances = OrderedDict()
+        self._structure = {}
+
+    # Queries
+
+    def distances(self, source):
+        """node -> hop count from source, for every reachable node"""
+        if source in self._distances:
+            self._distances.move_to_end(source)
+            return self._distances[source]
+        result = nx.single_source_shortest_path_length(self.graph, source)
+        self._distances[source] = result
+        while len(self._distances) > self.max_sources:
+            self._distances.popitem(last=False)
+        return result
+
+    def hop_count(self, source, target):
+        """Links on a shortest path between two nodes, or None if unreachable"""
+        if source not in self.graph or target not in self.graph:
+            raise ValueError(f"Unknown node {source if source not in self.graph else target}")
+        return self.distances(source).get(target)
+
+    def hop_counts(self, nodes):
+        """{(a, b): hops} for every pair of the given nodes"""
+        nodes = list(nodes)
+        return {(a, b): self.hop_count(a, b) for i, a in enumerate(nodes) for b in nodes[i + 1:]}
+
+    def articulation_points(self):
+        """Nodes whose failure splits their part of the network"""
+        if 'articulation' not in self._structure:
+            self._structure['articulation'] = sorted(nx.articulation_points(self.graph), key=str)
+        return self._structure['articulation']
+
+    def bridges(self):
+        """Links whose failure splits their part of the network"""
+        if 'bridges' not in self._structure:
+            self._structure['bridges'] = sorted(nx.bridges(self.graph), key=str)
+        return self._structure['bridges']
+
+    def failure_impact(self, root=None, workers=None):
+        """What every single router or link failure breaks, worst first.
+
+        Impact is measured from root (by default the best connected
+        router) as the nodes cut off from it, the nodes that stay reachable
+        over longer paths, and the largest number of extra hops. Returns
+        dicts with 'kind' ('node' or 'link'), 'element', 'disconnected',
+        'rerouted' and 'extra_hops'.
+        """
+        if not self.graph:
+            return []
+        if root is None:
+            root = topology.pick_root(self.graph)
+        elif root not in self.graph:
+            raise ValueError(f"Unknown node {root}")
+        key = ('failures', root)
+        if key not in self._structure:
+            self._structure[key] = self._sweep(root, workers)
+        return self._structure[key]
+
+    def _sweep(self, root, workers):
+        nodes, position, adjacency = index_graph(self.graph)
+        dist = bfs_distances(adjacency, position[root])
+        failures = [('node', i) for i in range(len(nodes)) if dist[i] >= 0]
+        failures += [('link', (position[u], position[v])) for u, v in self.graph.edges()
+                     if dist[position[u]] >= 0]
+
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(failures) < POOL_THRESHOLD:
+            outcomes = [simulate_failure(adjacency, dist, f) for f in failures]
+        else:
+            size = max(1, len(failures) // (workers * 4))
+            chunks = [failures[i:i + size] for i in range(0, len(failures), size)]
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(adjacency, dist)) as pool:
+                outcomes = [o for part in pool.map(_simulate_many, chunks) for o in part]
+
+        results = []
+        for (kind, element), (disconnected, rerouted, extra) in zip(failures, outcomes):
+            if kind == 'node':
+                element = nodes[element]
+            else:
+                element = (nodes[element[0]], nodes[element[1]])
+            results.append({
+                'kind': kind,
+                'element': element,
+                'disconnected': disconnected,
+                'rerouted': rerouted,
+                'extra_hops': extra,
+            })
+        results.sort(key=lambda r: (-r['disconnected'], -r['rerouted'], -r['extra_hops'], str(r['element'])))
+        return results
+
+    # Edits
+
+    def add_node(self, node, **attributes):
+        """Add a node; an unconnected node changes no cached result"""
+        new = node not in self.graph
+        changed = new or any(self.graph.nodes[node].get(k) != v for k, v in attributes.items())
+        self.graph.add_node(node, **attributes)
+        if new:
+            self.version += 1
+        if changed:
+            self._edited('add_node', node, attributes)
+
+    def remove_node(self, node):
+        for neighbour in list(self.graph[node]):
+            self.remove_edge(node, neighbour)
+        self.graph.remove_node(node)
+        self._distances.pop(node, None)
+        self.version += 1
+        self._edited('remove_node', node)
+
+    def add_edge(self, u, v, **attributes):
+        if self.graph.has_edge(u, v):
+            if any(self.graph.edges[u, v].get(k) != x for k, x in attributes.items()):
+                self.graph.add_edge(u, v, **attributes)
+                self._edited('add_edge', u, v, attributes)
+            return
+        self.graph.add_edge(u, v, **attributes)
+        self.version += 1
+        self._edited('add_edge', u, v, attributes)
+        self._structure.clear()
+        # A new link only shortens paths if its ends were over a hop apart
+        for source in list(self._distances):
+            dist = self._distances[source]
+            du, dv = dist.get(u), dist.get(v)
+            if du is None and dv is None:
+                continue
+            if du is None or dv is None or abs(du - dv) > 1:
+                del self._distances[source]
+
+    def remove_edge(self, u, v):
+        self.graph.remove_edge(u, v)
+        self.version += 1
+        self._structure.clear()
+        self._edited('remove_edge', u, v)
+        # Distances survive unless the link was the far end's only way in
+        for source in list(self._distances):
+            dist = self._distances[source]
+            du, dv = dist.get(u), dist.get(v)
+            if du is None or dv is None or abs(du - dv) != 1:
+                continue
+            near, far = (u, v) if du < dv else (v, u)
+            if not any(dist.get(p) == dist[far] - 1 for p in self.graph[far]):
+                del self._distances[source]
+
+    def sync(self, graph):
+        """Edit the analysed graph until it matches graph, one change at a time"""
+        removed = [e for e in self.graph.edges() if not graph.has_edge(*e)]
+        if len(removed) > graph.number_of_edges():
+            # Mostly a different graph: replacing it beats replaying edits
+            self.graph.clear()
+            self.graph.update(graph)
+            self._distances.clear()
+            self._structure.clear()
+            self.version += 1
+            self._edited('replace', self.graph)
+            return
+        for u, v in removed:
+            self.remove_edge(u, v)
+        for node in [n for n in self.graph if n not in graph]:
+            self.remove_node(node)
+        for node, data in graph.nodes(data=True):
+            self.add_node(node, **data)
+        for u, v, data in graph.edges(data=True):
+            self.add_edge(u, v, **data)
+
+    def _edited(self, action, *args):
+        if self.on_edit is not None:
+            self.on_edit(action, *args)
+
+
+def failure_row(result):
+    """Display values for a failure_impact result, in FAILURE_COLUMNS order"""
+    if result['kind'] == 'node':
+        kind, element = "Node", str(result['element'])
+    else:
+        kind, element = "Link", f"{result['element'][0]} - {result['element'][1]}"
+    return (kind, element, f"{result['disconnected']:,}", f"{result['rerouted']:,}", result['extra_hops'])
+
+
+def describe_failure(result):
+    """One line summary of a failure_impact result"""
+    if result['kind'] == 'node':
+        what = f"Router/node {result['element']}"
+    else:
+        what = f"Link {result['element'][0]} - {result['element'][1]}"
+    if not result['disconnected'] and not result['rerouted']:
+        return f"{what}: no impact"
+    parts = []
+    if result['disconnected']:
+        count = result['disconnected']
+        parts.append(f"{count:,} node{'s' if count != 1 else ''} cut off")
+    if result['rerouted']:
+        parts.append(f"{result['rerouted']:,} rerouted (+{result['extra_hops']} hops worst case)")
+    return f"{what}: {', '.join(parts)}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Single-failure impact analysis of a topology")
+    parser.add_argument("edges", help="CSV edge list with Source and Target columns")
+    parser.add_argument("--root", help="Node that reachability is measured from")
+    parser.add_argument("--top", type=int, default=20, help="Number of worst failures to list")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    analysis = TopologyAnalysis(topology.read_topology_csv(args.edges))
+    print(f"{len(analysis.articulation_points()):,} articulation points, {len(analysis.bridges()):,} bridges")
+    for result in analysis.failure_impact(args.root, args.workers)[:args.top]:
+        print(describe_failure(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
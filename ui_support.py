@@ -0,0 +1,306 @@
+"""
+Tk helpers shared by the calculator tabs.
+"""
+import queue
+import threading
+import time
+import traceback
+import tkinter as tk
+from tkinter import ttk
+
+
+class UIEventQueue:
+    """Hands work from background threads to the Tk main loop.
+
+    Tk is not thread-safe, so workers never touch widgets themselves: they
+    post(callback, *args) and the queue runs the callbacks on a root.after
+    tick. Each tick drains as much as fits in a small time budget, so
+    thousands of queued row inserts land in one redraw instead of one per
+    row, and the rest wait for the next frame. post_latest() keeps only the
+    newest call per key, which suits progress readouts.
+    """
+
+    def __init__(self, root, interval_ms=16, budget_ms=10):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.budget = budget_ms / 1000
+        self._events = queue.SimpleQueue()
+        self._latest = {}
+        self._latest_lock = threading.Lock()
+        self._schedule()
+
+    def post(self, callback, *args, **kwargs):
+        """Run callback(*args, **kwargs) on the UI thread"""
+        self._events.put((callback, args, kwargs))
+
+    def post_latest(self, key, callback, *args):
+        """Like post, but superseded by any later call with the same key"""
+        with self._latest_lock:
+            self._latest[key] = (callback, args)
+
+    def _schedule(self):
+        self.root.after(self.interval_ms, self._drain)
+
+    def _run(self, callback, args, kwargs=None):
+        try:
+            callback(*args, **(kwargs or {}))
+        except Exception:
+            traceback.print_exc()
+
+    def _drain(self):
+        deadline = time.perf_counter() + self.budget
+        with self._latest_lock:
+            latest, self._latest = self._latest, {}
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    callback, args, kwargs = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                self._run(callback, args, kwargs)
+            for callback, args in latest.values():
+                self._run(callback, args)
+        finally:
+            self._schedule()
+
+
+class ResultBatcher:
+    """Collects results on one worker thread and posts them to the UI in batches.
+
+    callback(items) runs on the UI thread with up to max_items results, at
+    most every interval seconds while results keep coming. Call flush()
+    when the worker is done so the last partial batch is delivered.
+    """
+
+    def __init__(self, ui_queue, callback, max_items=1000, interval=0.05):
+        self.ui_queue = ui_queue
+        self.callback = callback
+        self.max_items = max_items
+        self.interval = interval
+        self._items = []
+        self._last = time.perf_counter()
+
+    def add(self, item):
+        self._items.append(item)
+        if len(self._items) >= self.max_items or time.perf_counter() - self._last >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self._last = time.perf_counter()
+        if self._items:
+            items, self._items = self._items, []
+            self.ui_queue.post(self.callback, items)
+
+
+class _ScrollWindow:
+    """Scrolling for widgets that show a window of page_size rows at offset"""
+
+    row_count = 0
+    offset = 0
+    page_size = 1
+
+    def scroll_to(self, index):
+        """Show the given row at the top of the window"""
+        self.offset = max(0, min(index, self.row_count - self.page_size))
+        self.refresh()
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.offset + rows)
+
+    def _update_scrollbar(self):
+        if self.row_count:
+            first = self.offset / self.row_count
+            last = min(1.0, (self.offset + self.page_size) / self.row_count)
+        else:
+            first, last = 0.0, 1.0
+        self.scrollbar.set(first, last)
+
+    def _on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.row_count))
+        elif unit == "pages":
+            self.scroll_by(int(amount) * self.page_size)
+        else:
+            self.scroll_by(int(amount))
+
+    def _on_wheel(self, event):
+        self.scroll_by(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", lambda e: self.scroll_by(-3) or "break")
+        widget.bind("<Button-5>", lambda e: self.scroll_by(3) or "break")
+
+
+class VirtualTable(_ScrollWindow):
+    """Treeview that only holds the rows currently on screen.
+
+    Rows come from fetch_rows(start, count), so the backing data can be a
+    lazy generator, a list or anything indexable. The scrollbar is driven by
+    the table instead of the Treeview, which lets row_count go far beyond
+    what Tk could hold as items.
+    """
+
+    def __init__(self, parent, columns, page_size=25, sort_command=None, horizontal=False):
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings", height=page_size)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scroll)
+        self.tree.configure(yscrollcommand=lambda first, last: None)
+
+        # Sorting happens on the model; the heading only reports the click
+        for col in columns:
+            if sort_command:
+                self.tree.heading(col, text=col, command=lambda c=col: sort_command(c))
+            else:
+                self.tree.heading(col, text=col)
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        if horizontal:
+            h_scroll = ttk.Scrollbar(self.frame, orient="horizontal", command=self.tree.xview)
+            self.tree.configure(xscrollcommand=h_scroll.set)
+            h_scroll.grid(row=1, column=0, sticky="ew")
+        self.frame.grid_rowconfigure(0, weight=1)
+        self.frame.grid_columnconfigure(0, weight=1)
+
+        self.page_size = page_size
+        self.row_count = 0
+        self.offset = 0
+        self.fetch_rows = lambda start, count: []
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.tree)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def set_source(self, row_count, fetch_rows, keep_position=False):
+        """Point the table at new data, from the top unless keep_position"""
+        self.row_count = row_count
+        self.fetch_rows = fetch_rows
+        if keep_position:
+            self.scroll_to(self.offset)
+        else:
+            self.offset = 0
+            self.refresh()
+
+    def clear(self):
+        self.set_source(0, lambda start, count: [])
+
+    def row_at(self, y):
+        """Index of the data row at a y position in the tree, or None"""
+        item = self.tree.identify_row(y)
+        if not item:
+            return None
+        return self.offset + self.tree.index(item)
+
+    def refresh(self):
+        """Fetch the visible window and reuse existing items to display it"""
+        rows = self.fetch_rows(self.offset, self.page_size) if self.row_count else []
+        items = self.tree.get_children()
+
+        for item, values in zip(items, rows):
+            self.tree.item(item, values=values)
+        for values in rows[len(items):]:
+            self.tree.insert("", "end", values=values)
+        if len(items) > len(rows):
+            self.tree.delete(*items[len(rows):])
+
+        self._update_scrollbar()
+
+    def _on_resize(self, event):
+        row_height = ttk.Style().lookup("Treeview", "rowheight") or 20
+        page_size = max(1, (event.height - 25) // int(row_height))
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.scroll_to(self.offset)
+
+
+class VirtualGrid(_ScrollWindow):
+    """Editable grid that builds widgets only for the rows on screen.
+
+    The data is a plain list of dicts (self.rows). A fixed pool of widget
+    rows is re-pointed at different model rows while scrolling, and every
+    edit is written straight back to the model, so the grid costs the same
+    whether it holds 10 rows or 100,000.
+
+    columns is a sequence of (key, heading, width, choices); choices is a
+    list for a combobox column or None for a plain entry.
+    """
+
+    def __init__(self, parent, columns, visible_rows=12):
+        self.frame = ttk.Frame(parent)
+        self.columns = columns
+        self.page_size = visible_rows
+        self.rows = []
+        self.offset = 0
+        self._loading = False
+
+        ttk.Label(self.frame, text="#").grid(row=0, column=0, padx=2)
+        for col, (_, heading, _, _) in enumerate(columns, 1):
+            ttk.Label(self.frame, text=heading).grid(row=0, column=col, padx=5)
+
+        self._pool = []
+        for slot_index in range(visible_rows):
+            slot = {'index': None, 'vars': {}, 'widgets': []}
+            number = ttk.Label(self.frame, width=6, anchor="e")
+            slot['number'] = number
+            slot['widgets'].append(number)
+            for key, _, width, choices in columns:
+                var = tk.StringVar()
+                if choices is None:
+                    widget = ttk.Entry(self.frame, textvariable=var, width=width)
+                else:
+                    widget = ttk.Combobox(self.frame, textvariable=var, values=choices, width=width)
+                var.trace_add("write", lambda *args, slot=slot, key=key: self._on_edit(slot, key))
+                slot['vars'][key] = var
+                slot['widgets'].append(widget)
+                self._bind_wheel(widget)
+            self._pool.append(slot)
+
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scroll)
+        self.scrollbar.grid(row=1, column=len(columns) + 1, rowspan=visible_rows, sticky="ns")
+        self._bind_wheel(self.frame)
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def set_rows(self, rows):
+        """Show a new model list from the top"""
+        self.rows = rows
+        self.offset = 0
+        self.refresh()
+
+    def refresh(self):
+        """Point the widget pool at the model rows in the current window"""
+        self._loading = True
+        try:
+            for position, slot in enumerate(self._pool):
+                index = self.offset + position
+                if index < len(self.rows):
+                    slot['index'] = index
+                    slot['number'].configure(text=str(index + 1))
+                    for key, var in slot['vars'].items():
+                        var.set(self.rows[index].get(key, ""))
+                    for col, widget in enumerate(slot['widgets']):
+                        widget.grid(row=position + 1, column=col, padx=2, pady=1)
+                else:
+                    slot['index'] = None
+                    for widget in slot['widgets']:
+                        widget.grid_remove()
+        finally:
+            self._loading = False
+        self._update_scrollbar()
+
+    def _on_edit(self, slot, key):
+        if self._loading or slot['index'] is None:
+            return
+        self.rows[slot['index']][key] = slot['vars'][key].get()
@@ -0,0 +1,167 @@
+"""
+Subnet utilization bar chart that redraws incrementally.
+
+Bars are created once and then updated in place. When only bar heights or
+colours change, the chart restores a cached background and blits the axes
+area instead of redrawing the whole figure; the full draw (and layout) only
+happens when the bars themselves change. Above max_bars subnets the chart
+switches to mean efficiency per prefix length, so it stays readable and the
+number of artists stays bounded; change() adjusts those per-prefix totals
+by just the rows that changed. Updates are debounced so a burst of edits
+costs a single redraw.
+"""
+
+# Efficiency thresholds (percent) and their bar colours, highest first
+COLOR_BANDS = ((80, 'green'), (60, 'yellow'), (0, 'red'))
+
+
+def efficiency_color(efficiency):
+    """Bar colour for an efficiency percentage"""
+    for threshold, color in COLOR_BANDS:
+        if efficiency >= threshold:
+            return color
+    return COLOR_BANDS[-1][1]
+
+
+def prefix_totals(allocations, totals=None, sign=1):
+    """Add (or with sign=-1 take away) allocations in prefix -> [count, efficiency sum]"""
+    totals = {} if totals is None else totals
+    for alloc in allocations:
+        total = totals.setdefault(alloc['prefix'], [0, 0.0])
+        total[0] += sign
+        total[1] += sign * alloc['efficiency']
+        if not total[0]:
+            del totals[alloc['prefix']]
+    return totals
+
+
+def prefix_bins(allocations, totals=None):
+    """(labels, mean efficiencies) per prefix length, shortest prefix first"""
+    if totals is None:
+        totals = prefix_totals(allocations)
+    labels, values = [], []
+    for prefix in sorted(totals):
+        count, efficiency = totals[prefix]
+        labels.append(f"/{prefix}\n({count:,})")
+        values.append(efficiency / count)
+    return labels, values
+
+
+class UtilizationChart:
+    """Efficiency chart on a matplotlib figure embedded in Tk"""
+
+    def __init__(self, figure, canvas, max_bars=40, delay_ms=150):
+        self.figure = figure
+        self.canvas = canvas
+        self.ax = figure.add_subplot(111)
+        self.max_bars = max_bars
+        self.delay_ms = delay_ms
+        self.aggregated = False
+        self._bars = []
+        self._labels = []
+        self._background = None
+        self._pending = None
+        self._allocations = []
+        self._totals = None
+
+        self.ax.set_ylabel('Efficiency %')
+        self.ax.set_ylim(0, 100)
+        self._set_title()
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def update(self, allocations):
+        """Schedule a redraw for allocations, replacing any pending one"""
+        self._allocations = allocations
+        self._totals = None
+        self._schedule()
+
+    def change(self, allocations, removed, added):
+        """Like update, when only the rows removed were replaced by the rows added"""
+        self._allocations = allocations
+        if self._totals is not None:
+            prefix_totals(removed, self._totals, -1)
+            prefix_totals(added, self._totals)
+        self._schedule()
+
+    def _schedule(self):
+        widget = self.canvas.get_tk_widget()
+        if self._pending is not None:
+            widget.after_cancel(self._pending)
+        self._pending = widget.after(self.delay_ms, self.render)
+
+    def render(self):
+        """Bring the chart up to date with the latest allocations now"""
+        self._pending = None
+        allocations = self._allocations
+        aggregated = len(allocations) > self.max_bars
+        if aggregated:
+            if self._totals is None:
+                self._totals = prefix_totals(allocations)
+            labels, values = prefix_bins(allocations, self._totals)
+        else:
+            labels = [a['name'] for a in allocations]
+            values = [a['efficiency'] for a in allocations]
+
+        if len(labels) != len(self._bars) or aggregated != self.aggregated:
+            self._rebuild(labels, aggregated)
+        elif labels != self._labels:
+            # Same bars, new tick labels: these lie outside the axes area
+            self._labels = labels
+            self.ax.set_xticks(range(len(labels)), labels)
+            self._set_heights(values)
+            self.canvas.draw_idle()
+            return
+
+        self._set_heights(values)
+        if self._background is None:
+            self.canvas.draw_idle()
+        else:
+            self._blit()
+
+    def _rebuild(self, labels, aggregated):
+        for bar in self._bars:
+            bar.remove()
+        self.aggregated = aggregated
+        self._labels = labels
+        self._bars = list(self.ax.bar(range(len(labels)), [0] * len(labels)))
+        for bar in self._bars:
+            # Animated artists are skipped by full draws and blitted instead
+            bar.set_animated(True)
+        self.ax.set_xticks(range(len(labels)), labels)
+        self.ax.tick_params(axis='x', rotation=45 if len(labels) > 5 and not aggregated else 0)
+        self.ax.set_xlim(-0.5, max(len(labels), 1) - 0.5)
+        self._set_title()
+        self._background = None
+        self.figure.tight_layout()
+
+    def _set_title(self):
+        if self.aggregated:
+            count = len(self._allocations)
+            self.ax.set_title(f'Mean Efficiency by Prefix Length ({count:,} subnets)')
+        else:
+            self.ax.set_title('Subnet Utilization Efficiency')
+
+    def _set_heights(self, values):
+        for bar, value in zip(self._bars, values):
+            bar.set_height(value)
+            bar.set_color(efficiency_color(value))
+        if self.aggregated:
+            # The subnet count in the title is the only other thing that moves
+            title = self.ax.title.get_text()
+            self._set_title()
+            if self.ax.title.get_text() != title:
+                self._background = None
+
+    def _on_draw(self, event):
+        """Cache the static chart after each full draw, then add the bars"""
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_bars()
+
+    def _blit(self):
+        self.canvas.restore_region(self._background)
+        self._draw_bars()
+        self.canvas.blit(self.ax.bbox)
+
+    def _draw_bars(self):
+        for bar in self._bars:
+            self.ax.draw_artist(bar)
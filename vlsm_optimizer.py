@@ -0,0 +1,253 @@
+"""
+Search for better VLSM layouts than the single greedy pass.
+
+A candidate plan is an allocation order plus a placement policy:
+
+    interleaved  every subnet goes through one buddy allocator in order
+    grouped      each priority class first gets one aligned region sized to
+                 its total, and its subnets are packed inside that region
+
+Candidates are scored on, in order: the smallest supernet covering every
+subnet, the number of routes needed to summarize each priority class, and
+how fragmented the remaining free space is. A greedy seed is improved by
+local search (swaps, moves, policy flips with restarts) until the time
+budget runs out, with one independent search per CPU core.
+
+Priority is honored by allocation order: unless keep_priority_order is
+False, every High subnet is placed before any Normal one, and so on.
+"""
+import bisect
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import vlsm_engine
+from vlsm_engine import IPV4_BITS, BuddyAllocator
+
+POLICIES = ("interleaved", "grouped")
+
+# Local search restarts from the best plan after this many rejected moves
+STALL_LIMIT = 200
+
+
+def covering_prefix(blocks):
+    """(network, prefix) of the smallest supernet holding every block"""
+    low = min(network for network, _ in blocks)
+    high = max(network + (1 << (IPV4_BITS - prefix)) - 1 for network, prefix in blocks)
+    prefix = IPV4_BITS - (low ^ high).bit_length()
+    return low & vlsm_engine.prefix_to_mask(prefix), prefix
+
+
+def summary_routes(blocks, labels):
+    """Routes needed to summarize every label group without covering another.
+
+    A summary may include free space, just not a block with another label.
+    The covering supernet is split in halves until each half holds a single
+    label, so the cost is O(n * 32).
+    """
+    entries = sorted(zip(blocks, labels))
+    starts = [network for (network, _), _ in entries]
+
+    def count(network, prefix, low, high):
+        found = {label for _, label in entries[low:high]}
+        if len(found) <= 1:
+            return len(found)
+        half = network + (1 << (IPV4_BITS - prefix - 1))
+        middle = bisect.bisect_left(starts, half, low, high)
+        return count(network, prefix + 1, low, middle) + count(half, prefix + 1, middle, high)
+
+    network, prefix = covering_prefix(blocks)
+    return count(network, prefix, 0, len(entries))
+
+
+class _Problem:
+    """Requirements reduced to the integers the search needs"""
+
+    def __init__(self, base_network, requirements, keep_priority_order=True):
+        self.base, self.base_prefix = vlsm_engine.parse_network(base_network)
+        self.requirements = vlsm_engine.normalize_requirements(requirements)
+        self.prefixes = []
+        for req in self.requirements:
+            prefix = vlsm_engine.prefix_for_hosts(req['hosts'])
+            if prefix < self.base_prefix:
+                raise ValueError(f"Subnet {req['name']} requires too many hosts")
+            self.prefixes.append(prefix)
+        self.classes = [vlsm_engine.PRIORITY_ORDER[req['priority']] for req in self.requirements]
+        self.keep_priority_order = keep_priority_order
+
+        # Greedy order: the one allocate_vlsm uses
+        self.greedy = sorted(range(len(self.requirements)),
+                             key=lambda i: (self.classes[i], self.prefixes[i]))
+
+        # With priority kept, each class owns a fixed slice of the order
+        self.ranges = []
+        if keep_priority_order:
+            start = 0
+            for cls in sorted(set(self.classes)):
+                end = start + self.classes.count(cls)
+                self.ranges.append((start, end))
+                start = end
+        else:
+            self.ranges.append((0, len(self.requirements)))
+
+    def place(self, order, policy):
+        """Return (networks by requirement index, free blocks) or None when full"""
+        networks = [None] * len(order)
+        allocator = BuddyAllocator((self.base, self.base_prefix))
+        allocators = [allocator]
+
+        if policy == "interleaved":
+            for i in order:
+                networks[i] = allocator.allocate(self.prefixes[i])
+                if networks[i] is None:
+                    return None
+        else:
+            groups = {}
+            for i in order:
+                groups.setdefault(self.classes[i], []).append(i)
+            for members in groups.values():
+                total = sum(1 << (IPV4_BITS - self.prefixes[i]) for i in members)
+                region_prefix = IPV4_BITS - (total - 1).bit_length()
+                if region_prefix < self.base_prefix:
+                    return None
+                region = allocator.allocate(region_prefix)
+                if region is None:
+                    return None
+                # Power-of-two blocks always fit a region at least their total size
+                inner = BuddyAllocator((region, region_prefix))
+                allocators.append(inner)
+                for i in members:
+                    networks[i] = inner.allocate(self.prefixes[i])
+
+        free = [block for a in allocators for block in a.free_blocks()]
+        return networks, free
+
+    def score(self, order, policy):
+        """Lower is better; None for plans that do not fit"""
+        placed = self.place(order, policy)
+        if placed is None:
+            return None
+        networks, free = placed
+        blocks = list(zip(networks, self.prefixes))
+
+        _, cover = covering_prefix(blocks)
+        routes = summary_routes(blocks, self.classes)
+        largest_free = max((1 << (IPV4_BITS - prefix) for _, prefix in free), default=0)
+        return (-cover, routes, len(free), -largest_free)
+
+    def seeds(self, rng, randomize):
+        """Starting orders: the greedy order, or a shuffled variant of it"""
+        order = list(self.greedy)
+        if randomize:
+            for start, end in self.ranges:
+                chunk = order[start:end]
+                # Keep largest-first but break ties between equal sizes randomly
+                rng.shuffle(chunk)
+                chunk.sort(key=lambda i: self.prefixes[i])
+                order[start:end] = chunk
+        return [(order, policy) for policy in POLICIES]
+
+    def neighbour(self, order, policy, rng):
+        """A random small change to a plan that keeps the priority slices"""
+        move = rng.random()
+        if move < 0.1:
+            return order, POLICIES[1 - POLICIES.index(policy)]
+
+        start, end = rng.choice(self.ranges)
+        if end - start < 2:
+            return order, policy
+        order = list(order)
+        i, j = rng.sample(range(start, end), 2)
+        if move < 0.55:
+            order[i], order[j] = order[j], order[i]
+        else:
+            order.insert(j, order.pop(i))
+        return order, policy
+
+
+def _search(problem, seed, time_budget):
+    """Local search from a seed; returns (score, order, policy, evaluations)"""
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + time_budget
+    best = None
+    evaluations = 0
+
+    for order, policy in problem.seeds(rng, randomize=seed != 0):
+        score = problem.score(order, policy)
+        evaluations += 1
+        if score is not None and (best is None or score < best[0]):
+            best = (score, order, policy)
+    if best is None:
+        return None, None, None, evaluations
+
+    current = best
+    stalled = 0
+    while time.perf_counter() < deadline:
+        order, policy = problem.neighbour(current[1], current[2], rng)
+        score = problem.score(order, policy)
+        evaluations += 1
+        # Sideways moves are accepted so the search can cross plateaus
+        if score is not None and score <= current[0]:
+            current = (score, order, policy)
+            if score < best[0]:
+                best = current
+                stalled = 0
+                continue
+        stalled += 1
+        if stalled >= STALL_LIMIT:
+            current = best
+            stalled = 0
+
+    return best[0], best[1], best[2], evaluations
+
+
+def describe_score(score):
+    """Metrics dict for a plan score"""
+    cover, routes, free_blocks, largest_free = score
+    return {
+        'covering_prefix': -cover,
+        'summary_routes': routes,
+        'free_blocks': free_blocks,
+        'largest_free': -largest_free,
+    }
+
+
+def optimize_vlsm(base_network, requirements, time_budget=2.0, workers=None, keep_priority_order=True):
+    """Find the best layout within time_budget seconds.
+
+    Returns a dict with 'allocations' (in allocation order, like
+    allocate_vlsm), 'metrics' and 'baseline' (describe_score dicts for the
+    result and for the greedy plan), 'policy' and 'evaluations'. The result
+    is never worse than the greedy plan.
+    """
+    problem = _Problem(base_network, requirements, keep_priority_order)
+    if not problem.requirements:
+        raise ValueError("No subnet requirements specified")
+
+    baseline = problem.score(problem.greedy, "interleaved")
+    workers = workers or os.cpu_count() or 1
+    seeds = range(workers)
+
+    if workers == 1:
+        results = [_search(problem, 0, time_budget)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(_search, [problem] * workers, seeds, [time_budget] * workers))
+
+    found = [r for r in results if r[0] is not None]
+    if not found:
+        raise ValueError("Cannot fit the subnet requirements in the base network")
+    score, order, policy, _ = min(found, key=lambda r: r[0])
+
+    networks, _ = problem.place(order, policy)
+    allocations = [vlsm_engine.make_allocation(problem.requirements[i], networks[i], problem.prefixes[i])
+                   for i in order]
+    return {
+        'allocations': allocations,
+        'metrics': describe_score(score),
+        'baseline': describe_score(baseline) if baseline else None,
+        'policy': policy,
+        'evaluations': sum(r[3] for r in results),
+    }
@@ -0,0 +1,190 @@
+"""
+What-if growth planning for VLSM plans.
+
+A scenario is a dict describing how the current requirements change:
+
+    {'name': "+20% hosts, 1 new site",
+     'growth': 20,                 # percent added to every host count
+     'new_sites': 1,               # extra copies of the whole requirement set
+     'priority_order': ("High", "Normal", "Low")}
+
+Scenarios are planned in worker processes with the same engine as the VLSM
+tab and summarized as one comparison row each.
+
+Command line:
+    python vlsm_scenarios.py 10.0.0.0/16 requirements.csv --growth 0 10 20 50 --sites 0 1 2
+"""
+import argparse
+import csv
+import itertools
+import math
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import requirements_io
+import vlsm_engine
+
+DEFAULT_ORDER = tuple(vlsm_engine.PRIORITY_ORDER)
+RESULT_COLUMNS = ["Scenario", "Subnets", "Hosts", "Addresses", "Base Used", "Efficiency", "Status"]
+
+
+def parse_priority_order(text):
+    """Turn 'Low>Normal>High' into a priority tuple"""
+    order = tuple(part.strip().capitalize() for part in text.split(">"))
+    if sorted(order) != sorted(DEFAULT_ORDER):
+        raise ValueError(f"Priority order must list {', '.join(DEFAULT_ORDER)} once each")
+    return order
+
+
+def build_scenarios(growth=(0,), new_sites=(0,), priority_orders=(DEFAULT_ORDER,)):
+    """Every combination of the given variations, mildest first"""
+    scenarios = []
+    for order, sites, percent in itertools.product(priority_orders, sorted(new_sites), sorted(growth)):
+        parts = [f"+{percent:g}% hosts"]
+        if sites:
+            parts.append(f"{sites} new site{'s' if sites != 1 else ''}")
+        if tuple(order) != DEFAULT_ORDER:
+            parts.append(">".join(order))
+        scenarios.append({
+            'name': ", ".join(parts),
+            'growth': percent,
+            'new_sites': sites,
+            'priority_order': tuple(order),
+        })
+    scenarios.sort(key=lambda s: (s['new_sites'], s['growth']))
+    return scenarios
+
+
+def apply_scenario(requirements, scenario):
+    """Requirements as they would look under a scenario"""
+    factor = 1 + scenario.get('growth', 0) / 100
+    order = scenario.get('priority_order') or DEFAULT_ORDER
+    # Re-rank priorities so the scenario's first choice is allocated first
+    rename = dict(zip(order, DEFAULT_ORDER))
+
+    changed = []
+    for site in range(scenario.get('new_sites', 0) + 1):
+        for req in requirements:
+            name = req['name'] if site == 0 else f"{req['name']} (new site {site})"
+            changed.append({
+                'name': name,
+                'hosts': max(1, math.ceil(req['hosts'] * factor)),
+                'priority': rename[req['priority']],
+            })
+    return changed
+
+
+def evaluate_scenario(base_network, requirements, scenario, hierarchical=False):
+    """Plan one scenario and summarize it as a result dict"""
+    _, base_prefix = vlsm_engine.parse_network(base_network)
+    base_size = 1 << (vlsm_engine.IPV4_BITS - base_prefix)
+    changed = apply_scenario(requirements, scenario)
+    result = {
+        'name': scenario['name'],
+        'subnets': len(changed),
+        'hosts': sum(req['hosts'] for req in changed),
+        'addresses': 0,
+        'base_used': 0.0,
+        'efficiency': 0.0,
+        'overflow': False,
+        'error': "",
+    }
+    try:
+        allocations, _ = vlsm_engine.plan_vlsm(base_network, changed, hierarchical)
+    except ValueError as e:
+        result['overflow'] = True
+        result['error'] = str(e)
+        return result
+
+    addresses = sum(a['size'] for a in allocations)
+    available = sum(a['available'] for a in allocations)
+    result['addresses'] = addresses
+    result['base_used'] = addresses / base_size * 100
+    result['efficiency'] = result['hosts'] / available * 100 if available else 0.0
+    return result
+
+
+def run_scenarios(base_network, requirements, scenarios, workers=None, on_result=None,
+                  hierarchical=False):
+    """Evaluate scenarios in a process pool; results keep the scenario order"""
+    requirements = vlsm_engine.normalize_requirements(requirements)
+    workers = workers or os.cpu_count() or 1
+    count = len(scenarios)
+
+    if workers == 1:
+        results = map(evaluate_scenario, [base_network] * count, [requirements] * count, scenarios,
+                      [hierarchical] * count)
+        return _collect(results, on_result)
+
+    chunk = max(1, count // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = pool.map(evaluate_scenario, [base_network] * count, [requirements] * count,
+                           scenarios, [hierarchical] * count, chunksize=chunk)
+        return _collect(results, on_result)
+
+
+def _collect(results, on_result):
+    collected = []
+    for result in results:
+        collected.append(result)
+        if on_result:
+            on_result(result, len(collected))
+    return collected
+
+
+def first_overflow(results):
+    """The first result in scenario order that does not fit, or None"""
+    return next((r for r in results if r['overflow']), None)
+
+
+def result_row(result):
+    """Display values for a result, in RESULT_COLUMNS order"""
+    if result['overflow']:
+        return (result['name'], result['subnets'], f"{result['hosts']:,}", "-", "-", "-", "Overflow")
+    return (
+        result['name'],
+        result['subnets'],
+        f"{result['hosts']:,}",
+        f"{result['addresses']:,}",
+        f"{result['base_used']:.1f}%",
+        f"{result['efficiency']:.1f}%",
+        "Fits",
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare VLSM growth scenarios")
+    parser.add_argument("base_network")
+    parser.add_argument("requirements", help="CSV, TSV, JSON lines, JSON or Excel file")
+    parser.add_argument("--growth", type=float, nargs="+", default=[0, 10, 25, 50, 100],
+                        help="Host growth percentages")
+    parser.add_argument("--sites", type=int, nargs="+", default=[0], help="Numbers of new sites")
+    parser.add_argument("--order", nargs="+", default=[">".join(DEFAULT_ORDER)],
+                        help="Priority orders such as Low>Normal>High")
+    parser.add_argument("--hierarchical", action="store_true",
+                        help="Plan names as Region/Site/VLAN paths")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    requirements, errors, error_count = requirements_io.load_requirements(args.requirements)
+    for message in errors:
+        print(message, file=sys.stderr)
+
+    scenarios = build_scenarios(args.growth, args.sites, [parse_priority_order(o) for o in args.order])
+    results = run_scenarios(args.base_network, requirements, scenarios, args.workers,
+                            hierarchical=args.hierarchical)
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(RESULT_COLUMNS)
+    writer.writerows(result_row(r) for r in results)
+
+    overflow = first_overflow(results)
+    if overflow:
+        print(f"First overflow: {overflow['name']} ({overflow['error']})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
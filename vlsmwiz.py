@@ -1,15 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import ipaddress
+import asyncio
 import matplotlib.pyplot as plt
 import networkx as nx
 import csv
-import pandas as pd
 import os
-import json
-import subprocess
 import threading
-import socket
 import struct
 import random
 from datetime import datetime
@@ -17,7 +14,21 @@ import numpy as np
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import requests
-import time
+
+import history
+import prefix_index
+import project_store
+import requirements_io
+import result_cache
+import scanner
+import subnet_math
+import topology
+import topology_analysis
+import ui_support
+import utilization_chart
+import vlsm_engine
+import vlsm_optimizer
+import vlsm_scenarios
 
 # AI Integration imports (install: pip install transformers torch)
 try:
@@ -30,6 +41,24 @@ except ImportError:
 
 
 class AdvancedNetworkCalculator:
+    SCAN_FILTERS = {
+        "Up / Open": ("Up", "Scanned"),
+        "All": None,
+        "Down": ("Down",),
+    }
+    VLSM_SORT_KEYS = {
+        "Name": 'name', "Network": 'network', "Mask": 'prefix', "Hosts": 'available',
+        "Used": 'hosts', "Efficiency": 'efficiency', "First": 'network', "Last": 'network',
+        "Broadcast": 'network',
+    }
+    SCAN_SORT_KEYS = {"IP": "ip", "Status": "status", "Ports": "ports", "Response Time": "rtt"}
+    OPTIMIZE_SECONDS = 3.0
+
+    # Edits to unsaved projects are journaled next to this file
+    AUTOSAVE_PATH = os.path.join(os.path.expanduser("~"), ".vlsmwiz", "autosave" + project_store.EXTENSION)
+    COMPACT_BYTES = 4 * 1024 * 1024
+    COMPACT_CHECK_MS = 30000
+
     def __init__(self, root):
         self.root = root
         self.root.title("Advanced Network Calculator v2.0")
@@ -43,12 +72,41 @@ class AdvancedNetworkCalculator:
         # Data storage
         self.projects = {}
         self.network_data = {}
-        self.scan_results = {}
+        self.scan_results = scanner.ScanResultStore()
+        self.vlsm_allocations = []
+        self.vlsm_hierarchy = None
+        self.vlsm_expanded = set()
+        self.restored_allocations = None
+
+        # Undo/redo steps over the VLSM, VLAN and topology state
+        self.history = history.History()
+        self.restoring = False
+
+        # Shared index of every prefix planned by the VLSM, VLAN and supernet tools
+        self.prefix_index = prefix_index.PrefixTrie()
+        self.indexed_prefixes = {}
+        self.route_table = None
+
+        # Background workers reach Tk only through this queue
+        self.ui_queue = ui_support.UIEventQueue(root)
+
+        # Repeat runs over unchanged inputs are served from here
+        self.result_cache = result_cache.ResultCache(directory=os.environ.get(result_cache.CACHE_DIR_ENV))
+
+        # Every edit is appended to a journal next to the project file
+        self.project_path = None
+        os.makedirs(os.path.dirname(self.AUTOSAVE_PATH), exist_ok=True)
+        self.journal = project_store.ProjectJournal(self.AUTOSAVE_PATH)
+        self.compacting = False
 
         self.setup_styles()
         self.create_menu()
         self.create_main_interface()
 
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(0, self.offer_recovery)
+        self.root.after(self.COMPACT_CHECK_MS, self.check_compaction)
+
     def setup_styles(self):
         self.style = ttk.Style()
         self.style.theme_use('clam')
@@ -67,6 +125,16 @@ class AdvancedNetworkCalculator:
         file_menu.add_separator()
         file_menu.add_command(label="Export Documentation", command=self.export_documentation)
 
+        # Edit Menu
+        self.edit_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Edit", menu=self.edit_menu)
+        self.edit_menu.add_command(label="Undo", accelerator="Ctrl+Z", command=self.undo)
+        self.edit_menu.add_command(label="Redo", accelerator="Ctrl+Y", command=self.redo)
+        self.root.bind("<Control-z>", lambda e: self.history_key(e, self.undo))
+        self.root.bind("<Control-y>", lambda e: self.history_key(e, self.redo))
+        self.root.bind("<Control-Z>", lambda e: self.history_key(e, self.redo))
+        self.update_history_menu()
+
         # AI Menu
         ai_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="AI", menu=ai_menu)
@@ -109,19 +177,36 @@ class AdvancedNetworkCalculator:
         ttk.Label(input_frame, text="Base Network:").pack(anchor="w")
         self.vlsm_network_entry = ttk.Entry(input_frame)
         self.vlsm_network_entry.pack(fill="x", pady=(0, 10))
+        self.vlsm_hierarchical = tk.BooleanVar(value=False)
+        ttk.Checkbutton(input_frame, text="Names are paths (Region/Site/VLAN)",
+                        variable=self.vlsm_hierarchical).pack(anchor="w", pady=(0, 10))
 
         # New: Number of Subnets Input
         ttk.Label(input_frame, text="Number of Subnets Needed:").pack(anchor="w")
         self.num_subnets_entry = ttk.Entry(input_frame, width=10)
         self.num_subnets_entry.pack(fill="x", pady=(0, 5))
-        ttk.Button(input_frame, text="Generate Subnet Fields",
-                   command=self.generate_subnet_fields).pack(anchor="w", pady=(0, 10))
+        field_frame = ttk.Frame(input_frame)
+        field_frame.pack(fill="x", pady=(0, 10))
+        ttk.Button(field_frame, text="Generate Subnet Fields",
+                   command=self.generate_subnet_fields).pack(side="left")
+        ttk.Button(field_frame, text="Import Requirements...",
+                   command=self.import_requirements).pack(side="left", padx=5)
+        self.import_status = ttk.Label(field_frame, text="")
+        self.import_status.pack(side="left", padx=5)
 
         # Frame to hold dynamically generated subnet requirement entries
         self.subnet_requirements_frame = ttk.Frame(input_frame)
         self.subnet_requirements_frame.pack(fill="x", pady=(0, 10))
 
-        self.subnet_entries = [] # This will be populated dynamically
+        # Requirement rows live in a plain list; the grid only draws the visible ones
+        ttk.Label(self.subnet_requirements_frame, text="Subnet Requirements:").pack(anchor="w", pady=(5, 0))
+        self.requirement_rows = []
+        self.requirement_grid = ui_support.VirtualGrid(self.subnet_requirements_frame, (
+            ('name', "Name", 15, None),
+            ('hosts', "Hosts", 10, None),
+            ('priority', "Priority", 8, list(vlsm_engine.PRIORITY_ORDER)),
+        ))
+        self.requirement_grid.pack(fill="x")
 
         # Buttons
         btn_frame = ttk.Frame(input_frame)
@@ -133,28 +218,24 @@ class AdvancedNetworkCalculator:
                    command=self.check_overlaps).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="Optimize",
                    command=self.optimize_subnets).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="What-If...",
+                   command=self.open_scenario_window).pack(side="left", padx=5)
 
         # Results Panel
         result_frame = ttk.Frame(main_frame)
         main_frame.add(result_frame, weight=2)
 
-        # Results tree
-        self.vlsm_tree = ttk.Treeview(result_frame, columns=(
-            "Network", "Mask", "Hosts", "Used", "Efficiency", "First", "Last", "Broadcast"
-        ), show="headings")
-
+        # Results table renders only the visible rows of self.vlsm_allocations
+        self.vlsm_table = ui_support.VirtualTable(
+            result_frame, tuple(self.VLSM_SORT_KEYS), sort_command=self.sort_vlsm_results, horizontal=True)
+        self.vlsm_tree = self.vlsm_table.tree
         for col in self.vlsm_tree["columns"]:
-            self.vlsm_tree.heading(col, text=col)
             self.vlsm_tree.column(col, width=90)
-
-        # Scrollbars
-        v_scroll = ttk.Scrollbar(result_frame, orient="vertical", command=self.vlsm_tree.yview)
-        h_scroll = ttk.Scrollbar(result_frame, orient="horizontal", command=self.vlsm_tree.xview)
-        self.vlsm_tree.configure(yscrollcommand=v_scroll.set, xscrollcommand=h_scroll.set)
-
-        self.vlsm_tree.grid(row=0, column=0, sticky="nsew")
-        v_scroll.grid(row=0, column=1, sticky="ns")
-        h_scroll.grid(row=1, column=0, sticky="ew")
+        self.vlsm_table.grid(row=0, column=0, columnspan=2, sticky="nsew")
+        self.vlsm_sort = (None, False)
+        self.vlsm_view = []
+        # Hierarchical plans expand and collapse on double-click
+        self.vlsm_tree.bind("<Double-1>", self.toggle_vlsm_node)
 
         result_frame.grid_rowconfigure(0, weight=1)
         result_frame.grid_columnconfigure(0, weight=1)
@@ -163,43 +244,71 @@ class AdvancedNetworkCalculator:
         self.create_utilization_chart(result_frame)
 
     def generate_subnet_fields(self):
-        """Dynamically generates subnet requirement input fields based on user input."""
-        # Clear existing fields
-        for widget in self.subnet_requirements_frame.winfo_children():
-            widget.destroy()
-        self.subnet_entries = []
-
+        """Size the subnet requirement grid to the number of subnets entered."""
         try:
             num_subnets = int(self.num_subnets_entry.get())
             if num_subnets <= 0:
                 messagebox.showwarning("Invalid Input", "Please enter a positive number of subnets.")
                 return
-            if num_subnets > 50: # Set a reasonable limit to prevent UI issues
-                messagebox.showwarning("Too Many Subnets", "Please enter a number up to 50 for performance reasons.")
-                num_subnets = 50
-
-            ttk.Label(self.subnet_requirements_frame, text="Subnet Requirements:").grid(row=0, column=0, columnspan=3, sticky="w", pady=(5,0))
-            ttk.Label(self.subnet_requirements_frame, text="Name").grid(row=1, column=0, padx=5)
-            ttk.Label(self.subnet_requirements_frame, text="Hosts").grid(row=1, column=1, padx=5)
-            ttk.Label(self.subnet_requirements_frame, text="Priority").grid(row=1, column=2, padx=5)
-
-            for i in range(num_subnets):
-                name_entry = ttk.Entry(self.subnet_requirements_frame, width=15)
-                name_entry.grid(row=i + 2, column=0, padx=2, pady=1)
-
-                hosts_entry = ttk.Entry(self.subnet_requirements_frame, width=10)
-                hosts_entry.grid(row=i + 2, column=1, padx=2, pady=1)
 
-                priority_var = tk.StringVar(value="Normal")
-                priority_combo = ttk.Combobox(self.subnet_requirements_frame, textvariable=priority_var,
-                                              values=["High", "Normal", "Low"], width=8)
-                priority_combo.grid(row=i + 2, column=2, padx=2, pady=1)
-
-                self.subnet_entries.append((name_entry, hosts_entry, priority_var))
+            # Keep what was already typed and add or drop rows at the end
+            rows = self.requirement_rows[:num_subnets]
+            rows.extend({'name': '', 'hosts': '', 'priority': "Normal"}
+                        for _ in range(num_subnets - len(rows)))
+            self.requirement_rows = rows
+            self.requirement_grid.set_rows(rows)
 
         except ValueError:
             messagebox.showerror("Invalid Input", "Please enter a valid number for subnets.")
 
+    def import_requirements(self):
+        """Load subnet requirements from a file and plan them in the background"""
+        filename = filedialog.askopenfilename(filetypes=requirements_io.FILE_TYPES)
+        if not filename:
+            return
+        base_network = self.vlsm_network_entry.get()
+        hierarchical = self.vlsm_hierarchical.get()
+
+        def show_status(text):
+            self.import_status.config(text=text)
+
+        def show_import(rows, plan, errors, error_count):
+            self.requirement_rows = rows
+            self.requirement_grid.set_rows(rows)
+            self.num_subnets_entry.delete(0, tk.END)
+            self.num_subnets_entry.insert(0, str(len(rows)))
+            if plan is not None:
+                allocations, hierarchy = plan
+                self.show_vlsm_results(allocations, hierarchy)
+                self.journal_vlsm(allocations)
+                self.update_utilization_chart(allocations)
+                self.remember("Import Requirements")
+            if error_count:
+                shown = "\n".join(errors[:20])
+                more = f"\n... and {error_count - 20} more" if error_count > 20 else ""
+                messagebox.showwarning("Import Warnings",
+                                       f"Skipped {error_count} invalid records:\n{shown}{more}")
+
+        def load():
+            try:
+                requirements, errors, error_count = requirements_io.load_requirements(
+                    filename, on_progress=lambda count: self.ui_queue.post_latest(
+                        "import", show_status, f"Read {count:,} records..."))
+                rows = [{'name': r['name'], 'hosts': str(r['hosts']), 'priority': r['priority']}
+                        for r in requirements]
+
+                # Plan straight away when a base network has been entered
+                plan = None
+                if base_network.strip() and requirements:
+                    plan = self.cached_plan(base_network, requirements, hierarchical)
+                self.ui_queue.post(show_import, rows, plan, errors, error_count)
+                self.ui_queue.post_latest("import", show_status, f"Imported {len(rows):,} requirements")
+
+            except Exception as e:
+                self.ui_queue.post_latest("import", show_status, "")
+                self.ui_queue.post(messagebox.showerror, "Error", f"Failed to import requirements: {str(e)}")
+
+        threading.Thread(target=load, daemon=True).start()
 
     def create_ipv6_tab(self):
         """IPv6 subnetting support"""
@@ -229,15 +338,20 @@ class AdvancedNetworkCalculator:
         ttk.Button(options_frame, text="Calculate IPv6 Subnets",
                    command=self.calculate_ipv6_subnets).pack(anchor="w", pady=5)
 
-        # Results
-        self.ipv6_tree = ttk.Treeview(frame, columns=(
-            "Subnet", "Network", "Prefix", "Hosts"
-        ), show="headings")
-
-        for col in self.ipv6_tree["columns"]:
-            self.ipv6_tree.heading(col, text=col)
-
-        self.ipv6_tree.pack(fill="both", expand=True, pady=10)
+        # Jump to a subnet by number or by an address inside it
+        jump_frame = ttk.Frame(frame)
+        jump_frame.pack(fill="x")
+        ttk.Label(jump_frame, text="Go to subnet # or address:").pack(side="left")
+        self.ipv6_jump_entry = ttk.Entry(jump_frame, width=40)
+        self.ipv6_jump_entry.pack(side="left", padx=5)
+        self.ipv6_jump_entry.bind("<Return>", lambda e: self.jump_ipv6_subnet())
+        ttk.Button(jump_frame, text="Go", command=self.jump_ipv6_subnet).pack(side="left")
+
+        # Results are paged in from a lazy enumerator as the user scrolls
+        self.ipv6_table = ui_support.VirtualTable(frame, ("Subnet", "Network", "Prefix", "Hosts"))
+        self.ipv6_table.pack(fill="both", expand=True, pady=10)
+        self.ipv6_tree = self.ipv6_table.tree
+        self.ipv6_subnets = None
 
     def create_network_tools_tab(self):
         """Network utilities and converters"""
@@ -275,6 +389,13 @@ class AdvancedNetworkCalculator:
         self.supernet_text = tk.Text(super_frame, height=6)
         self.supernet_text.pack(fill="x", pady=5)
 
+        tolerance_frame = ttk.Frame(super_frame)
+        tolerance_frame.pack(fill="x", pady=(0, 5))
+        ttk.Label(tolerance_frame, text="Extra addresses allowed:").pack(side="left")
+        self.supernet_tolerance_entry = ttk.Entry(tolerance_frame, width=12)
+        self.supernet_tolerance_entry.insert(0, "0")
+        self.supernet_tolerance_entry.pack(side="left", padx=5)
+
         ttk.Button(super_frame, text="Calculate Summary Route",
                    command=self.calculate_supernet).pack(anchor="w")
 
@@ -312,6 +433,36 @@ class AdvancedNetworkCalculator:
         ttk.Label(bw_calc_frame, textvariable=self.bw_result,
                   foreground="blue").grid(row=1, column=0, columnspan=7, pady=5)
 
+        # Route Lookup
+        route_frame = ttk.Frame(notebook)
+        notebook.add(route_frame, text="Route Lookup")
+
+        table_frame = ttk.LabelFrame(route_frame, text="Route Table")
+        table_frame.pack(fill="x", padx=10, pady=10)
+
+        ttk.Button(table_frame, text="Load Route Table...",
+                   command=self.load_route_table).grid(row=0, column=0, padx=5, pady=5)
+        ttk.Button(table_frame, text="Benchmark",
+                   command=self.benchmark_route_table).grid(row=0, column=1, padx=5)
+        ttk.Button(table_frame, text="Check Summary Coverage",
+                   command=self.check_summary_coverage).grid(row=0, column=2, padx=5)
+        self.route_table_status = tk.StringVar(value="No route table loaded")
+        ttk.Label(table_frame, textvariable=self.route_table_status).grid(
+            row=1, column=0, columnspan=3, sticky="w", padx=5)
+
+        lookup_frame = ttk.LabelFrame(route_frame, text="Longest Prefix Match")
+        lookup_frame.pack(fill="x", padx=10, pady=10)
+
+        ttk.Label(lookup_frame, text="Address:").grid(row=0, column=0)
+        self.route_address_entry = ttk.Entry(lookup_frame, width=40)
+        self.route_address_entry.grid(row=0, column=1, padx=5)
+        ttk.Button(lookup_frame, text="Lookup",
+                   command=self.lookup_route).grid(row=0, column=2, padx=5)
+
+        self.route_result = tk.StringVar()
+        ttk.Label(lookup_frame, textvariable=self.route_result,
+                  foreground="blue").grid(row=1, column=0, columnspan=3, pady=5)
+
     def create_scanning_tab(self):
         """Network scanning tools"""
         tab = ttk.Frame(self.notebook)
@@ -333,6 +484,16 @@ class AdvancedNetworkCalculator:
         self.ping_range_entry.pack(fill="x", pady=2)
         self.ping_range_entry.insert(0, "192.168.1.0/24")
 
+        ttk.Label(ping_frame, text="Concurrent Probes:").pack(anchor="w")
+        self.ping_concurrency_entry = ttk.Entry(ping_frame, width=10)
+        self.ping_concurrency_entry.pack(anchor="w", pady=2)
+        self.ping_concurrency_entry.insert(0, "2048")
+
+        ttk.Label(ping_frame, text="Timeout per Host (s):").pack(anchor="w")
+        self.ping_timeout_entry = ttk.Entry(ping_frame, width=10)
+        self.ping_timeout_entry.pack(anchor="w", pady=2)
+        self.ping_timeout_entry.insert(0, "1.0")
+
         ttk.Button(ping_frame, text="Start Ping Sweep",
                    command=self.start_ping_sweep).pack(anchor="w", pady=5)
 
@@ -340,11 +501,11 @@ class AdvancedNetworkCalculator:
         port_frame = ttk.LabelFrame(control_frame, text="Port Scanner")
         port_frame.pack(fill="x", pady=5)
 
-        ttk.Label(port_frame, text="Target IP:").pack(anchor="w")
+        ttk.Label(port_frame, text="Targets (IPs or CIDR, comma separated):").pack(anchor="w")
         self.port_target_entry = ttk.Entry(port_frame)
         self.port_target_entry.pack(fill="x", pady=2)
 
-        ttk.Label(port_frame, text="Port Range (e.g., 1-1000):").pack(anchor="w")
+        ttk.Label(port_frame, text="Ports (e.g., 1-1000,8080):").pack(anchor="w")
         self.port_range_entry = ttk.Entry(port_frame)
         self.port_range_entry.pack(fill="x", pady=2)
         self.port_range_entry.insert(0, "1-1000")
@@ -356,23 +517,34 @@ class AdvancedNetworkCalculator:
         result_frame = ttk.Frame(main_frame)
         main_frame.add(result_frame, weight=2)
 
-        self.scan_tree = ttk.Treeview(result_frame, columns=(
-            "IP", "Status", "Ports", "Response Time"
-        ), show="headings")
+        view_frame = ttk.Frame(result_frame)
+        view_frame.pack(fill="x")
 
-        for col in self.scan_tree["columns"]:
-            self.scan_tree.heading(col, text=col)
+        ttk.Label(view_frame, text="Show:").pack(side="left")
+        self.scan_filter = tk.StringVar(value="Up / Open")
+        filter_combo = ttk.Combobox(view_frame, textvariable=self.scan_filter, width=12,
+                                    values=list(self.SCAN_FILTERS), state="readonly")
+        filter_combo.pack(side="left", padx=5)
+        filter_combo.bind("<<ComboboxSelected>>", lambda e: self.refresh_scan_view(keep_position=False))
 
-        scroll_y = ttk.Scrollbar(result_frame, orient="vertical", command=self.scan_tree.yview)
-        self.scan_tree.configure(yscrollcommand=scroll_y.set)
+        ttk.Button(view_frame, text="Export Results",
+                   command=self.export_scan_results).pack(side="right")
 
-        self.scan_tree.pack(side="left", fill="both", expand=True)
-        scroll_y.pack(side="right", fill="y")
+        # The table is a virtual view onto self.scan_results
+        self.scan_table = ui_support.VirtualTable(
+            result_frame, ("IP", "Status", "Ports", "Response Time"),
+            sort_command=self.sort_scan_results)
+        self.scan_table.pack(fill="both", expand=True)
+        self.scan_tree = self.scan_table.tree
+        self.scan_sort = ("ip", False)
 
         # Progress bar
         self.scan_progress = ttk.Progressbar(control_frame, mode='indeterminate')
         self.scan_progress.pack(fill="x", pady=5)
 
+        self.scan_status = tk.StringVar(value="")
+        ttk.Label(control_frame, textvariable=self.scan_status).pack(anchor="w")
+
     def create_practice_tab(self):
         """Subnetting practice mode"""
         tab = ttk.Frame(self.notebook)
@@ -518,9 +690,14 @@ class AdvancedNetworkCalculator:
                    command=self.load_topology_csv).pack(side="left", padx=5)
         ttk.Button(control_frame, text="Save Topology",
                    command=self.save_topology).pack(side="left", padx=5)
+        ttk.Button(control_frame, text="Analyze...",
+                   command=self.open_topology_analysis).pack(side="left", padx=5)
 
-        # Initialize network graph
+        # Initialize network graph; node positions persist across redraws
         self.network_graph = nx.Graph()
+        self.topology_layout = topology.TopologyLayout()
+        self.topology_analysis = topology_analysis.TopologyAnalysis(
+            self.network_graph, on_edit=self.topology_edited)
 
     def create_ai_troubleshoot_tab(self):
         """AI-powered troubleshooting"""
@@ -628,206 +805,290 @@ class AdvancedNetworkCalculator:
         chart_frame.grid(row=2, column=0, columnspan=2, sticky="ew", pady=10)
 
         self.util_fig = Figure(figsize=(8, 4))
-        self.util_ax = self.util_fig.add_subplot(111)
-
         chart_canvas = FigureCanvasTkAgg(self.util_fig, chart_frame)
         chart_canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.util_chart = utilization_chart.UtilizationChart(self.util_fig, chart_canvas)
 
     # Implementation methods for all features
     def calculate_enhanced_vlsm(self):
         """Enhanced VLSM calculation with efficiency analysis"""
         try:
-            base_network = ipaddress.IPv4Network(self.vlsm_network_entry.get(), strict=False)
-
             # Collect subnet requirements
-            requirements = []
-            for name_entry, hosts_entry, priority_var in self.subnet_entries:
-                if name_entry.get() and hosts_entry.get():
-                    requirements.append({
-                        'name': name_entry.get(),
-                        'hosts': int(hosts_entry.get()),
-                        'priority': priority_var.get()
-                    })
+            requirements = [row for row in self.requirement_rows if row['name'] and row['hosts']]
 
             if not requirements:
                 messagebox.showwarning("Warning", "No subnet requirements specified")
                 return
 
-            # Sort by priority and size
-            priority_order = {"High": 0, "Normal": 1, "Low": 2}
-            requirements.sort(key=lambda x: (priority_order[x['priority']], -x['hosts']))
-
-            # Clear previous results
-            self.vlsm_tree.delete(*self.vlsm_tree.get_children())
-
-            current_address = base_network.network_address
-            subnets = []
-
-            for req in requirements:
-                # Calculate minimum prefix for required hosts
-                host_bits = (req['hosts'] + 2).bit_length()
-                prefix = 32 - host_bits
-
-                if prefix < base_network.prefixlen:
-                    raise ValueError(f"Subnet {req['name']} requires too many hosts")
-
-                # Create subnet
-                subnet = ipaddress.IPv4Network((current_address, prefix), strict=False)
-
-                # Check if subnet fits in base network
-                if not base_network.supernet_of(subnet):
-                    raise ValueError(f"Cannot fit subnet {req['name']} in base network")
-
-                # Calculate efficiency
-                available_hosts = subnet.num_addresses - 2
-                efficiency = (req['hosts'] / available_hosts) * 100
-
-                # Add to tree
-                self.vlsm_tree.insert("", "end", values=(
-                    req['name'],
-                    f"{subnet.network_address}/{prefix}",
-                    str(subnet.netmask),
-                    str(available_hosts),
-                    str(req['hosts']),
-                    f"{efficiency:.1f}%",
-                    str(subnet.network_address + 1),
-                    str(subnet.broadcast_address - 1),
-                    str(subnet.broadcast_address)
-                ))
-
-                subnets.append((req['name'], subnet, efficiency, req['hosts']))
-                current_address = subnet.broadcast_address + 1
+            allocations, hierarchy = self.cached_plan(self.vlsm_network_entry.get(), requirements,
+                                                      self.vlsm_hierarchical.get())
+            self.show_vlsm_results(allocations, hierarchy)
+            self.journal_vlsm(allocations)
 
             # Update utilization chart
-            self.update_utilization_chart(subnets)
+            self.update_utilization_chart(allocations)
+            self.remember("Calculate VLSM")
 
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
-    def optimize_subnets(self):
-        """Optimize subnet allocation for better efficiency and addressing"""
-        try:
-            # Check if we have any subnets to optimize
-            if not self.vlsm_tree.get_children():
-                messagebox.showwarning("Warning", "No subnets to optimize. Please calculate VLSM first.")
-                return
+    def cached_plan(self, base_network, requirements, hierarchical=False):
+        """vlsm_engine.plan_vlsm through the result cache"""
+        requirements = vlsm_engine.normalize_requirements(requirements)
+        if not hierarchical:
+            # A flat plan depends only on allocation order, so key on that
+            requirements = vlsm_engine.sort_requirements(requirements)
+        network, prefix = vlsm_engine.parse_network(base_network)
+        return self.result_cache.get_or_compute(
+            "plan_vlsm", lambda: vlsm_engine.plan_vlsm((network, prefix), requirements, hierarchical),
+            base=[network, prefix], hierarchical=hierarchical, requirements=[[r['name'], r['hosts'], r['priority']] for r in requirements])
+
+    def show_vlsm_results(self, allocations, hierarchy=None):
+        """Make allocations the current VLSM plan and refresh its views"""
+        self.vlsm_allocations = allocations
+        self.vlsm_hierarchy = hierarchy
+        self.vlsm_expanded = set()
+        self.history.stage(vlsm=self.history.pending.vlsm.updated(allocations), hierarchy=hierarchy)
+        self.update_prefix_index("vlsm", {
+            (4, a['network'], a['prefix']): ((4, a['network'], a['prefix']), a['name']) for a in allocations
+        })
+        self.refresh_vlsm_view(keep_position=False)
+
+    def refresh_vlsm_view(self, keep_position=True):
+        """Order the allocations for display; only visible rows get formatted"""
+        key, descending = self.vlsm_sort
+        if self.vlsm_hierarchy is not None:
+            self.refresh_vlsm_tree(keep_position)
+            return
+        if key is None:
+            self.vlsm_view = self.vlsm_allocations
+        else:
+            self.vlsm_view = sorted(self.vlsm_allocations, key=lambda a: a[key], reverse=descending)
+        view = self.vlsm_view
+        self.vlsm_table.set_source(
+            len(view), lambda start, count: [vlsm_engine.allocation_row(a) for a in view[start:start + count]],
+            keep_position)
+
+    def refresh_vlsm_tree(self, keep_position=True):
+        """Flatten the expanded part of a hierarchical plan into table rows"""
+        key, descending = self.vlsm_sort
+        view = []
+        pending = [(0, node) for node in reversed(self.vlsm_hierarchy['children'])]
+        while pending:
+            depth, node = pending.pop()
+            view.append((depth, node))
+            if node['path'] in self.vlsm_expanded:
+                children = node['children']
+                if key is not None:
+                    children = sorted(children, key=lambda c: c['allocation'][key], reverse=descending)
+                pending.extend((depth + 1, child) for child in reversed(children))
+        self.vlsm_view = view
+
+        def fetch(start, count):
+            rows = []
+            for depth, node in view[start:start + count]:
+                if node['children']:
+                    marker = "▾ " if node['path'] in self.vlsm_expanded else "▸ "
+                else:
+                    marker = "  "
+                row = vlsm_engine.allocation_row(node['allocation'])
+                rows.append(("    " * depth + marker + node['name'],) + row[1:])
+            return rows
 
-            # Get current subnet data from the tree
-            current_subnets = []
-            for item in self.vlsm_tree.get_children():
-                values = self.vlsm_tree.item(item)['values']
-                current_subnets.append({
-                    'name': values[0],
-                    'network': values[1],
-                    'hosts_available': int(values[3]),
-                    'hosts_used': int(values[4]),
-                    'efficiency': float(values[5].replace('%', ''))
-                })
-
-            # Sort subnets by efficiency (lowest first) to identify optimization opportunities
-            current_subnets.sort(key=lambda x: x['efficiency'])
-
-            optimization_suggestions = []
-
-            # Analyze efficiency and suggest improvements
-            for subnet in current_subnets:
-                if subnet['efficiency'] < 50:
-                    # Calculate optimal subnet size
-                    optimal_hosts = subnet['hosts_used']
-                    optimal_prefix = 32 - (optimal_hosts + 2).bit_length()
-
-                    optimization_suggestions.append(
-                        f"• {subnet['name']}: Current efficiency {subnet['efficiency']:.1f}% - "
-                        f"Consider using /{optimal_prefix} for {optimal_hosts} hosts"
-                    )
-                elif subnet['efficiency'] > 90:
-                    optimization_suggestions.append(
-                        f"• {subnet['name']}: Excellent efficiency {subnet['efficiency']:.1f}% - Well optimized"
-                    )
-
-            # Check for potential consolidation opportunities
-            small_subnets = [s for s in current_subnets if s['hosts_used'] < 10]
-            if len(small_subnets) > 1:
-                optimization_suggestions.append(
-                    f"• Consider consolidating {len(small_subnets)} small subnets for better address utilization"
-                )
-
-            # Display optimization results
-            if optimization_suggestions:
-                result_text = "Subnet Optimization Analysis:\n\n" + "\n".join(optimization_suggestions)
-
-                # Calculate overall efficiency
-                total_used = sum(s['hosts_used'] for s in current_subnets)
-                total_available = sum(s['hosts_available'] for s in current_subnets)
-                overall_efficiency = (total_used / total_available) * 100 if total_available > 0 else 0
-
-                result_text += f"\n\nOverall Network Efficiency: {overall_efficiency:.1f}%"
-
-                if overall_efficiency < 60:
-                    result_text += "\n\nRecommendation: Consider redesigning subnet allocation for better efficiency."
-                elif overall_efficiency > 80:
-                    result_text += "\n\nRecommendation: Good subnet utilization. Minor optimizations possible."
-
-                messagebox.showinfo("Optimization Results", result_text)
-            else:
-                messagebox.showinfo("Optimization Results", "No optimization suggestions available.")
+        self.vlsm_table.set_source(len(view), fetch, keep_position)
 
-            # Automatically re-sort subnets by size (largest first) for optimal allocation
-            base_network_str = self.vlsm_network_entry.get()
-            if base_network_str:
-                # Re-trigger calculation with optimized sorting
-                self.calculate_enhanced_vlsm()
-                messagebox.showinfo("Optimization Complete", "Subnets have been re-ordered for optimal allocation.")
+    def toggle_vlsm_node(self, event):
+        """Expand or collapse the hierarchy node under the mouse"""
+        if self.vlsm_hierarchy is None:
+            return
+        index = self.vlsm_table.row_at(event.y)
+        if index is None or index >= len(self.vlsm_view):
+            return
+        node = self.vlsm_view[index][1]
+        if node['children']:
+            self.vlsm_expanded ^= {node['path']}
+            self.refresh_vlsm_view()
+
+    def sort_vlsm_results(self, column):
+        """Sort VLSM results by a column, toggling direction on repeat clicks"""
+        key = self.VLSM_SORT_KEYS[column]
+        sort_by, descending = self.vlsm_sort
+        self.vlsm_sort = (key, not descending if key == sort_by else False)
+        self.refresh_vlsm_view(keep_position=False)
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Optimization failed: {str(e)}")
+    def optimize_subnets(self):
+        """Search for a tighter, better summarizable layout of the current plan"""
+        if not self.vlsm_allocations:
+            messagebox.showwarning("Warning", "No subnets to optimize. Please calculate VLSM first.")
+            return
+        if self.vlsm_hierarchy is not None:
+            messagebox.showinfo("Optimize", "Hierarchical plans are already packed level by level; "
+                                            "Optimize works on flat plans.")
+            return
 
-    def update_utilization_chart(self, subnets):
-        """Update the utilization efficiency chart"""
-        self.util_ax.clear()
+        base_network = self.vlsm_network_entry.get()
+        requirements = [{'name': a['name'], 'hosts': a['hosts'], 'priority': a['priority']}
+                        for a in self.vlsm_allocations]
+
+        def show_optimized(result):
+            allocations = result['allocations']
+            self.show_vlsm_results(allocations)
+            self.journal_vlsm(allocations)
+            self.update_utilization_chart(allocations)
+            self.remember("Optimize Subnets")
+
+            after = result['metrics']
+            before = result['baseline'] or after
+            lines = ["Subnet Optimization Results:\n"]
+            for label, key in (("Covering supernet", 'covering_prefix'),
+                               ("Summary routes", 'summary_routes'),
+                               ("Free blocks", 'free_blocks')):
+                prefix = "/" if key == 'covering_prefix' else ""
+                lines.append(f"• {label}: {prefix}{before[key]} → {prefix}{after[key]}")
+            lines.append(f"\nPlacement: {result['policy']}, {result['evaluations']:,} layouts evaluated")
+            messagebox.showinfo("Optimization Results", "\n".join(lines))
+
+        def optimize():
+            try:
+                network, prefix = vlsm_engine.parse_network(base_network)
+                result = self.result_cache.get_or_compute(
+                    "optimize_vlsm",
+                    lambda: vlsm_optimizer.optimize_vlsm((network, prefix), requirements,
+                                                         time_budget=self.OPTIMIZE_SECONDS),
+                    base=[network, prefix], time_budget=self.OPTIMIZE_SECONDS,
+                    requirements=sorted([r['name'], r['hosts'], r['priority']] for r in requirements))
+                self.ui_queue.post(show_optimized, result)
+            except Exception as e:
+                self.ui_queue.post(messagebox.showerror, "Error", f"Optimization failed: {str(e)}")
 
-        names = [s[0] for s in subnets]
-        efficiencies = [s[2] for s in subnets]
+        threading.Thread(target=optimize, daemon=True).start()
 
-        bars = self.util_ax.bar(names, efficiencies)
+    def open_scenario_window(self):
+        """Compare growth scenarios for the current requirements"""
+        requirements = [row for row in self.requirement_rows if row['name'] and row['hosts']]
+        if not requirements:
+            messagebox.showwarning("Warning", "No subnet requirements specified")
+            return
 
-        # Color code based on efficiency
-        for bar, eff in zip(bars, efficiencies):
-            if eff >= 80:
-                bar.set_color('green')
-            elif eff >= 60:
-                bar.set_color('yellow')
+        window = tk.Toplevel(self.root)
+        window.title("What-If Scenarios")
+        window.geometry("800x500")
+
+        form = ttk.Frame(window, padding=10)
+        form.pack(fill="x")
+        fields = {}
+        for row, (key, label, default) in enumerate((
+                ('growth', "Host growth % (comma separated):", "0, 10, 20, 50, 100"),
+                ('sites', "New sites (comma separated):", "0, 1, 2"),
+                ('orders', "Priority orders (comma separated):", "High>Normal>Low, Low>Normal>High"))):
+            ttk.Label(form, text=label).grid(row=row, column=0, sticky="w", pady=2)
+            entry = ttk.Entry(form, width=40)
+            entry.insert(0, default)
+            entry.grid(row=row, column=1, sticky="ew", pady=2)
+            fields[key] = entry
+        form.grid_columnconfigure(1, weight=1)
+
+        status = ttk.Label(window, text="", padding=(10, 0))
+        table = ui_support.VirtualTable(window, tuple(vlsm_scenarios.RESULT_COLUMNS))
+        results = []
+
+        def show_results(done, total):
+            table.set_source(len(results), lambda start, count: [
+                vlsm_scenarios.result_row(r) for r in results[start:start + count]], keep_position=True)
+            status.config(text=f"Evaluated {done} of {total} scenarios")
+
+        def show_summary():
+            overflow = vlsm_scenarios.first_overflow(results)
+            if overflow:
+                status.config(text=f"First overflow: {overflow['name']} — {overflow['error']}")
             else:
-                bar.set_color('red')
-
-        self.util_ax.set_ylabel('Efficiency %')
-        self.util_ax.set_title('Subnet Utilization Efficiency')
-        self.util_ax.set_ylim(0, 100)
+                status.config(text=f"All {len(results)} scenarios fit in the base network")
 
-        # Rotate labels if needed
-        if len(names) > 5:
-            self.util_ax.tick_params(axis='x', rotation=45)
-
-        self.util_fig.tight_layout()
-        self.util_fig.canvas.draw()
+        def run(base_network, scenarios, hierarchical):
+            def on_result(result, done):
+                results.append(result)
+                self.ui_queue.post_latest(("scenarios", id(window)), show_results, done, len(scenarios))
+            try:
+                vlsm_scenarios.run_scenarios(base_network, requirements, scenarios, on_result=on_result,
+                                             hierarchical=hierarchical)
+                self.ui_queue.post(show_summary)
+            except Exception as e:
+                self.ui_queue.post(messagebox.showerror, "Error", f"Scenario run failed: {str(e)}")
 
-    def check_overlaps(self):
-        """Check for subnet overlaps"""
-        networks = []
-        for item in self.vlsm_tree.get_children():
-            values = self.vlsm_tree.item(item)['values']
-            network_str = values[1]  # Network column
+        def start():
             try:
-                network = ipaddress.IPv4Network(network_str)
-                networks.append((values[0], network))  # (name, network)
-            except:
+                growth = [float(v) for v in fields['growth'].get().split(",") if v.strip()]
+                sites = [int(v) for v in fields['sites'].get().split(",") if v.strip()]
+                orders = [vlsm_scenarios.parse_priority_order(v)
+                          for v in fields['orders'].get().split(",") if v.strip()]
+                scenarios = vlsm_scenarios.build_scenarios(growth or [0], sites or [0],
+                                                           orders or [vlsm_scenarios.DEFAULT_ORDER])
+            except ValueError as e:
+                messagebox.showerror("Invalid Input", str(e), parent=window)
+                return
+            results.clear()
+            table.clear()
+            status.config(text=f"Evaluating {len(scenarios)} scenarios...")
+            threading.Thread(target=run, args=(self.vlsm_network_entry.get(), scenarios,
+                                               self.vlsm_hierarchical.get()), daemon=True).start()
+
+        ttk.Button(form, text="Run Scenarios", command=start).grid(row=3, column=1, sticky="e", pady=5)
+        status.pack(fill="x")
+        table.pack(fill="both", expand=True, padx=10, pady=10)
+
+    def update_utilization_chart(self, allocations):
+        """Update the utilization efficiency chart (redraws are debounced)"""
+        self.util_chart.update(allocations)
+
+    def index_prefix(self, source, ident, key, label):
+        """Record that row ident of a feature owns a prefix in the shared prefix index"""
+        if ident in self.indexed_prefixes.get(source, {}):
+            self.unindex_prefix(source, ident)
+        self.prefix_index.setdefault(key, {})[(source, ident)] = label
+        self.indexed_prefixes.setdefault(source, {})[ident] = (key, label)
+
+    def unindex_prefix(self, source, ident):
+        """Drop one row's claim on its prefix, removing the prefix once unowned"""
+        entry = self.indexed_prefixes.get(source, {}).pop(ident, None)
+        if entry is None:
+            return
+        owners = self.prefix_index.get(entry[0])
+        if owners is not None:
+            owners.pop((source, ident), None)
+            if not owners:
+                del self.prefix_index[entry[0]]
+
+    def update_prefix_index(self, source, entries):
+        """Replace a feature's rows (ident -> (key, label)), touching only the ones that changed"""
+        previous = self.indexed_prefixes.get(source, {})
+        for ident in [i for i in previous if i not in entries]:
+            self.unindex_prefix(source, ident)
+        for ident, (key, label) in entries.items():
+            if previous.get(ident) != (key, label):
+                self.index_prefix(source, ident, key, label)
+
+    def prefix_conflicts(self, source):
+        """Duplicate and nested prefixes among one feature's rows, from one walk of the index"""
+        conflicts = []
+        enclosing = []
+        for key, owners in self.prefix_index.items():
+            labels = [label for (owner_source, _), label in owners.items() if owner_source == source]
+            if not labels:
                 continue
+            # Entries come in address order, so the ones still enclosing key are on the stack
+            while enclosing and not prefix_index.key_contains(enclosing[-1][0], key):
+                enclosing.pop()
+            for _, outer_labels in enclosing:
+                conflicts.extend({'first': outer, 'second': label, 'relation': 'contains'}
+                                 for outer in outer_labels for label in labels)
+            conflicts.extend({'first': first, 'second': second, 'relation': 'duplicate'}
+                             for i, first in enumerate(labels) for second in labels[i + 1:])
+            enclosing.append((key, labels))
+        return conflicts
 
-        overlaps = []
-        for i, (name1, net1) in enumerate(networks):
-            for j, (name2, net2) in enumerate(networks[i + 1:], i + 1):
-                if net1.overlaps(net2):
-                    overlaps.append(f"{name1} overlaps with {name2}")
+    def check_overlaps(self):
+        """Check for subnet overlaps"""
+        overlaps = [prefix_index.describe_conflict(c) for c in self.prefix_conflicts("vlsm")]
 
         if overlaps:
             messagebox.showwarning("Overlaps Detected", "\n".join(overlaps))
@@ -843,48 +1104,59 @@ class AdvancedNetworkCalculator:
             if new_prefix <= base_network.prefixlen:
                 raise ValueError("New prefix must be larger than base network prefix")
 
-            # Clear previous results
-            self.ipv6_tree.delete(*self.ipv6_tree.get_children())
-
-            # Generate subnets
-            subnets = list(base_network.subnets(new_prefix=new_prefix))
-
-            for i, subnet in enumerate(subnets):
-                hosts = 2 ** (128 - subnet.prefixlen)
-                self.ipv6_tree.insert("", "end", values=(
-                    f"Subnet {i + 1}",
-                    str(subnet.network_address),
-                    f"/{subnet.prefixlen}",
-                    f"{hosts:,}"
-                ))
+            # Subnets are computed on demand, never materialized
+            subnets = subnet_math.SubnetRange(base_network, new_prefix)
+            row_count = subnets.count
+            if self.ipv6_subnet_count.get().strip():
+                row_count = min(row_count, int(self.ipv6_subnet_count.get()))
 
-                # Limit display for performance
-                if i >= 100:
-                    self.ipv6_tree.insert("", "end", values=(
-                        "...", "More subnets available", "", ""
-                    ))
-                    break
+            self.ipv6_subnets = subnets
+            self.ipv6_table.set_source(row_count, self.fetch_ipv6_rows)
 
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
+    def fetch_ipv6_rows(self, start, count):
+        """Display rows for a window of the current IPv6 subnet range"""
+        hosts = f"{2 ** (128 - self.ipv6_subnets.new_prefix):,}"
+        return [
+            (f"Subnet {start + i + 1:,}", str(subnet.network_address), f"/{subnet.prefixlen}", hosts)
+            for i, subnet in enumerate(self.ipv6_subnets.page(start, count))
+        ]
+
+    def jump_ipv6_subnet(self):
+        """Scroll the IPv6 results to a subnet number or the subnet holding an address"""
+        if self.ipv6_subnets is None:
+            return
+        target = self.ipv6_jump_entry.get().strip().replace(",", "")
+        try:
+            if target.isdigit():
+                index = int(target) - 1
+            else:
+                index = self.ipv6_subnets.index_of(target)
+            if not 0 <= index < self.ipv6_table.row_count:
+                raise ValueError("Subnet number out of range")
+            self.ipv6_table.scroll_to(index)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+
     def cidr_to_mask(self):
         """Convert CIDR to subnet mask"""
         try:
             cidr = int(self.cidr_entry.get().replace('/', ''))
-            mask = ipaddress.IPv4Network(f"0.0.0.0/{cidr}").netmask
+            if not 0 <= cidr <= 32:
+                raise ValueError(cidr)
+            mask = subnet_math.format_ipv4(subnet_math.prefix_to_netmask([cidr]))[0]
             self.mask_entry.delete(0, tk.END)
-            self.mask_entry.insert(0, str(mask))
+            self.mask_entry.insert(0, mask)
         except Exception as e:
             messagebox.showerror("Error", "Invalid CIDR notation")
 
     def mask_to_cidr(self):
         """Convert subnet mask to CIDR"""
         try:
-            mask = self.mask_entry.get()
-            # Convert mask to CIDR
-            binary = ''.join([bin(int(x))[2:].zfill(8) for x in mask.split('.')])
-            cidr = binary.count('1')
+            mask = subnet_math.parse_ipv4([self.mask_entry.get()])
+            cidr = int(subnet_math.netmask_to_prefix(mask)[0])
             self.cidr_entry.delete(0, tk.END)
             self.cidr_entry.insert(0, f"/{cidr}")
         except Exception as e:
@@ -897,24 +1169,30 @@ class AdvancedNetworkCalculator:
             if not networks_text:
                 return
 
-            networks = []
-            for line in networks_text.split('\n'):
-                line = line.strip()
-                if line:
-                    networks.append(ipaddress.IPv4Network(line))
-
+            networks = [line.strip() for line in networks_text.split('\n') if line.strip()]
             if len(networks) < 2:
                 self.supernet_result.set("Need at least 2 networks")
                 return
-
-            # Find the supernet
-            supernet = ipaddress.collapse_addresses(networks)
-            supernet_list = list(supernet)
-
-            if len(supernet_list) == 1:
-                result = f"Summary route: {supernet_list[0]}"
+            tolerance = int(self.supernet_tolerance_entry.get() or 0)
+            if tolerance < 0:
+                raise ValueError("Extra addresses allowed cannot be negative")
+
+            # Find the summary routes, covering at most tolerance unused addresses
+            routes, extra = self.result_cache.get_or_compute(
+                "summarize_networks", lambda: subnet_math.summarize_networks(networks, tolerance),
+                networks=sorted(networks), tolerance=tolerance)
+
+            self.update_prefix_index("supernet", {
+                route: (route, subnet_math.format_route(route)) for route in routes
+            })
+
+            summary = [subnet_math.format_route(route) for route in routes]
+            if len(summary) == 1:
+                result = f"Summary route: {summary[0]}"
             else:
-                result = f"Multiple summary routes needed: {', '.join(str(s) for s in supernet_list)}"
+                result = f"Multiple summary routes needed: {', '.join(summary)}"
+            if extra[4] or extra[6]:
+                result += f" (covers {extra[4] + extra[6]:,} extra addresses)"
 
             self.supernet_result.set(result)
 
@@ -945,76 +1223,216 @@ class AdvancedNetworkCalculator:
         except Exception as e:
             self.bw_result.set("Error in conversion")
 
-    def start_ping_sweep(self):
-        """Start ping sweep in background thread"""
+    def load_route_table(self):
+        """Read a route table file and build its lookup arrays in the background"""
+        filename = filedialog.askopenfilename(
+            filetypes=[("Route tables", "*.txt *.csv"), ("All files", "*.*")])
+        if not filename:
+            return
+
+        def loaded(table):
+            self.route_table = table
+            self.route_table_status.set(f"{len(table):,} routes loaded from {os.path.basename(filename)}")
 
-        def ping_sweep():
+        def load():
             try:
-                network = ipaddress.IPv4Network(self.ping_range_entry.get())
-                self.scan_tree.delete(*self.scan_tree.get_children())
-                self.scan_progress.start()
-
-                for ip in network.hosts():
-                    # Simple ping using subprocess
-                    try:
-                        start_time = time.time()
-                        result = subprocess.run(['ping', '-c', '1', '-W', '1000', str(ip)],
-                                                capture_output=True, timeout=2)
-                        response_time = (time.time() - start_time) * 1000
-
-                        if result.returncode == 0:
-                            status = "Up"
-                            self.scan_tree.insert("", "end", values=(
-                                str(ip), status, "N/A", f"{response_time:.1f}ms"
-                            ))
-                    except:
-                        pass
-
-                self.scan_progress.stop()
+                table = prefix_index.RouteTable(prefix_index.read_route_table(filename))
+                table.build()
+                self.ui_queue.post(loaded, table)
+            except Exception as e:
+                self.ui_queue.post(messagebox.showerror, "Error", f"Failed to load route table: {str(e)}")
 
+        self.route_table_status.set("Loading route table...")
+        threading.Thread(target=load, daemon=True).start()
+
+    def lookup_route(self):
+        """Show the longest matching route and planned prefix for the entered address"""
+        address = self.route_address_entry.get().strip()
+        try:
+            planned = self.prefix_index.longest_match(address)
+            match = self.route_table.lookup(address) if self.route_table is not None else None
+        except ValueError:
+            self.route_result.set("Invalid IP address")
+            return
+        if self.route_table is None:
+            result = "No route table loaded"
+        elif match:
+            network = prefix_index.key_to_network(match[0])
+            result = f"{address} → {network} via {match[1] or 'directly connected'}"
+        else:
+            result = f"No route to {address}"
+        if planned:
+            key, owners = planned
+            result += f"; planned in {prefix_index.key_to_network(key)} ({', '.join(owners.values())})"
+        self.route_result.set(result)
+
+    def benchmark_route_table(self):
+        """Measure lookup throughput on the loaded table, or a synthetic full table"""
+        table = self.route_table
+
+        def finished(result):
+            self.route_table_status.set(
+                f"{result['routes']:,} routes: {result['batch_lookups_per_second']:,.0f} batch and "
+                f"{result['single_lookups_per_second']:,.0f} single lookups/s "
+                f"(built in {result['build_seconds']:.2f}s)")
+
+        def run():
+            try:
+                source = table if table is not None else prefix_index.RouteTable(
+                    prefix_index.synthetic_routes())
+                self.ui_queue.post(finished, prefix_index.benchmark(source))
             except Exception as e:
-                self.scan_progress.stop()
-                messagebox.showerror("Error", str(e))
+                self.ui_queue.post(messagebox.showerror, "Error", f"Benchmark failed: {str(e)}")
 
-        threading.Thread(target=ping_sweep, daemon=True).start()
+        self.route_table_status.set("Benchmarking lookups...")
+        threading.Thread(target=run, daemon=True).start()
+
+    def check_summary_coverage(self):
+        """Check that the last summary routes cover every route in the table"""
+        summary = [prefix_index.key_to_network(key) for key, _ in self.indexed_prefixes.get("supernet", {}).values()]
+        if self.route_table is None or not summary:
+            messagebox.showinfo("Coverage", "Load a route table and calculate a summary route first")
+            return
+        missing = prefix_index.uncovered_addresses(self.route_table, summary)
+        if missing:
+            shown = "\n".join(missing[:10])
+            messagebox.showwarning("Coverage", f"{len(missing):,} sampled addresses are not covered:\n{shown}")
+        else:
+            messagebox.showinfo("Coverage", "The summary routes cover every route in the table")
+
+    def start_ping_sweep(self):
+        """Start ping sweep in background thread"""
+        ui = self.ui_queue
+
+        def show_results(results):
+            for result in results:
+                self.scan_results.append(result['ip'], result['status'], result['rtt'])
+                # Down hosts are most of a large sweep; only live ones are worth journaling
+                if result['status'] != "Down":
+                    self.journal.record('scan_host', ip=result['ip'], status=result['status'], rtt=result['rtt'])
+            ui.post_latest("scan_view", self.refresh_scan_view)
+
+        def show_progress(done, total, rate):
+            ui.post_latest("scan_status", self.scan_status.set,
+                           f"Pinged {done:,}/{total:,} hosts ({rate:,.0f} hosts/s)")
+
+        def ping_sweep(network, sweeper):
+            batcher = ui_support.ResultBatcher(ui, show_results)
+            try:
+                total = max(network.num_addresses - 2, 1)
+                asyncio.run(sweeper.sweep(network.hosts(), batcher.add, show_progress, total))
+            except Exception as e:
+                ui.post(messagebox.showerror, "Error", str(e))
+            finally:
+                batcher.flush()
+                ui.post(self.scan_progress.stop)
+
+        try:
+            network = ipaddress.IPv4Network(self.ping_range_entry.get(), strict=False)
+            sweeper = scanner.PingSweeper(
+                concurrency=int(self.ping_concurrency_entry.get()),
+                timeout=float(self.ping_timeout_entry.get()))
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        self.scan_results.clear()
+        self.journal.record('scans_clear')
+        self.refresh_scan_view(keep_position=False)
+        self.scan_progress.start()
+        threading.Thread(target=ping_sweep, args=(network, sweeper), daemon=True).start()
 
     def start_port_scan(self):
         """Start port scan in background thread"""
+        ui = self.ui_queue
 
-        def port_scan():
-            try:
-                target = self.port_target_entry.get()
-                port_range = self.port_range_entry.get()
+        def show_results(results):
+            for result in results:
+                self.scan_results.add_port(result['ip'], result['port'], result['rtt'])
+                self.journal.record('scan_port', ip=result['ip'], port=result['port'], rtt=result['rtt'])
+            ui.post_latest("scan_view", self.refresh_scan_view)
 
-                if '-' in port_range:
-                    start_port, end_port = map(int, port_range.split('-'))
-                else:
-                    start_port = end_port = int(port_range)
+        def show_scanned(targets):
+            # Targets without an open port still get a row
+            for target in targets:
+                if target not in self.scan_results:
+                    self.scan_results.append(target, "Scanned")
+                    self.journal.record('scan_host', ip=target, status="Scanned")
+            self.refresh_scan_view()
+
+        def show_progress(done, total, rate):
+            ui.post_latest("scan_status", self.scan_status.set,
+                           f"Probed {done:,}/{total:,} ports ({rate:,.0f} ports/s)")
 
-                self.scan_progress.start()
-                open_ports = []
+        def port_scan(targets, ports):
+            batcher = ui_support.ResultBatcher(ui, show_results)
 
-                for port in range(start_port, min(end_port + 1, start_port + 100)):  # Limit scan
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(0.5)
-                    result = sock.connect_ex((target, port))
-                    if result == 0:
-                        open_ports.append(str(port))
-                    sock.close()
+            def on_result(result):
+                if result['state'] == "open":
+                    batcher.add(result)
 
-                # Update tree with results
-                ports_str = ", ".join(open_ports) if open_ports else "None open"
-                self.scan_tree.insert("", "end", values=(
-                    target, "Scanned", ports_str, "N/A"
-                ))
+            try:
+                asyncio.run(scanner.PortScanner().scan(targets, ports, on_result, show_progress))
+                batcher.flush()
+                ui.post(show_scanned, targets)
+            except Exception as e:
+                ui.post(messagebox.showerror, "Error", str(e))
+            finally:
+                batcher.flush()
+                ui.post(self.scan_progress.stop)
 
-                self.scan_progress.stop()
+        try:
+            targets = scanner.parse_targets(self.port_target_entry.get())
+            ports = scanner.parse_ports(self.port_range_entry.get())
+            if any(":" in target for target in targets):
+                raise ValueError("The scan results table holds IPv4 targets only")
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
 
+        self.scan_progress.start()
+        threading.Thread(target=port_scan, args=(targets, ports), daemon=True).start()
+
+    def refresh_scan_view(self, keep_position=True):
+        """Re-filter and re-sort the scan results behind the virtual table"""
+        sort_by, descending = self.scan_sort
+        rows = self.scan_results.select(self.SCAN_FILTERS[self.scan_filter.get()], None, sort_by, descending)
+        self.scan_table.set_source(
+            len(rows), lambda start, count: self.scan_results.display_rows(rows[start:start + count]),
+            keep_position)
+
+    def sort_scan_results(self, column):
+        """Sort scan results by a column, toggling direction on repeat clicks"""
+        key = self.SCAN_SORT_KEYS[column]
+        sort_by, descending = self.scan_sort
+        self.scan_sort = (key, not descending if key == sort_by else False)
+        self.refresh_scan_view(keep_position=False)
+
+    def export_scan_results(self):
+        """Stream the currently shown scan results to a file"""
+        if not len(self.scan_results):
+            messagebox.showwarning("Warning", "No scan results to export")
+            return
+
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("JSON files", "*.json"),
+                       ("JSON lines", "*.jsonl"), ("Parquet files", "*.parquet")]
+        )
+        if not filename:
+            return
+
+        sort_by, descending = self.scan_sort
+        rows = self.scan_results.select(self.SCAN_FILTERS[self.scan_filter.get()], None, sort_by, descending)
+
+        def export():
+            try:
+                self.scan_results.export(filename, rows)
+                self.ui_queue.post(messagebox.showinfo, "Export Complete", f"Scan results exported to {filename}")
             except Exception as e:
-                self.scan_progress.stop()
-                messagebox.showerror("Error", str(e))
+                self.ui_queue.post(messagebox.showerror, "Error", f"Export failed: {str(e)}")
 
-        threading.Thread(target=port_scan, daemon=True).start()
+        threading.Thread(target=export, daemon=True).start()
 
     def generate_practice_question(self):
         """Generate practice questions based on difficulty"""
@@ -1096,7 +1514,7 @@ class AdvancedNetworkCalculator:
 
         # Validate subnet
         try:
-            ipaddress.IPv4Network(subnet)
+            network = ipaddress.IPv4Network(subnet)
         except:
             messagebox.showerror("Error", "Invalid subnet format")
             return
@@ -1111,6 +1529,9 @@ class AdvancedNetworkCalculator:
         }
 
         self.vlan_data.append(vlan_info)
+        self.journal.record('vlan_add', vlan=vlan_info)
+        self.history.stage(vlan=self.history.pending.vlan.append(dict(vlan_info)))
+        self.index_prefix("vlan", vlan_id, prefix_index.prefix_key(network), f"VLAN {vlan_id}")
 
         # Update tree
         self.vlan_tree.insert("", "end", values=(
@@ -1121,6 +1542,7 @@ class AdvancedNetworkCalculator:
         for entry in [self.vlan_id_entry, self.vlan_name_entry,
                       self.vlan_subnet_entry, self.vlan_desc_entry]:
             entry.delete(0, tk.END)
+        self.remember("Add VLAN")
 
     def generate_vlan_config(self):
         """Generate VLAN configuration commands"""
@@ -1165,18 +1587,9 @@ class AdvancedNetworkCalculator:
 
     def check_vlan_conflicts(self):
         """Check for VLAN conflicts"""
-        conflicts = []
-
         # Check subnet overlaps
-        for i, vlan1 in enumerate(self.vlan_data):
-            for j, vlan2 in enumerate(self.vlan_data[i + 1:], i + 1):
-                try:
-                    net1 = ipaddress.IPv4Network(vlan1['subnet'])
-                    net2 = ipaddress.IPv4Network(vlan2['subnet'])
-                    if net1.overlaps(net2):
-                        conflicts.append(f"VLAN {vlan1['id']} and {vlan2['id']} have overlapping subnets")
-                except:
-                    pass
+        found = self.prefix_conflicts("vlan")
+        conflicts = [f"{c['first']} and {c['second']} have overlapping subnets" for c in found]
 
         if conflicts:
             messagebox.showwarning("Conflicts Found", "\n".join(conflicts))
@@ -1213,70 +1626,134 @@ class AdvancedNetworkCalculator:
 
     def auto_generate_topology(self):
         """Auto-generate network topology from VLSM data"""
-        self.topology_ax.clear()
-
         # Create a simple topology based on current subnets
-        self.network_graph.clear()
+        graph = nx.Graph()
 
         # Add core router
-        self.network_graph.add_node("Core Router", type="router")
-
-        # Add subnets from VLSM calculation
-        for item in self.vlsm_tree.get_children():
-            values = self.vlsm_tree.item(item)['values']
-            subnet_name = values[0]
-            self.network_graph.add_node(subnet_name, type="subnet")
-            self.network_graph.add_edge("Core Router", subnet_name)
-
-        # Generate layout
-        pos = nx.spring_layout(self.network_graph)
-
-        # Draw nodes
-        router_nodes = [n for n, d in self.network_graph.nodes(data=True) if d.get('type') == 'router']
-        subnet_nodes = [n for n, d in self.network_graph.nodes(data=True) if d.get('type') == 'subnet']
-
-        nx.draw_networkx_nodes(self.network_graph, pos, nodelist=router_nodes,
-                               node_color='red', node_size=1000, ax=self.topology_ax)
-        nx.draw_networkx_nodes(self.network_graph, pos, nodelist=subnet_nodes,
-                               node_color='lightblue', node_size=500, ax=self.topology_ax)
-
-        # Draw edges and labels
-        nx.draw_networkx_edges(self.network_graph, pos, ax=self.topology_ax)
-        nx.draw_networkx_labels(self.network_graph, pos, font_size=8, ax=self.topology_ax)
-
-        self.topology_ax.set_title("Network Topology")
-        self.topology_ax.axis('off')
+        graph.add_node("Core Router", type="router")
+
+        # Add subnets from VLSM calculation, under their groups when nested
+        if self.vlsm_hierarchy is not None:
+            stack = [("Core Router", child) for child in self.vlsm_hierarchy['children']]
+            while stack:
+                parent, node = stack.pop()
+                node_type = "subnet" if node['requirement'] is not None else "group"
+                graph.add_node(node['path'], type=node_type)
+                graph.add_edge(parent, node['path'])
+                stack.extend((node['path'], child) for child in node['children'])
+        else:
+            for alloc in self.vlsm_allocations:
+                subnet_name = alloc['name']
+                graph.add_node(subnet_name, type="subnet")
+                graph.add_edge("Core Router", subnet_name)
+
+        # Apply the differences so unaffected analysis results stay cached
+        self.topology_analysis.sync(graph)
+        self.draw_topology()
+        self.remember("Generate Topology")
+
+    def draw_topology(self):
+        """Draw the current graph, placing only nodes not laid out before"""
+        pos = self.topology_layout.layout(self.network_graph)
+        topology.draw_topology(self.topology_ax, self.network_graph, pos)
         self.topology_fig.tight_layout()
-        self.topology_fig.canvas.draw()
+        self.topology_fig.canvas.draw_idle()
 
     def load_topology_csv(self):
-        """Load topology from CSV file"""
+        """Load topology from a CSV edge list (Source, Target, Type, ...)"""
         filename = filedialog.askopenfilename(
             filetypes=[("CSV files", "*.csv")]
         )
 
+        def show_topology(graph):
+            # A different topology: lay it out from scratch
+            self.network_graph = graph
+            self.topology_layout.reset()
+            self.topology_analysis = topology_analysis.TopologyAnalysis(
+                graph, on_edit=self.topology_edited)
+            self.index_topology(graph)
+            self.history.stage(**history.graph_sections(self.history.pending, graph))
+            self.draw_topology()
+            self.remember("Load Topology")
+            messagebox.showinfo("Success", f"Topology loaded from CSV: {graph.number_of_nodes():,} nodes, "
+                                           f"{graph.number_of_edges():,} links")
+
+        def load():
+            try:
+                graph = topology.read_topology_csv(filename)
+                self.journal.record('topology', body=project_store.encode_topology(graph))
+                self.ui_queue.post(show_topology, graph)
+
+            except Exception as e:
+                self.ui_queue.post(messagebox.showerror, "Error", f"Failed to load topology: {str(e)}")
+
         if filename:
+            threading.Thread(target=load, daemon=True).start()
+
+    def open_topology_analysis(self):
+        """Hop counts, single points of failure and failure impact of the topology"""
+        if not self.network_graph.nodes():
+            messagebox.showwarning("Warning", "No topology to analyze")
+            return
+        analysis = self.topology_analysis
+
+        window = tk.Toplevel(self.root)
+        window.title("Topology Analysis")
+        window.geometry("800x550")
+
+        form = ttk.Frame(window, padding=10)
+        form.pack(fill="x")
+        nodes = sorted((str(n) for n in self.network_graph), key=str)
+        ttk.Label(form, text="From:").grid(row=0, column=0, sticky="w")
+        source = ttk.Combobox(form, values=nodes[:5000], width=30)
+        source.grid(row=0, column=1, padx=5)
+        ttk.Label(form, text="To:").grid(row=0, column=2, sticky="w")
+        target = ttk.Combobox(form, values=nodes[:5000], width=30)
+        target.grid(row=0, column=3, padx=5)
+        hops = ttk.Label(form, text="")
+        hops.grid(row=1, column=0, columnspan=5, sticky="w", pady=2)
+
+        by_name = {str(n): n for n in self.network_graph}
+
+        def show_hops():
             try:
-                df = pd.read_csv(filename)
-                self.network_graph.clear()
+                count = analysis.hop_count(by_name.get(source.get(), source.get()),
+                                           by_name.get(target.get(), target.get()))
+            except ValueError as e:
+                hops.config(text=str(e))
+                return
+            hops.config(text="No path" if count is None else f"{count} hop{'s' if count != 1 else ''}")
+
+        ttk.Button(form, text="Hop Count", command=show_hops).grid(row=0, column=4, padx=5)
 
-                # Assuming CSV has columns: Source, Target, Type
-                for _, row in df.iterrows():
-                    source = row.get('Source', '')
-                    target = row.get('Target', '')
-                    node_type = row.get('Type', 'device')
+        points = analysis.articulation_points()
+        bridges = analysis.bridges()
+        shown = ", ".join(str(p) for p in points[:10]) + (" ..." if len(points) > 10 else "")
+        ttk.Label(window, padding=(10, 0), wraplength=760,
+                  text=f"Single points of failure: {len(points):,} nodes ({shown or 'none'}), "
+                       f"{len(bridges):,} links").pack(fill="x")
 
-                    if source and target:
-                        self.network_graph.add_node(source, type=node_type)
-                        self.network_graph.add_node(target, type=node_type)
-                        self.network_graph.add_edge(source, target)
+        status = ttk.Label(window, text="Simulating every single node and link failure...", padding=(10, 5))
+        status.pack(fill="x")
+        table = ui_support.VirtualTable(window, tuple(topology_analysis.FAILURE_COLUMNS))
+        table.pack(fill="both", expand=True, padx=10, pady=10)
 
-                # Redraw topology
-                self.auto_generate_topology()
-                messagebox.showinfo("Success", "Topology loaded from CSV")
+        def show_results(results):
+            table.set_source(len(results), lambda start, count: [
+                topology_analysis.failure_row(r) for r in results[start:start + count]])
+            harmful = sum(1 for r in results if r['disconnected'] or r['rerouted'])
+            status.config(text=f"{len(results):,} failures simulated, {harmful:,} affect reachability")
 
+        # The sweep runs on a copy: the UI thread may edit the live graph meanwhile
+        snapshot = topology_analysis.TopologyAnalysis(self.network_graph.copy())
+
+        def run():
+            try:
+                self.ui_queue.post(show_results, snapshot.failure_impact())
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to load topology: {str(e)}")
+                self.ui_queue.post(messagebox.showerror, "Error", f"Failure analysis failed: {str(e)}")
+
+        threading.Thread(target=run, daemon=True).start()
 
     def save_topology(self):
         """Save current topology to file"""
@@ -1302,27 +1779,34 @@ class AdvancedNetworkCalculator:
             messagebox.showerror("Error", "AI libraries not installed. Install: pip install transformers torch")
             return
 
+        def model_loaded(tokenizer, model, path, status):
+            self.ai_tokenizer = tokenizer
+            self.ai_model = model
+            self.current_model_path = path
+            self.model_status.set(status)
+
+        def load(path, status, error_prefix):
+            try:
+                tokenizer = AutoTokenizer.from_pretrained(path)
+                model = AutoModelForCausalLM.from_pretrained(path)
+                self.ui_queue.post(model_loaded, tokenizer, model, path, status)
+            except Exception as e:
+                self.ui_queue.post(self.model_status.set, "No model loaded")
+                self.ui_queue.post(messagebox.showerror, "Error", f"{error_prefix}: {str(e)}")
+
         # File dialog for model selection
         model_path = filedialog.askdirectory(title="Select Model Directory")
         if not model_path:
             # Use default model
             model_name = "microsoft/DialoGPT-small"  # Lightweight model for demo
-            try:
-                self.ai_tokenizer = AutoTokenizer.from_pretrained(model_name)
-                self.ai_model = AutoModelForCausalLM.from_pretrained(model_name)
-                self.current_model_path = model_name
-                self.model_status.set(f"Model loaded: {model_name}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load model: {str(e)}")
+            args = (model_name, f"Model loaded: {model_name}", "Failed to load model")
         else:
             # Load custom model
-            try:
-                self.ai_tokenizer = AutoTokenizer.from_pretrained(model_path)
-                self.ai_model = AutoModelForCausalLM.from_pretrained(model_path)
-                self.current_model_path = model_path
-                self.model_status.set(f"Custom model loaded: {os.path.basename(model_path)}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load custom model: {str(e)}")
+            args = (model_path, f"Custom model loaded: {os.path.basename(model_path)}",
+                    "Failed to load custom model")
+
+        self.model_status.set("Loading model...")
+        threading.Thread(target=load, args=args, daemon=True).start()
 
     def get_ai_troubleshoot(self):
         """Get AI-powered troubleshooting suggestions"""
@@ -1334,40 +1818,48 @@ class AdvancedNetworkCalculator:
         if not problem:
             return
 
-        try:
-            # Prepare network context
-            context = "Network troubleshooting context:\n"
+        # Prepare network context
+        context = "Network troubleshooting context:\n"
 
-            # Add VLSM data if available
-            for item in self.vlsm_tree.get_children():
-                values = self.vlsm_tree.item(item)['values']
-                context += f"Subnet: {values[0]} - {values[1]}\n"
+        # Add VLSM data if available (capped to keep the prompt small)
+        for alloc in self.vlsm_allocations[:50]:
+            context += f"Subnet: {alloc['name']} - {vlsm_engine.int_to_ip(alloc['network'])}/{alloc['prefix']}\n"
 
-            # Add scan results if available
-            for item in self.scan_tree.get_children():
-                values = self.scan_tree.item(item)['values']
-                context += f"Host: {values[0]} - Status: {values[1]}\n"
+        # Add scan results if available (responding hosts, capped to keep the prompt small)
+        responding = self.scan_results.select(self.SCAN_FILTERS["Up / Open"])[:50]
+        for record in self.scan_results.records(responding):
+            context += f"Host: {record['ip']} - Status: {record['status']}\n"
 
-            full_prompt = f"{context}\nProblem: {problem}\nSuggested solution:"
+        full_prompt = f"{context}\nProblem: {problem}\nSuggested solution:"
+        tokenizer, model = self.ai_tokenizer, self.ai_model
 
-            # Generate response (simplified for demo)
-            # In production, this would use more sophisticated prompting
-            inputs = self.ai_tokenizer.encode(full_prompt, return_tensors='pt')
-            outputs = self.ai_model.generate(inputs, max_length=200, do_sample=True)
-            response = self.ai_tokenizer.decode(outputs[0], skip_special_tokens=True)
+        def show_solution(solution):
+            self.ai_output.delete("1.0", tk.END)
+            self.ai_output.insert("1.0", f"Problem: {problem}\n\nAI Suggestion:\n{solution}")
 
-            # Extract only the generated part
-            solution = response[len(full_prompt):].strip()
+        def generate():
+            try:
+                # Generate response (simplified for demo)
+                # In production, this would use more sophisticated prompting
+                inputs = tokenizer.encode(full_prompt, return_tensors='pt')
+                outputs = model.generate(inputs, max_length=200, do_sample=True)
+                response = tokenizer.decode(outputs[0], skip_special_tokens=True)
 
-            # Add some predefined networking solutions for better results
-            if not solution or len(solution) < 10:
-                solution = self.get_predefined_solution(problem)
+                # Extract only the generated part
+                solution = response[len(full_prompt):].strip()
 
-            self.ai_output.delete("1.0", tk.END)
-            self.ai_output.insert("1.0", f"Problem: {problem}\n\nAI Suggestion:\n{solution}")
+                # Add some predefined networking solutions for better results
+                if not solution or len(solution) < 10:
+                    solution = self.get_predefined_solution(problem)
 
-        except Exception as e:
-            messagebox.showerror("Error", f"AI processing failed: {str(e)}")
+                self.ui_queue.post(show_solution, solution)
+
+            except Exception as e:
+                self.ui_queue.post(messagebox.showerror, "Error", f"AI processing failed: {str(e)}")
+
+        self.ai_output.delete("1.0", tk.END)
+        self.ai_output.insert("1.0", "Generating suggestion...")
+        threading.Thread(target=generate, daemon=True).start()
 
     def get_predefined_solution(self, problem):
         """Fallback predefined solutions"""
@@ -1537,61 +2029,360 @@ class AdvancedNetworkCalculator:
     def new_project(self):
         """Create new project"""
         self.projects = {}
+        self.vlan_data = []
+        self.prefix_index = prefix_index.PrefixTrie()
+        self.indexed_prefixes = {}
+        # The topology is kept, so its addresses go back into the fresh index
+        self.index_topology(self.network_graph)
         # Clear all data
-        for tree in [self.vlsm_tree, self.ipv6_tree, self.scan_tree, self.vlan_tree]:
-            tree.delete(*tree.get_children())
+        self.vlan_tree.delete(*self.vlan_tree.get_children())
+        self.history.stage(vlan=history.PVector())
+        self.show_vlsm_results([])
+        self.scan_results.clear()
+        self.refresh_scan_view(keep_position=False)
+        self.ipv6_subnets = None
+        self.ipv6_table.clear()
+        self.switch_journal(self.AUTOSAVE_PATH, self.project_snapshot())
+        self.remember("New Project")
         messagebox.showinfo("New Project", "New project created")
 
+    def project_snapshot(self):
+        """Copy of the project state that background writers can encode safely"""
+        project = {
+            'vlsm': list(self.vlsm_allocations),
+            'vlan': [dict(vlan) for vlan in self.vlan_data],
+        }
+        if self.network_graph.nodes():
+            project['topology'] = (self.network_graph.copy(), dict(self.topology_layout.positions))
+        if len(self.scan_results):
+            project['scans'] = scanner.ScanResultStore()
+            project['scans'].restore(*self.scan_results.columns())
+        return project
+
     def save_project(self):
-        """Save current project"""
+        """Save current project (binary .vlsmproj, or JSON for compatibility)"""
         filename = filedialog.asksaveasfilename(
-            defaultextension=".json",
-            filetypes=[("JSON files", "*.json")]
+            defaultextension=project_store.EXTENSION,
+            filetypes=project_store.FILE_TYPES
         )
         if filename:
-            project_data = {
-                "vlsm_data": [],
-                "vlan_data": self.vlan_data,
-                "network_config": {}
-            }
-
-            # Save VLSM data
-            for item in self.vlsm_tree.get_children():
-                project_data["vlsm_data"].append(self.vlsm_tree.item(item)['values'])
-
-            with open(filename, 'w') as f:
-                json.dump(project_data, f, indent=2)
+            try:
+                if filename.lower().endswith(project_store.EXTENSION):
+                    # The saved file becomes the base that later edits are journaled against
+                    self.journal.save_as(filename, self.project_snapshot())
+                    self.project_path = filename
+                else:
+                    project_store.save_project(filename, self.project_snapshot())
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save project: {str(e)}")
+                return
 
             messagebox.showinfo("Saved", f"Project saved to {filename}")
 
     def open_project(self):
         """Open existing project"""
         filename = filedialog.askopenfilename(
-            filetypes=[("JSON files", "*.json")]
+            filetypes=[("Project files", f"*{project_store.EXTENSION} *.json")] + project_store.FILE_TYPES
         )
-        if filename:
-            try:
-                with open(filename, 'r') as f:
-                    project_data = json.load(f)
-
-                # Load VLSM data
-                self.vlsm_tree.delete(*self.vlsm_tree.get_children())
-                for row in project_data.get("vlsm_data", []):
-                    self.vlsm_tree.insert("", "end", values=row)
-
-                # Load VLAN data
-                self.vlan_data = project_data.get("vlan_data", [])
-                self.vlan_tree.delete(*self.vlan_tree.get_children())
-                for vlan in self.vlan_data:
-                    self.vlan_tree.insert("", "end", values=(
-                        vlan['id'], vlan['name'], vlan['subnet'],
-                        vlan['description'], vlan['status']
-                    ))
-
-                messagebox.showinfo("Opened", f"Project loaded from {filename}")
+        if not filename:
+            return
+        binary = filename.lower().endswith(project_store.EXTENSION)
+        project_file = None
+        try:
+            if binary and not project_store.pending_records(filename):
+                project_file = project_store.ProjectFile(filename)
+            else:
+                # JSON, or a binary project with edits left in its journal by a crash
+                project = project_store.recover(filename)[0] if binary else project_store.load_project(filename)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to open project: {str(e)}")
+            return
+        if binary:
+            self.switch_journal(filename)
 
+        def apply_next(names):
+            # One section per UI tick, so the window stays responsive
+            try:
+                if project_file is not None:
+                    value = project_file.section(names[0])
+                else:
+                    value = project.get(names[0])
+                self.apply_project_section(names[0], value)
             except Exception as e:
+                if project_file is not None:
+                    project_file.close()
                 messagebox.showerror("Error", f"Failed to open project: {str(e)}")
+                return
+            if len(names) > 1:
+                self.ui_queue.post(apply_next, names[1:])
+                return
+            if project_file is not None:
+                project_file.close()
+            if not binary:
+                # A JSON project is only journaled once copied into the autosave file
+                self.switch_journal(self.AUTOSAVE_PATH, self.project_snapshot())
+            self.remember("Open Project")
+            messagebox.showinfo("Opened", f"Project loaded from {filename}")
+
+        apply_next(project_store.SECTIONS)
+
+    def apply_project_section(self, name, value):
+        """Show one section of a loaded project; a missing section clears what it covers"""
+        if name == 'vlsm':
+            self.show_vlsm_results(value or [])
+        elif name == 'vlan':
+            self.load_vlan_data(value or [])
+        elif name == 'topology':
+            # Empty topologies are not written, so None means an empty graph
+            graph, positions = value if value is not None else (nx.Graph(), {})
+            self.network_graph = graph
+            self.topology_layout.reset()
+            self.topology_layout.positions.update(positions)
+            self.topology_analysis = topology_analysis.TopologyAnalysis(
+                graph, on_edit=self.topology_edited)
+            self.index_topology(graph)
+            self.history.stage(**history.graph_sections(self.history.pending, graph))
+            self.draw_topology()
+        elif name == 'scans':
+            if value is None:
+                self.scan_results.clear()
+            else:
+                self.scan_results.restore(*value.columns())
+            self.refresh_scan_view(keep_position=False)
+
+    def journal_vlsm(self, allocations):
+        """Journal a new VLSM plan"""
+        self.journal.record('vlsm', body=project_store.encode_vlsm(allocations))
+
+    def index_topology(self, graph):
+        """Index the address of every topology node that has one"""
+        entries = {}
+        for node, data in graph.nodes(data=True):
+            key = topology.node_prefix(node, data)
+            if key is not None:
+                entries[node] = (key, str(node))
+        self.update_prefix_index("topology", entries)
+
+    def index_topology_node(self, node):
+        graph = self.topology_analysis.graph
+        key = topology.node_prefix(node, graph.nodes[node]) if node in graph else None
+        if key is None:
+            self.unindex_prefix("topology", node)
+        else:
+            self.index_prefix("topology", node, key, str(node))
+
+    def topology_edited(self, action, *args):
+        """Journal a change made through the topology analysis, index it and stage it for undo"""
+        if action == 'replace':
+            self.index_topology(args[0])
+        elif action in ('add_node', 'remove_node'):
+            self.index_topology_node(args[0])
+        elif action == 'add_edge':
+            # Adding a link also adds ends that were not nodes yet
+            for node in args[:2]:
+                if node not in self.indexed_prefixes.get("topology", {}):
+                    self.index_topology_node(node)
+        if not self.restoring:
+            self.history.stage(**history.topology_sections(self.history.pending, action, *args))
+        if action == 'replace':
+            self.journal.record('topology', body=project_store.encode_topology(args[0]))
+        else:
+            self.journal.record('topology_edit', action=action, args=list(args))
+
+    def switch_journal(self, project_path, project=None):
+        """Journal against another project file, writing project there first if given"""
+        self.journal.close(remove=self.project_path is None)
+        self.journal = project_store.ProjectJournal(project_path)
+        if project is not None:
+            self.journal.save_as(project_path, project)
+        self.project_path = None if project_path == self.AUTOSAVE_PATH else project_path
+
+    def offer_recovery(self):
+        """Offer to restore edits an earlier session left in the autosave journal"""
+        try:
+            pending = project_store.pending_records(self.AUTOSAVE_PATH)
+        except ValueError:
+            pending = 0
+        if not pending:
+            return
+        if messagebox.askyesno("Recover Work",
+                               f"The last session ended with {pending:,} unsaved changes. Recover them?"):
+            try:
+                project, _ = project_store.recover(self.AUTOSAVE_PATH)
+                for name in project_store.SECTIONS:
+                    self.apply_project_section(name, project.get(name))
+                self.remember("Recover Work")
+                return
+            except Exception as e:
+                messagebox.showerror("Error", f"Recovery failed: {str(e)}")
+        self.journal.save_as(self.AUTOSAVE_PATH, {})
+
+    def check_compaction(self):
+        """Fold a large journal into the project file in the background"""
+        if not self.compacting and self.journal.size > self.COMPACT_BYTES:
+            self.compacting = True
+            journal = self.journal
+            # Mark first: a record that lands in between is replayed twice, never lost
+            mark = journal.mark()
+            snapshot = self.project_snapshot()
+
+            def compact():
+                try:
+                    journal.compact(snapshot, mark)
+                except Exception as e:
+                    self.ui_queue.post(messagebox.showerror, "Error", f"Journal compaction failed: {str(e)}")
+                finally:
+                    self.ui_queue.post(setattr, self, 'compacting', False)
+
+            threading.Thread(target=compact, daemon=True).start()
+        self.root.after(self.COMPACT_CHECK_MS, self.check_compaction)
+
+    def on_close(self):
+        """Flush the journal before the window closes"""
+        self.journal.close()
+        self.root.destroy()
+
+    def load_vlan_data(self, vlans):
+        """Replace the VLAN list and its table and prefix index entries"""
+        self.vlan_data = vlans
+        self.history.stage(vlan=self.history.pending.vlan.updated(dict(vlan) for vlan in vlans))
+        self.vlan_tree.delete(*self.vlan_tree.get_children())
+        vlan_prefixes = {}
+        for vlan in self.vlan_data:
+            self.vlan_tree.insert("", "end", values=(
+                vlan['id'], vlan['name'], vlan['subnet'],
+                vlan['description'], vlan['status']
+            ))
+            try:
+                vlan_prefixes[vlan['id']] = (prefix_index.prefix_key(vlan['subnet']), f"VLAN {vlan['id']}")
+            except ValueError:
+                pass
+        self.update_prefix_index("vlan", vlan_prefixes)
+
+    def remember(self, label):
+        """Make the changes since the last step one undoable step"""
+        if self.history.commit(label):
+            self.update_history_menu()
+
+    def update_history_menu(self):
+        """Name the steps that Undo and Redo would apply"""
+        for index, action, label in ((0, "Undo", self.history.undo_label),
+                                     (1, "Redo", self.history.redo_label)):
+            self.edit_menu.entryconfig(index, label=f"{action} {label}" if label else action,
+                                       state="normal" if label else "disabled")
+
+    def history_key(self, event, action):
+        """Undo/redo shortcut, left to text fields while one has the focus"""
+        if isinstance(event.widget, (tk.Entry, ttk.Entry, tk.Text)):
+            return None
+        return "break" if action() else None
+
+    def undo(self):
+        """Go back one step in the VLSM, VLAN and topology history"""
+        step = self.history.undo()
+        if step is not None:
+            self.show_plan_state(*step[1:])
+        self.update_history_menu()
+        return step is not None
+
+    def redo(self):
+        step = self.history.redo()
+        if step is not None:
+            self.show_plan_state(*step[1:])
+        self.update_history_menu()
+        return step is not None
+
+    def show_plan_state(self, shown, state):
+        """Bring the views from one history state to another, touching only what differs"""
+        self.restoring = True
+        try:
+            if state.vlsm is not shown.vlsm or state.hierarchy is not shown.hierarchy:
+                self.restore_vlsm(shown, state)
+            if state.vlan is not shown.vlan:
+                self.restore_vlan(shown.vlan, state.vlan)
+            if state.nodes is not shown.nodes or state.edges is not shown.edges:
+                self.restore_topology(shown, state)
+        finally:
+            self.restoring = False
+
+    def restore_vlsm(self, shown, state):
+        changed = list(history.diff_vectors(shown.vlsm, state.vlsm))
+        removed = [shown.vlsm[i] for i in changed if i < len(shown.vlsm)]
+        added = [state.vlsm[i] for i in changed if i < len(state.vlsm)]
+        for a in removed:
+            self.unindex_prefix("vlsm", (4, a['network'], a['prefix']))
+        for a in added:
+            key = (4, a['network'], a['prefix'])
+            self.index_prefix("vlsm", key, key, a['name'])
+
+        # Plan lists may be shared with the result cache, so edit a private copy
+        # (made once per plan) in place, one changed row at a time
+        if self.vlsm_allocations is not self.restored_allocations:
+            self.vlsm_allocations = self.restored_allocations = list(self.vlsm_allocations)
+        allocations = self.vlsm_allocations
+        for index, a in zip((i for i in changed if i < len(state.vlsm)), added):
+            if index < len(allocations):
+                allocations[index] = a
+            else:
+                allocations.append(a)
+        del allocations[len(state.vlsm):]
+        if state.hierarchy is not shown.hierarchy:
+            self.vlsm_hierarchy = state.hierarchy
+            self.vlsm_expanded = set()
+        self.refresh_vlsm_view()
+        self.journal.record('vlsm_rows', length=len(state.vlsm), rows=[
+            [i, [a['name'], a['network'], a['prefix'], a['hosts'], a['priority']]]
+            for i, a in zip((i for i in changed if i < len(state.vlsm)), added)])
+        self.util_chart.change(self.vlsm_allocations, removed, added)
+
+    def restore_vlan(self, shown, state):
+        items = self.vlan_tree.get_children()
+        changed = list(history.diff_vectors(shown, state))
+        for index in changed:
+            if index < len(shown):
+                self.unindex_prefix("vlan", shown[index]['id'])
+
+        rows = []
+        for index in changed:
+            if index >= len(state):
+                break
+            vlan = dict(state[index])
+            values = (vlan['id'], vlan['name'], vlan['subnet'], vlan['description'], vlan['status'])
+            if index < len(self.vlan_data):
+                self.vlan_data[index] = vlan
+                self.vlan_tree.item(items[index], values=values)
+            else:
+                self.vlan_data.append(vlan)
+                self.vlan_tree.insert("", "end", values=values)
+            try:
+                self.index_prefix("vlan", vlan['id'], prefix_index.prefix_key(vlan['subnet']), f"VLAN {vlan['id']}")
+            except ValueError:
+                pass
+            rows.append([index, vlan])
+        if len(self.vlan_data) > len(state):
+            del self.vlan_data[len(state):]
+            self.vlan_tree.delete(*items[len(state):])
+        self.journal.record('vlan_rows', rows=rows, length=len(state))
+
+    def restore_topology(self, shown, state):
+        """Replay the node and link differences through the analysis, which journals them"""
+        analysis = self.topology_analysis
+        graph = analysis.graph
+        edges = list(history.diff_maps(shown.edges, state.edges))
+        nodes = list(history.diff_maps(shown.nodes, state.nodes))
+        for key, _, data in edges:
+            if data is None and graph.has_edge(*history.edge_ends(key)):
+                analysis.remove_edge(*history.edge_ends(key))
+        for node, _, data in nodes:
+            if data is None and node in graph:
+                analysis.remove_node(node)
+        for node, _, data in nodes:
+            if data is not None:
+                analysis.add_node(node, **data)
+        for key, _, data in edges:
+            if data is not None:
+                analysis.add_edge(*history.edge_ends(key), **data)
+        self.draw_topology()
 
     def toggle_dark_mode(self):
         """Toggle between light and dark themes"""
@@ -1619,8 +2410,8 @@ class AdvancedNetworkCalculator:
                 # VLSM Documentation
                 f.write("VLSM Configuration:\n")
                 f.write("-" * 20 + "\n")
-                for item in self.vlsm_tree.get_children():
-                    values = self.vlsm_tree.item(item)['values']
+                for alloc in self.vlsm_allocations:
+                    values = vlsm_engine.allocation_row(alloc)
                     f.write(f"Subnet: {values[0]}\n")
                     f.write(f"Network: {values[1]}\n")
                     f.write(f"Mask: {values[2]}\n\n")